@@ -5,56 +5,1709 @@ Made by perpetualCreations
 """
 
 from platform import system
-from hashlib import md5
-from time import time
-from tempfile import gettempdir
-from os import mkdir, path, remove, listdir
-from shutil import unpack_archive, copyfile, make_archive, rmtree, copytree
-from io import StringIO
-from contextlib import redirect_stdout
-from json import load as jsonload
+from hashlib import md5, sha256
+from hashlib import new as hashnew
+from time import time, localtime
+from tempfile import gettempdir, mkdtemp, mkstemp
+from os import mkdir, path, remove, listdir, scandir, stat, replace
+from os import makedirs, rmdir, fsync, walk, link, utime, close, chmod
+from stat import S_IMODE, S_ISDIR
+try:
+    from os import copy_file_range
+except ImportError:
+    # Python < 3.8 or platforms other than Linux, Backend.copy_file falls
+    # back to other copy methods
+    pass
+try:
+    from os import sendfile
+except ImportError:
+    pass
+from shutil import unpack_archive, rmtree, copytree
+from shutil import copyfileobj
+from json import loads as jsonloads
 from json import dump as jsondump
-from typing import Union
+from json import dumps as jsondumps
+from zipfile import ZipFile, ZipInfo, ZIP_DEFLATED, is_zipfile
+from io import TextIOWrapper
+from typing import Union, Iterator, Callable
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+from struct import pack, unpack
+from heapq import heappush, heappop
+from bisect import bisect_right
+from threading import Lock, Event
+from random import uniform
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+import asyncio
+from ast import literal_eval
+from zlib import adler32, crc32
+import mmap
 import urllib3
-import filecmp
 
 
-class dircmp(filecmp.dircmp):
-    """Compare the content of dir1 and dir2. In contrast with filecmp.dircmp, \
-        this subclass compares the content of files with the same path."""
+class Backend:
+    """Shared backend static functions."""
 
-    def phase3(self):
-        """Find out differences between common files. \
-            Ensure we are using content comparison with shallow=False."""
-        fcomp = filecmp.cmpfiles(self.left, self.right, self.common_files,
-                                 shallow=False)
-        self.same_files, self.diff_files, self.funny_files = fcomp
+    # files at least this large are hashed through mmap instead of buffers
+    MMAP_THRESHOLD = 64 * 1024 * 1024
+    # buffer size for reading files smaller than MMAP_THRESHOLD
+    BUFFER_SIZE = 1024 * 1024
+    # first bytes of delta files written by delta_encode
+    DELTA_MAGIC = b"BANDAGE_DELTA_1\n"
+    # size of blocks matched between old and new files by delta_encode
+    DELTA_BLOCK_SIZE = 4096
+    # regions of new file sampled for blocks of old file before encoding a
+    # delta, see Backend.delta_sample
+    DELTA_SAMPLES = 16
+    # Linux ioctl request for cloning a file's data blocks, a reflink
+    FICLONE = 0x40049409
+    # connection pool shared by every request, see Backend.pool_manager
+    POOL_MANAGER = None
+    POOL_MANAGER_LOCK = Lock()
+    # [directory, maximum size in bytes] of download cache, see
+    # Backend.set_cache
+    CACHE = None
+    CACHE_LOCK = Lock()
+
+    @staticmethod
+    def pool_manager() -> urllib3.PoolManager:
+        """
+        Return URLLIB3 pool manager shared by every request, created on \
+            first use unless one was set with Backend.set_pool_manager.
 
+        Connections are kept alive in the pool, so later requests to the same
+        host skip connecting and the TLS handshake.
 
-class Backend:
-    """Shared backend static functions."""
+        :return: shared pool manager
+        :rtype: urllib3.PoolManager
+        """
+        with Backend.POOL_MANAGER_LOCK:
+            if Backend.POOL_MANAGER is None:
+                Backend.POOL_MANAGER = urllib3.PoolManager()
+            return Backend.POOL_MANAGER
 
     @staticmethod
-    def fetch(target: str) -> object:
+    def set_pool_manager(pool_manager: urllib3.PoolManager) -> None:
+        """
+        Set URLLIB3 pool manager used for every request, i.e. to configure \
+            proxies, certificates, retries or pool sizes.
+
+        :param pool_manager: pool manager, or None to have a default one
+            created on next use
+        :type pool_manager: urllib3.PoolManager
+        """
+        with Backend.POOL_MANAGER_LOCK:
+            Backend.POOL_MANAGER = pool_manager
+
+    @staticmethod
+    def fetch(target: str, preload: bool = True,
+              headers: Union[dict, None] = None) -> object:
         """
         Fetch HTTP and HTTPS requests through URLLIB3, return request \
             object, raises exception if status is not in 2XX or 301, 302.
 
+        Requests go through the pool manager of Backend.pool_manager. Status
+        304 is accepted for conditional requests, made with headers.
+
         :param target: HTTPS/HTTP address
         :type target: str
+        :param preload: if False the response body is not read into memory,
+            it is left to be streamed from the request object, default True
+        :type preload: bool
+        :param headers: HTTP request headers, default None
+        :type headers: Union[dict, None]
         :return: request
         :rtype: object
         """
-        urllib3_pool_manager = urllib3.PoolManager()
-        fetch_request = urllib3_pool_manager.request("GET", target)
+        fetch_request = Backend.pool_manager().request(
+            "GET", target, headers=headers, preload_content=preload)
         if str(fetch_request.status)[:1] != "2" and fetch_request.status \
-                not in [301, 302]:
+                not in [301, 302] and (headers is None or
+                                       fetch_request.status != 304):
+            if preload is False:
+                fetch_request.release_conn()
             raise Exceptions.FetchError(
                 "Failed to fetch resource, returned HTTP status code " +
                 str(fetch_request.status) + ".") from None
         else:
             return fetch_request
 
+    @staticmethod
+    def fetch_cached(target: str, cache_directory: str) -> bytes:
+        """
+        Fetch HTTP or HTTPS resource, revalidating a copy cached on disk, \
+            return its content.
+
+        The copy is stored under cache_directory with the ETag and
+        Last-Modified headers it was served with, which are sent back as
+        If-None-Match and If-Modified-Since, so an unchanged resource costs
+        a 304 response without a body.
+
+        :param target: HTTPS/HTTP address
+        :type target: str
+        :param cache_directory: path to directory for cached copies, created
+            if missing
+        :type cache_directory: str
+        :return: content of resource
+        :rtype: bytes
+        """
+        makedirs(cache_directory, exist_ok=True)
+        cache_file = path.join(cache_directory, md5(
+            target.encode(encoding="utf-8", errors="replace")).hexdigest())
+        headers = {}
+        try:
+            with open(cache_file + ".json") as metadata_handle:
+                metadata = jsonloads(metadata_handle.read())
+            if metadata["url"] == target and \
+                    path.isfile(cache_file) is True:
+                if metadata["etag"] is not None:
+                    headers["If-None-Match"] = metadata["etag"]
+                if metadata["last_modified"] is not None:
+                    headers["If-Modified-Since"] = metadata["last_modified"]
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+        fetch_request = Backend.fetch(target, headers=headers)
+        if fetch_request.status == 304:
+            with open(cache_file, "rb") as cache_handle:
+                return cache_handle.read()
+        # every writer has a file of its own, checks sharing cache_directory
+        # may run concurrently, i.e. through bandage.Supply.check_all
+        descriptor, partial_cache = mkstemp(dir=cache_directory,
+                                            suffix=".tmp")
+        with open(descriptor, "wb") as cache_handle:
+            cache_handle.write(fetch_request.data)
+        replace(partial_cache, cache_file)
+        descriptor, partial_cache = mkstemp(dir=cache_directory,
+                                            suffix=".tmp")
+        with open(descriptor, "w") as metadata_handle:
+            jsondump({"url": target,
+                      "etag": fetch_request.headers.get("ETag"),
+                      "last_modified": fetch_request.headers.get(
+                          "Last-Modified")}, metadata_handle)
+        replace(partial_cache, cache_file + ".json")
+        return fetch_request.data
+
+    @staticmethod
+    def set_cache(directory: Union[str, None],
+                  max_size: int = 1073741824) -> None:
+        """
+        Set directory caching downloads of Backend.download, and so of \
+            Patcher and Weave, shared by every instance pointed at it.
+
+        Downloads are stored once per content under their sha256 digest, and
+        looked up by web address before the network is used. Once the cache
+        grows beyond max_size, least recently used downloads are evicted.
+
+        :param directory: path to cache directory, created if missing, if None
+            downloads are not cached
+        :type directory: Union[str, None]
+        :param max_size: maximum size of cached downloads in bytes, default
+            1 GiB
+        :type max_size: int
+        """
+        if directory is None:
+            Backend.CACHE = None
+            return
+        makedirs(path.join(directory, "objects"), exist_ok=True)
+        makedirs(path.join(directory, "addresses"), exist_ok=True)
+        Backend.CACHE = [directory, max_size]
+
+    @staticmethod
+    def cache_download(target: str, destination: str,
+                       progress: Union[Callable, None] = None,
+                       mirrors: Union[list, None] = None, segments: int = 1,
+                       retries: int = 3, algorithm: str = "sha256",
+                       expected: Union[str, None] = None) -> str:
+        """
+        Copy download from cache of Backend.set_cache to destination, \
+            downloading it into the cache first if missing, return its sha256 \
+            hex digest.
+
+        Content is checked against expected before it is stored in the cache
+        or copied to destination, raises FetchError on mismatch. A cached
+        download not matching expected is fetched again.
+
+        :param target: HTTPS/HTTP address
+        :type target: str
+        :param destination: path to write content to
+        :type destination: str
+        :param progress: see Backend.download, default None
+        :type progress: Union[Callable, None]
+        :param mirrors: see Backend.download, default None
+        :type mirrors: Union[list, None]
+        :param segments: see Backend.download, default 1
+        :type segments: int
+        :param retries: see Backend.download, default 3
+        :type retries: int
+        :param algorithm: name of hashlib algorithm expected is given under,
+            default sha256
+        :type algorithm: str
+        :param expected: hex digest content must match, default None
+        :type expected: Union[str, None]
+        :return: hex digest of content
+        :rtype: str
+        """
+        directory = Backend.CACHE[0]
+        address = path.join(directory, "addresses", md5(target.encode(
+            encoding="utf-8", errors="replace")).hexdigest())
+        try:
+            with open(address) as address_handle:
+                digest = address_handle.read()
+            cached = path.join(directory, "objects", digest)
+            if expected is None or expected == (
+                    digest if algorithm == "sha256" else
+                    Backend.file_digest(cached, algorithm)):
+                Backend.copy_file(cached, destination)
+                # modification time orders downloads for eviction
+                utime(cached)
+                if progress is not None:
+                    size = stat(destination).st_size
+                    progress(size, size)
+                return digest
+            # content behind target changed since it was cached
+            remove(address)
+        except (FileNotFoundError, ValueError):
+            pass
+        descriptor, partial_download = mkstemp(
+            dir=path.join(directory, "objects"), suffix=".part")
+        close(descriptor)
+        try:
+            digest = Backend.download(target, partial_download, progress,
+                                      "sha256", False, mirrors, segments,
+                                      retries)
+            if expected is not None and expected != (
+                    digest if algorithm == "sha256" else
+                    Backend.file_digest(partial_download, algorithm)):
+                raise Exceptions.FetchError(
+                    "Failed to fetch resource, content of " + target +
+                    " does not match the expected digest.")
+            replace(partial_download, path.join(directory, "objects", digest))
+        except BaseException:
+            remove(partial_download)
+            for leftover in [".part", ".part.validator"]:
+                if path.isfile(partial_download + leftover) is True:
+                    remove(partial_download + leftover)
+            raise
+        with open(address + ".tmp", "w") as address_handle:
+            address_handle.write(digest)
+        replace(address + ".tmp", address)
+        Backend.copy_file(path.join(directory, "objects", digest),
+                          destination)
+        Backend.cache_evict()
+        return digest
+
+    @staticmethod
+    def cache_evict(directory: Union[str, None] = None,
+                    max_size: Union[int, None] = None) -> None:
+        """
+        Remove least recently used files from cache directory until it fits \
+            its maximum size, files still being written, with .part in their \
+            name, are left alone.
+
+        :param directory: path to cache directory, if None downloads of
+            Backend.set_cache, default None
+        :type directory: Union[str, None]
+        :param max_size: maximum size of files in directory in bytes, if None
+            maximum size of Backend.set_cache, default None
+        :type max_size: Union[int, None]
+        """
+        if directory is None:
+            directory = path.join(Backend.CACHE[0], "objects")
+            max_size = Backend.CACHE[1]
+        with Backend.CACHE_LOCK:
+            objects = []
+            total = 0
+            with scandir(directory) as entries:
+                for entry in entries:
+                    # partial downloads, their own .part file and its
+                    # .validator, of Backend.cache_download
+                    if ".part" in entry.name:
+                        continue
+                    status = entry.stat()
+                    objects.append((status.st_mtime, entry.path))
+                    total += status.st_size
+            objects.sort()
+            for x in range(0, len(objects)):
+                if total <= max_size:
+                    break
+                try:
+                    total -= stat(objects[x][1]).st_size
+                    remove(objects[x][1])
+                except FileNotFoundError:
+                    # evicted by another process sharing the cache
+                    pass
+
+    @staticmethod
+    def download(target: str, destination: str,
+                 progress: Union[Callable, None] = None,
+                 algorithm: Union[str, None] = None,
+                 use_cache: bool = True, mirrors: Union[list, None] = None,
+                 segments: int = 1, retries: int = 3,
+                 expected: Union[str, None] = None) -> Union[str, None]:
+        """
+        Stream HTTP or HTTPS resource to file, return hex digest of its \
+            content if algorithm is given.
+
+        Content is written in chunks of Backend.BUFFER_SIZE bytes as it
+        arrives and hashed on the way, so memory use does not grow with the
+        size of the resource. If a cache was set with Backend.set_cache, it
+        is consulted first.
+
+        Content is written to destination with .part appended, and renamed
+        to destination once complete. A download that fails is resumed from
+        the .part file with a Range request, from the next mirror if any,
+        and so is a later download to the same destination. With more than
+        one segment, the resource is split into byte ranges fetched
+        concurrently from target and mirrors, if the server supports ranges.
+        Raises FetchError once retries are exhausted, or if content does not
+        match expected.
+
+        :param target: HTTPS/HTTP address
+        :type target: str
+        :param destination: path to write content to
+        :type destination: str
+        :param progress: called with the number of bytes written so far and
+            the size from Content-Length, or None if unknown, after each
+            chunk, default None
+        :type progress: Union[Callable, None]
+        :param algorithm: name of hashlib algorithm, if None content is not
+            hashed, default None
+        :type algorithm: Union[str, None]
+        :param use_cache: if False the cache of Backend.set_cache is not
+            consulted, default True
+        :type use_cache: bool
+        :param mirrors: HTTPS/HTTP addresses serving the same content as
+            target, default None
+        :type mirrors: Union[list, None]
+        :param segments: number of byte ranges fetched concurrently,
+            default 1
+        :type segments: int
+        :param retries: number of times a failed download, or segment, is
+            resumed, default 3
+        :type retries: int
+        :param expected: hex digest content must match, under algorithm, or
+            sha256 if algorithm is None, default None
+        :type expected: Union[str, None]
+        :return: hex digest of content, or None
+        :rtype: Union[str, None]
+        """
+        if expected is not None and algorithm is None:
+            algorithm = "sha256"
+        if use_cache is True and Backend.CACHE is not None:
+            digest = Backend.cache_download(target, destination, progress,
+                                            mirrors, segments, retries,
+                                            "sha256" if algorithm is None else
+                                            algorithm, expected)
+            if algorithm is not None and algorithm != "sha256":
+                digest = Backend.file_digest(destination, algorithm)
+        else:
+            sources = [target] + ([] if mirrors is None else mirrors)
+            if segments > 1 and Backend.download_segments(
+                    sources, destination + ".part", progress, segments,
+                    retries) is True:
+                digest = None if algorithm is None else \
+                    Backend.file_digest(destination + ".part", algorithm)
+            else:
+                digest = Backend.download_resume(
+                    sources, destination + ".part", progress, algorithm,
+                    retries)
+            if expected is not None and digest != expected:
+                remove(destination + ".part")
+            else:
+                replace(destination + ".part", destination)
+        if expected is not None and digest != expected:
+            raise Exceptions.FetchError(
+                "Failed to fetch resource, content of " + target +
+                " does not match the expected digest.")
+        return None if algorithm is None else digest
+
+    @staticmethod
+    def download_resume(sources: list, part: str,
+                        progress: Union[Callable, None] = None,
+                        algorithm: Union[str, None] = None,
+                        retries: int = 3) -> Union[str, None]:
+        """
+        Stream resource to file, resuming from content already in it, return \
+            hex digest of its content if algorithm is given.
+
+        Each attempt requests the remaining bytes with a Range header, and
+        If-Range so that content changed since is fetched again in full.
+        Attempts cycle through sources. The ETag or Last-Modified of content
+        in part is kept next to it with .validator appended, so that a later
+        call can resume it, content in part without one is fetched again.
+
+        :param sources: HTTPS/HTTP addresses serving the same content
+        :type sources: list
+        :param part: path of file to write content to, may hold the start of
+            the content already
+        :type part: str
+        :param progress: see Backend.download, default None
+        :type progress: Union[Callable, None]
+        :param algorithm: name of hashlib algorithm, default None
+        :type algorithm: Union[str, None]
+        :param retries: number of times a failed attempt is resumed,
+            default 3
+        :type retries: int
+        :return: hex digest of content, or None
+        :rtype: Union[str, None]
+        """
+        digest = None if algorithm is None else hashnew(algorithm)
+        received = 0
+        # ETag or Last-Modified of content received so far
+        validator = None
+        try:
+            with open(part + ".validator") as validator_handle:
+                validator = validator_handle.read() or None
+        except FileNotFoundError:
+            pass
+        if path.isfile(part) is True and validator is not None:
+            received = stat(part).st_size
+            if digest is not None:
+                with open(part, "rb") as part_handle:
+                    for chunk in iter(partial(part_handle.read,
+                                              Backend.BUFFER_SIZE), b""):
+                        digest.update(chunk)
+        attempt = 0
+        while True:
+            # True if the source refused the request, rather than the
+            # connection failing
+            refused = False
+            headers = None
+            if received > 0 and validator is None:
+                # content received cannot be told apart from content changed
+                # since, so it is fetched again
+                received = 0
+                digest = None if algorithm is None else hashnew(algorithm)
+            if received > 0:
+                headers = {"Range": "bytes=" + str(received) + "-",
+                           "If-Range": validator}
+            try:
+                try:
+                    fetch_request = Backend.fetch(
+                        sources[attempt % len(sources)], preload=False,
+                        headers=headers)
+                except Exceptions.FetchError:
+                    refused = True
+                    if received > 0:
+                        # i.e. range past the end of changed content, the
+                        # next attempt starts over
+                        received = 0
+                        validator = None
+                        digest = None if algorithm is None else \
+                            hashnew(algorithm)
+                    raise
+                try:
+                    if fetch_request.status != 206:
+                        # range was not served, content starts over
+                        received = 0
+                        digest = None if algorithm is None else \
+                            hashnew(algorithm)
+                    validator = fetch_request.headers.get(
+                        "ETag", fetch_request.headers.get("Last-Modified"))
+                    if validator is not None:
+                        with open(part + ".validator", "w") as \
+                                validator_handle:
+                            validator_handle.write(validator)
+                    elif path.isfile(part + ".validator") is True:
+                        remove(part + ".validator")
+                    total = fetch_request.headers.get("Content-Length")
+                    total = None if total is None else int(total) + received
+                    with open(part, "ab" if received > 0 else "wb") as \
+                            part_handle:
+                        for chunk in fetch_request.stream(
+                                Backend.BUFFER_SIZE):
+                            part_handle.write(chunk)
+                            if digest is not None:
+                                digest.update(chunk)
+                            received += len(chunk)
+                            if progress is not None:
+                                progress(received, total)
+                finally:
+                    fetch_request.release_conn()
+                if total is not None and received < total:
+                    raise Exceptions.FetchError(
+                        "Failed to fetch resource, received " +
+                        str(received) + " of " + str(total) + " bytes.")
+                if path.isfile(part + ".validator") is True:
+                    remove(part + ".validator")
+                return None if digest is None else digest.hexdigest()
+            except (urllib3.exceptions.HTTPError,
+                    Exceptions.FetchError) as ParentException:
+                if refused is True and received == 0 and len(sources) == 1 \
+                        and headers is None:
+                    # i.e. 404, retrying the only source will not help
+                    raise
+                attempt += 1
+                if attempt > retries:
+                    raise Exceptions.FetchError(
+                        "Failed to fetch resource, gave up after " +
+                        str(attempt) + " attempts and " + str(received) +
+                        " bytes.") from ParentException
+
+    @staticmethod
+    def download_segments(sources: list, part: str,
+                          progress: Union[Callable, None] = None,
+                          segments: int = 4, retries: int = 3) -> bool:
+        """
+        Fetch resource as byte ranges concurrently, written into file at \
+            their offsets, return False without fetching if sources do not \
+            serve ranges.
+
+        Segments are spread over sources, a failed segment is resumed from
+        the next source. Every range served must report the same total size.
+
+        :param sources: HTTPS/HTTP addresses serving the same content
+        :type sources: list
+        :param part: path of file to write content to
+        :type part: str
+        :param progress: see Backend.download, default None
+        :type progress: Union[Callable, None]
+        :param segments: number of byte ranges, default 4
+        :type segments: int
+        :param retries: number of times a failed segment is resumed,
+            default 3
+        :type retries: int
+        :return: True if resource was fetched
+        :rtype: bool
+        """
+        probe = Backend.fetch(sources[0], preload=False,
+                              headers={"Range": "bytes=0-0"})
+        content_range = probe.headers.get("Content-Range", "")
+        if probe.status != 206 or \
+                content_range.rpartition("/")[2].isdigit() is False:
+            probe.close()
+            return False
+        probe.drain_conn()
+        probe.release_conn()
+        total = int(content_range.rpartition("/")[2])
+        if total == 0:
+            return False
+        with open(part, "wb") as part_handle:
+            part_handle.truncate(total)
+        # content of a resumable download is overwritten
+        if path.isfile(part + ".validator") is True:
+            remove(part + ".validator")
+        ranges = []
+        for x in range(0, segments):
+            if x * total // segments < (x + 1) * total // segments:
+                ranges.append((x * total // segments,
+                               (x + 1) * total // segments))
+        # [bytes received by all segments], guarded by lock
+        received = [0]
+        lock = Lock()
+        with ThreadPoolExecutor(len(ranges)) as executor:
+            futures = [executor.submit(
+                Backend.download_segment, sources[x:] + sources[:x], part,
+                ranges[x], total, received, lock, progress, retries)
+                for x in range(0, len(ranges))]
+            for future in futures:
+                future.result()
+        return True
+
+    @staticmethod
+    def download_segment(sources: list, part: str, byte_range: tuple,
+                         total: int, received: list, lock: Lock,
+                         progress: Union[Callable, None] = None,
+                         retries: int = 3) -> None:
+        """
+        Fetch byte range of resource into file for Backend.download_segments.
+
+        :param sources: HTTPS/HTTP addresses serving the same content, tried
+            in order
+        :type sources: list
+        :param part: path of file to write content to, at least total bytes
+        :type part: str
+        :param byte_range: (start, end) offsets, end excluded
+        :type byte_range: tuple
+        :param total: size of resource
+        :type total: int
+        :param received: [bytes received by all segments]
+        :type received: list
+        :param lock: lock guarding received
+        :type lock: Lock
+        :param progress: see Backend.download, default None
+        :type progress: Union[Callable, None]
+        :param retries: number of times a failed attempt is resumed,
+            default 3
+        :type retries: int
+        """
+        position, end = byte_range
+        attempt = 0
+        with open(part, "r+b") as part_handle:
+            while position < end:
+                try:
+                    fetch_request = Backend.fetch(
+                        sources[attempt % len(sources)], preload=False,
+                        headers={"Range": "bytes=" + str(position) + "-" +
+                                 str(end - 1)})
+                    try:
+                        content_range = fetch_request.headers.get(
+                            "Content-Range", "")
+                        if fetch_request.status != 206 or \
+                                content_range.rpartition("/")[2] != str(total):
+                            raise Exceptions.FetchError(
+                                "Failed to fetch resource, source does not " +
+                                "serve the same content in ranges.")
+                        part_handle.seek(position)
+                        for chunk in fetch_request.stream(
+                                Backend.BUFFER_SIZE):
+                            chunk = chunk[:end - position]
+                            part_handle.write(chunk)
+                            position += len(chunk)
+                            with lock:
+                                received[0] += len(chunk)
+                                if progress is not None:
+                                    progress(received[0], total)
+                            if position >= end:
+                                break
+                    finally:
+                        fetch_request.release_conn()
+                    if position < end:
+                        raise Exceptions.FetchError(
+                            "Failed to fetch resource, segment ended early.")
+                except (urllib3.exceptions.HTTPError,
+                        Exceptions.FetchError) as ParentException:
+                    attempt += 1
+                    if attempt > retries:
+                        raise Exceptions.FetchError(
+                            "Failed to fetch resource, gave up segment " +
+                            "after " + str(attempt) + " attempts.") from \
+                            ParentException
+
+    @staticmethod
+    def file_digest(file_path: str, algorithm: str = "sha256") -> str:
+        """
+        Hash content of file, return hex digest.
+
+        Files of at least Backend.MMAP_THRESHOLD bytes are memory-mapped and
+        hashed in a single update, smaller files are read through a fixed
+        buffer of Backend.BUFFER_SIZE bytes.
+
+        :param file_path: path to file for hashing
+        :type file_path: str
+        :param algorithm: name of hashlib algorithm, default sha256
+        :type algorithm: str
+        :return: hex digest of file content
+        :rtype: str
+        """
+        digest = hashnew(algorithm)
+        with open(file_path, "rb") as file_handle:
+            size = stat(file_handle.fileno()).st_size
+            if size >= Backend.MMAP_THRESHOLD:
+                with mmap.mmap(file_handle.fileno(), 0,
+                               access=mmap.ACCESS_READ) as mapped:
+                    digest.update(mapped)
+            else:
+                buffer = bytearray(Backend.BUFFER_SIZE)
+                view = memoryview(buffer)
+                while True:
+                    length = file_handle.readinto(buffer)
+                    if not length:
+                        break
+                    digest.update(view[:length])
+        return digest.hexdigest()
+
+    @staticmethod
+    def file_crc32(file_path: str) -> int:
+        """
+        Compute CRC-32 of file content, as recorded for members of zip \
+            archives.
+
+        :param file_path: path to file
+        :type file_path: str
+        :return: CRC-32 of file content
+        :rtype: int
+        """
+        checksum = 0
+        with open(file_path, "rb") as file_handle:
+            buffer = bytearray(Backend.BUFFER_SIZE)
+            view = memoryview(buffer)
+            while True:
+                length = file_handle.readinto(buffer)
+                if not length:
+                    break
+                checksum = crc32(view[:length], checksum)
+        return checksum
+
+    @staticmethod
+    def digest_files(file_paths: list, algorithm: str = "sha256",
+                     max_workers: Union[int, None] = None) -> list:
+        """
+        Hash files concurrently in a thread pool, return hex digests in the \
+            same order as the given paths.
+
+        hashlib releases the GIL while hashing, so threads are enough to keep
+        several cores and the disk busy.
+
+        :param file_paths: paths to files for hashing
+        :type file_paths: list
+        :param algorithm: name of hashlib algorithm, default sha256
+        :type algorithm: str
+        :param max_workers: maximum number of hashing threads, if None,
+            decided by concurrent.futures.ThreadPoolExecutor, default None
+        :type max_workers: Union[int, None]
+        :return: hex digests
+        :rtype: list
+        """
+        if not file_paths:
+            return []
+        with ThreadPoolExecutor(max_workers) as executor:
+            return list(executor.map(
+                partial(Backend.file_digest, algorithm=algorithm),
+                file_paths))
+
+    @staticmethod
+    def compare_files(pairs: list, algorithm: str = "sha256",
+                      max_workers: Union[int, None] = None,
+                      known: Union[list, None] = None) -> list:
+        """
+        Compare content of file pairs, return list of booleans, True for \
+            pairs with identical content.
+
+        Pairs with different sizes are reported as differing without being
+        read, remaining pairs are hashed concurrently with
+        Backend.digest_files.
+
+        :param pairs: contains (path, path) pairs of files for comparison
+        :type pairs: list
+        :param algorithm: name of hashlib algorithm, default sha256
+        :type algorithm: str
+        :param max_workers: maximum number of hashing threads, default None
+        :type max_workers: Union[int, None]
+        :param known: hex digests of the second file of each pair, None for
+            files that are to be hashed, if None all files are hashed, default
+            None
+        :type known: Union[list, None]
+        :return: comparison results, in the same order as pairs
+        :rtype: list
+        """
+        results = [False] * len(pairs)
+        known = [None] * len(pairs) if known is None else list(known)
+        candidates = []
+        for x in range(0, len(pairs)):
+            if stat(pairs[x][0]).st_size == stat(pairs[x][1]).st_size:
+                candidates.append(x)
+        unknown = [x for x in candidates if known[x] is None]
+        digests = Backend.digest_files(
+            [pairs[x][0] for x in candidates] +
+            [pairs[x][1] for x in unknown], algorithm, max_workers)
+        for x, digest in zip(unknown, digests[len(candidates):]):
+            known[x] = digest
+        for y in range(0, len(candidates)):
+            results[candidates[y]] = digests[y] == known[candidates[y]]
+        return results
+
+    @staticmethod
+    def compare_trees(old: str, new: str,
+                      max_workers: Union[int, None] = None,
+                      batch_size: int = 1024,
+                      digests: Union[dict, None] = None) -> Iterator[tuple]:
+        """
+        Walk old and new directory trees side by side with os.scandir, yield \
+            differences as (operation, path) tuples.
+
+        Operation is one of "remove", "add", "keep" or "replace", path is
+        relative to the tree roots and separated by forward slashes.
+        Directories only present in one tree are yielded as a single entry and
+        are not descended into, files present in both trees are compared by
+        content. An item that is a file in one tree and a directory in the
+        other is yielded as "replace".
+
+        Files present in both trees are collected into batches of batch_size
+        and compared concurrently with Backend.compare_files, so their entries
+        are yielded once their batch has been compared. Only the listings of
+        the two directories currently being compared and one batch are held
+        in memory.
+
+        :param old: path to old directory tree
+        :type old: str
+        :param new: path to new directory tree
+        :type new: str
+        :param max_workers: maximum number of hashing threads, default None
+        :type max_workers: Union[int, None]
+        :param batch_size: number of file pairs compared per batch,
+            default 1024
+        :type batch_size: int
+        :param digests: path -> sha256 hex digest of files of the new tree
+            that need not be hashed again, default None
+        :type digests: Union[dict, None]
+        :return: generator of (operation, path) tuples
+        :rtype: Iterator[tuple]
+        """
+        # relative directory paths pending comparison, "" being the roots
+        pending = [""]
+        # relative paths of common files awaiting content comparison
+        batch = []
+        while pending or batch:
+            if len(batch) >= batch_size or (batch and not pending):
+                results = Backend.compare_files(
+                    [(path.join(old, item), path.join(new, item))
+                     for item in batch], max_workers=max_workers,
+                    known=None if digests is None else
+                    [digests.get(item) for item in batch])
+                for x in range(0, len(batch)):
+                    yield ("keep" if results[x] is True else "replace"), \
+                        batch[x]
+                batch = []
+                continue
+            relative = pending.pop()
+            listings = []
+            for root in (old, new):
+                listing = {}
+                with scandir(path.join(root, relative)) as entries:
+                    for entry in entries:
+                        listing[entry.name] = entry.is_dir()
+                listings.append(listing)
+            subdirectories = []
+            for name in sorted(listings[0].keys() | listings[1].keys()):
+                item = relative + name
+                if name not in listings[1]:
+                    yield "remove", item
+                elif name not in listings[0]:
+                    yield "add", item
+                elif listings[0][name] != listings[1][name]:
+                    yield "replace", item
+                elif listings[0][name] is True:
+                    subdirectories.append(item + "/")
+                else:
+                    batch.append(item)
+            # reversed so sub-directories are popped in sorted order
+            pending.extend(reversed(subdirectories))
+
+    @staticmethod
+    def archive_listing(archive: ZipFile) -> list:
+        """
+        List files and directories of zip archive from its central \
+            directory, without reading member content.
+
+        Directories are included whether the archive stores entries for them
+        or they are only implied by the paths of their members.
+
+        :param archive: zip archive for listing
+        :type archive: ZipFile
+        :return: [dict of file path to ZipInfo, set of directory paths]
+        :rtype: list
+        """
+        files = {}
+        directories = set()
+        for member in archive.infolist():
+            name = member.filename.rstrip("/")
+            if member.is_dir() is True:
+                parent = name
+            else:
+                files[name] = member
+                parent = name.rpartition("/")[0]
+            while parent != "" and parent not in directories:
+                directories.add(parent)
+                parent = parent.rpartition("/")[0]
+        return [files, directories]
+
+    @staticmethod
+    def compare_archives(old: ZipFile, new: ZipFile) -> Iterator[tuple]:
+        """
+        Compare old and new zip archives through their central directories, \
+            yield differences as (operation, path) tuples.
+
+        Yields the same entries as Backend.compare_trees would for the
+        unpacked archives, except files present in both archives are compared
+        by size and CRC-32 as recorded by the archives, so no member content
+        is read.
+
+        :param old: old zip archive
+        :type old: ZipFile
+        :param new: new zip archive
+        :type new: ZipFile
+        :return: generator of (operation, path) tuples
+        :rtype: Iterator[tuple]
+        """
+        old_files, old_directories = Backend.archive_listing(old)
+        new_files, new_directories = Backend.archive_listing(new)
+        return Backend.compare_listings(
+            old_files.keys(), old_directories, new_files.keys(),
+            new_directories, lambda item: old_files[item].file_size ==
+            new_files[item].file_size and
+            old_files[item].CRC == new_files[item].CRC)
+
+    @staticmethod
+    def compare_manifests(old: dict, new: dict) -> Iterator[tuple]:
+        """
+        Compare manifests of old and new releases, as kept by Weave, yield \
+            differences as (operation, path) tuples.
+
+        Yields the same entries as Backend.compare_trees would for the
+        unpacked releases, files present in both releases are compared by
+        size and digest as recorded in the manifests.
+
+        :param old: manifest of old release
+        :type old: dict
+        :param new: manifest of new release
+        :type new: dict
+        :return: generator of (operation, path) tuples
+        :rtype: Iterator[tuple]
+        """
+        return Backend.compare_listings(
+            old["files"].keys(), set(old["directories"]),
+            new["files"].keys(), set(new["directories"]),
+            lambda item: old["files"][item][:2] == new["files"][item][:2])
+
+    @staticmethod
+    def compare_listings(old_files: set, old_directories: set,
+                         new_files: set, new_directories: set,
+                         same: Callable) -> Iterator[tuple]:
+        """
+        Compare listings of files and directories of old and new releases, \
+            yield differences as (operation, path) tuples.
+
+        :param old_files: paths of files of old release
+        :type old_files: set
+        :param old_directories: paths of directories of old release
+        :type old_directories: set
+        :param new_files: paths of files of new release
+        :type new_files: set
+        :param new_directories: paths of directories of new release
+        :type new_directories: set
+        :param same: called with path of a file present in both releases,
+            returns True if its content did not change
+        :type same: Callable
+        :return: generator of (operation, path) tuples
+        :rtype: Iterator[tuple]
+        """
+        for item in sorted(old_files | old_directories |
+                           new_files | new_directories):
+            parent = item.rpartition("/")[0]
+            # items under a directory that is not common to both releases
+            # are covered by the entry of that directory or one above it
+            if parent != "" and (parent not in old_directories or
+                                 parent not in new_directories):
+                continue
+            if item not in new_files and item not in new_directories:
+                yield "remove", item
+            elif item not in old_files and item not in old_directories:
+                yield "add", item
+            elif (item in old_directories) != (item in new_directories):
+                yield "replace", item
+            elif item in old_files:
+                yield ("keep" if same(item) is True else "replace"), item
+
+    @staticmethod
+    def archive_directory(archive: ZipFile, name: str) -> None:
+        """
+        Write directory entry to zip archive opened for writing.
+
+        :param archive: zip archive to write entry to
+        :type archive: ZipFile
+        :param name: path of directory in archive, without trailing slash
+        :type name: str
+        """
+        member = ZipInfo(name + "/", localtime(time())[:6])
+        member.external_attr = 0o40775 << 16 | 0x10
+        archive.writestr(member, b"")
+
+    @staticmethod
+    def archive_copy(source: ZipFile, member: ZipInfo, destination: ZipFile,
+                     name: str) -> None:
+        """
+        Stream member of source zip archive into destination zip archive \
+            under a new name, without staging it on disk.
+
+        :param source: zip archive to read member from
+        :type source: ZipFile
+        :param member: member of source to copy
+        :type member: ZipInfo
+        :param destination: zip archive opened for writing
+        :type destination: ZipFile
+        :param name: path of member in destination
+        :type name: str
+        """
+        if member.is_dir() is True:
+            Backend.archive_directory(destination, name.rstrip("/"))
+            return
+        copied = ZipInfo(name, member.date_time)
+        copied.compress_type = ZIP_DEFLATED
+        copied.external_attr = member.external_attr
+        # lets zipfile decide on ZIP64 extensions ahead of writing
+        copied.file_size = member.file_size
+        with source.open(member) as source_handle, \
+                destination.open(copied, "w") as destination_handle:
+            copyfileobj(source_handle, destination_handle, Backend.BUFFER_SIZE)
+
+    @staticmethod
+    def archive_extract(archive: ZipFile, member: ZipInfo,
+                        destination: str) -> None:
+        """
+        Stream member of zip archive to destination path, creating missing \
+            parent directories.
+
+        :param archive: zip archive to read member from
+        :type archive: ZipFile
+        :param member: member of archive to extract
+        :type member: ZipInfo
+        :param destination: path to write member to
+        :type destination: str
+        """
+        if member.is_dir() is True:
+            makedirs(destination, exist_ok=True)
+            return
+        makedirs(path.dirname(destination), exist_ok=True)
+        with archive.open(member) as source_handle, \
+                open(destination, "wb") as destination_handle:
+            copyfileobj(source_handle, destination_handle, Backend.BUFFER_SIZE)
+
+    @staticmethod
+    def archive_digest(archive: ZipFile, member: ZipInfo,
+                       algorithm: str = "sha256") -> str:
+        """
+        Hash content of zip archive member, return hex digest.
+
+        :param archive: zip archive to read member from
+        :type archive: ZipFile
+        :param member: member of archive to hash
+        :type member: ZipInfo
+        :param algorithm: name of hashlib algorithm, default sha256
+        :type algorithm: str
+        :return: hex digest of member content
+        :rtype: str
+        """
+        digest = hashnew(algorithm)
+        with archive.open(member) as member_handle:
+            for chunk in iter(partial(member_handle.read,
+                                      Backend.BUFFER_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def delta_encode(old: str, new: str, delta: str,
+                     block_size: Union[int, None] = None) -> bool:
+        """
+        Encode new file as a binary delta against old file, written to delta \
+            path, return True if the delta is smaller than the new file.
+
+        Signatures of old file's blocks (Adler-32 and MD5) are looked up while
+        rolling an Adler-32 window over new file, matching blocks become copy
+        operations referencing old file and everything in between is stored
+        literally. If the delta would not be smaller than new file, no delta
+        file is left behind and False is returned, the caller should then ship
+        new file in full. So is it if fewer than a quarter of the regions
+        sampled by Backend.delta_sample hold a block of old file, without
+        scanning new file.
+
+        Delta files start with Backend.DELTA_MAGIC, followed by old and new
+        sizes and the SHA-256 digest of new file, followed by operations,
+        b"C" with offset and length into old file, or b"D" with length and
+        literal data.
+
+        :param old: path to old file, which Patcher will have in target
+        :type old: str
+        :param new: path to new file
+        :type new: str
+        :param delta: path to write delta file to
+        :type delta: str
+        :param block_size: size of blocks matched between files, if None,
+            Backend.DELTA_BLOCK_SIZE, default None
+        :type block_size: Union[int, None]
+        :return: True if delta was written, otherwise False
+        :rtype: bool
+        """
+        if block_size is None:
+            block_size = Backend.DELTA_BLOCK_SIZE
+        old_size = stat(old).st_size
+        new_size = stat(new).st_size
+        if old_size < block_size or new_size < block_size:
+            return False
+        with open(old, "rb") as old_handle, open(new, "rb") as new_handle, \
+                mmap.mmap(old_handle.fileno(), 0,
+                          access=mmap.ACCESS_READ) as old_data, \
+                mmap.mmap(new_handle.fileno(), 0,
+                          access=mmap.ACCESS_READ) as new_data:
+            # weak checksum -> {strong checksum: offset in old file}
+            signatures = {}
+            for offset in range(0, old_size - block_size + 1, block_size):
+                block = old_data[offset:offset + block_size]
+                signatures.setdefault(adler32(block), {}).setdefault(
+                    md5(block).digest(), offset)
+            # the scan below rolls over new file a byte at a time, files
+            # sharing little with old file are given up on before it
+            if Backend.delta_sample(signatures, new_data, block_size) < \
+                    Backend.DELTA_SAMPLES // 4:
+                return False
+            with open(delta, "wb") as delta_handle:
+                delta_handle.write(Backend.DELTA_MAGIC + pack(
+                    ">QQ", old_size, new_size) + sha256(new_data).digest())
+                # pending copy operation as [offset, length], merged while
+                # matching blocks are contiguous in old file
+                pending = None
+                literal_start = 0
+                position = 0
+                weak = None
+                while position + block_size <= new_size:
+                    if weak is None:
+                        weak = adler32(
+                            new_data[position:position + block_size])
+                        low = weak & 0xffff
+                        high = weak >> 16
+                    if weak in signatures:
+                        offset = signatures[weak].get(md5(new_data[
+                            position:position + block_size]).digest())
+                        if offset is not None:
+                            if literal_start < position:
+                                if pending is not None:
+                                    delta_handle.write(
+                                        b"C" + pack(">QQ", *pending))
+                                    pending = None
+                                Backend.delta_write_literal(
+                                    delta_handle, new_data, literal_start,
+                                    position)
+                            if pending is not None and \
+                                    pending[0] + pending[1] == offset:
+                                pending[1] += block_size
+                            else:
+                                if pending is not None:
+                                    delta_handle.write(
+                                        b"C" + pack(">QQ", *pending))
+                                pending = [offset, block_size]
+                            position += block_size
+                            literal_start = position
+                            weak = None
+                            continue
+                    if position + block_size >= new_size:
+                        break
+                    outgoing = new_data[position]
+                    incoming = new_data[position + block_size]
+                    low = (low - outgoing + incoming) % 65521
+                    high = (high - block_size * outgoing + low - 1) % \
+                        65521
+                    weak = (high << 16) | low
+                    position += 1
+                    # literal data alone is already as large as the new file
+                    if position - literal_start + delta_handle.tell() >= \
+                            new_size:
+                        break
+                if pending is not None:
+                    delta_handle.write(b"C" + pack(">QQ", *pending))
+                # remaining literal data and its operation header
+                abandon = delta_handle.tell() + new_size - literal_start + \
+                    9 >= new_size
+                if abandon is False and literal_start < new_size:
+                    Backend.delta_write_literal(delta_handle, new_data,
+                                                literal_start, new_size)
+        if abandon is True:
+            remove(delta)
+            return False
+        return True
+
+    @staticmethod
+    def delta_sample(signatures: dict, new_data: object,
+                     block_size: int) -> int:
+        """
+        Look for blocks of old file in Backend.DELTA_SAMPLES regions spread \
+            evenly over new file, return the number of regions holding one.
+
+        Each region spans block_size offsets, so content shared with old file
+        that covers a region is found whatever its alignment.
+
+        :param signatures: weak checksum -> {strong checksum: offset in old
+            file}, see Backend.delta_encode
+        :type signatures: dict
+        :param new_data: bytes-like object holding new file
+        :type new_data: object
+        :param block_size: size of blocks matched between files
+        :type block_size: int
+        :return: number of regions holding a block of old file
+        :rtype: int
+        """
+        matched = 0
+        last = len(new_data) - block_size
+        for x in range(0, Backend.DELTA_SAMPLES):
+            start = x * last // Backend.DELTA_SAMPLES
+            for position in range(start, min(start + block_size, last + 1)):
+                block = new_data[position:position + block_size]
+                weak = adler32(block)
+                if weak in signatures and \
+                        md5(block).digest() in signatures[weak]:
+                    matched += 1
+                    break
+        return matched
+
+    @staticmethod
+    def delta_write_literal(delta_handle: object, data: object, start: int,
+                            end: int) -> None:
+        """
+        Write literal operation for data[start:end] to delta file handle.
+
+        :param delta_handle: binary file handle of delta file
+        :type delta_handle: object
+        :param data: bytes-like object holding literal data
+        :type data: object
+        :param start: start index of literal data
+        :type start: int
+        :param end: end index of literal data
+        :type end: int
+        """
+        delta_handle.write(b"D" + pack(">Q", end - start))
+        for x in range(start, end, Backend.BUFFER_SIZE):
+            delta_handle.write(data[x:min(x + Backend.BUFFER_SIZE, end)])
+
+    @staticmethod
+    def delta_apply(old: str, delta: Union[str, object], new: str) -> None:
+        """
+        Rebuild new file from old file and delta written by \
+            Backend.delta_encode.
+
+        Raises PatchError if delta is invalid, or if the rebuilt file does not
+        match the size and digest recorded in delta.
+
+        :param old: path to old file
+        :type old: str
+        :param delta: path to delta file, or delta opened for binary reading
+        :type delta: Union[str, object]
+        :param new: path to write rebuilt file to, must differ from old
+        :type new: str
+        """
+        if isinstance(delta, str) is True:
+            with open(delta, "rb") as delta_handle:
+                Backend.delta_apply(old, delta_handle, new)
+            return
+        digest = sha256()
+        with open(old, "rb") as old_handle, open(new, "wb") as new_handle:
+            old_size, new_size, new_digest = Backend.delta_header(delta, new)
+            if stat(old_handle.fileno()).st_size != old_size:
+                raise Exceptions.PatchError(
+                    "Delta for " + new + " does not apply to " + old +
+                    ", size differs from the file it was made against.")
+            while True:
+                operation = delta.read(1)
+                if not operation:
+                    break
+                if operation == b"C":
+                    offset, length = unpack(">QQ", delta.read(16))
+                    old_handle.seek(offset)
+                    source = old_handle
+                elif operation == b"D":
+                    length = unpack(">Q", delta.read(8))[0]
+                    source = delta
+                else:
+                    raise Exceptions.PatchError(
+                        "Delta for " + new + " is invalid.")
+                while length > 0:
+                    chunk = source.read(min(length, Backend.BUFFER_SIZE))
+                    if not chunk:
+                        raise Exceptions.PatchError(
+                            "Delta for " + new + " is truncated.")
+                    digest.update(chunk)
+                    new_handle.write(chunk)
+                    length -= len(chunk)
+            if new_handle.tell() != new_size or \
+                    digest.digest() != new_digest:
+                raise Exceptions.PatchError(
+                    "Rebuilding " + new + " from delta did not produce " +
+                    "the expected file.")
+
+    @staticmethod
+    def delta_compose(first: str, second: object, composed: str) -> None:
+        """
+        Compose two deltas written by Backend.delta_encode, the second made \
+            against the file the first rebuilds, into a delta against the \
+            file the first applies to.
+
+        Copy operations of the second delta are remapped through the
+        operations of the first, so neither file is needed. Raises PatchError
+        if either delta is invalid or they do not chain.
+
+        :param first: path to delta from old file to intermediate file
+        :type first: str
+        :param second: delta from intermediate file to new file, opened for
+            binary reading
+        :type second: object
+        :param composed: path to write composed delta to
+        :type composed: str
+        """
+        # offsets into intermediate file where operations of first delta
+        # start, and the operations as (b"C", offset into old file) or
+        # (b"D", offset of literal data in first delta)
+        starts = []
+        operations = []
+        with open(first, "rb") as first_handle, \
+                open(composed, "wb") as composed_handle:
+            old_size, middle_size = Backend.delta_header(first_handle,
+                                                         composed)[:2]
+            position = 0
+            while True:
+                operation = first_handle.read(1)
+                if not operation:
+                    break
+                if operation == b"C":
+                    offset, length = unpack(">QQ", first_handle.read(16))
+                elif operation == b"D":
+                    length = unpack(">Q", first_handle.read(8))[0]
+                    offset = first_handle.tell()
+                    first_handle.seek(length, 1)
+                else:
+                    raise Exceptions.PatchError(
+                        "Delta for " + composed + " is invalid.")
+                if length > 0:
+                    starts.append(position)
+                    operations.append((operation, offset))
+                    position += length
+            if position != middle_size or \
+                    first_handle.tell() > stat(first).st_size:
+                raise Exceptions.PatchError(
+                    "Delta for " + composed + " is truncated.")
+            middle, new_size, new_digest = Backend.delta_header(second,
+                                                                composed)
+            if middle != middle_size:
+                raise Exceptions.PatchError(
+                    "Deltas for " + composed + " do not chain, the second " +
+                    "was not made against the file the first rebuilds.")
+            composed_handle.write(Backend.DELTA_MAGIC + pack(
+                ">QQ", old_size, new_size) + new_digest)
+            # pending copy operation as [offset, length], merged while
+            # contiguous in old file
+            pending = None
+            while True:
+                operation = second.read(1)
+                if not operation:
+                    break
+                if operation == b"D":
+                    if pending is not None:
+                        composed_handle.write(b"C" + pack(">QQ", *pending))
+                        pending = None
+                    length = unpack(">Q", second.read(8))[0]
+                    composed_handle.write(b"D" + pack(">Q", length))
+                    Backend.delta_copy(second, composed_handle, length,
+                                       composed)
+                    continue
+                if operation != b"C":
+                    raise Exceptions.PatchError(
+                        "Delta for " + composed + " is invalid.")
+                offset, length = unpack(">QQ", second.read(16))
+                if offset + length > middle_size:
+                    raise Exceptions.PatchError(
+                        "Delta for " + composed + " is invalid.")
+                x = bisect_right(starts, offset) - 1
+                while length > 0:
+                    end = starts[x + 1] if x + 1 < len(starts) else \
+                        middle_size
+                    piece = min(length, end - offset)
+                    inner = operations[x][1] + offset - starts[x]
+                    if operations[x][0] == b"C" and pending is not None \
+                            and pending[0] + pending[1] == inner:
+                        pending[1] += piece
+                    else:
+                        if pending is not None:
+                            composed_handle.write(
+                                b"C" + pack(">QQ", *pending))
+                            pending = None
+                        if operations[x][0] == b"C":
+                            pending = [inner, piece]
+                        else:
+                            composed_handle.write(b"D" + pack(">Q", piece))
+                            first_handle.seek(inner)
+                            Backend.delta_copy(first_handle, composed_handle,
+                                               piece, composed)
+                    offset += piece
+                    length -= piece
+                    x += 1
+            if pending is not None:
+                composed_handle.write(b"C" + pack(">QQ", *pending))
+
+    @staticmethod
+    def delta_copy(source: object, destination: object, length: int,
+                   name: str) -> None:
+        """
+        Copy length bytes between binary file handles, raises PatchError if \
+            source ends early.
+
+        :param source: binary handle to read from
+        :type source: object
+        :param destination: binary handle to write to
+        :type destination: object
+        :param length: number of bytes to copy
+        :type length: int
+        :param name: path of file delta is for, used in error messages
+        :type name: str
+        """
+        while length > 0:
+            chunk = source.read(min(length, Backend.BUFFER_SIZE))
+            if not chunk:
+                raise Exceptions.PatchError(
+                    "Delta for " + name + " is truncated.")
+            destination.write(chunk)
+            length -= len(chunk)
+
+    @staticmethod
+    def delta_header(delta: object, name: str) -> list:
+        """
+        Read header of delta written by Backend.delta_encode, raises \
+            PatchError if delta is invalid.
+
+        :param delta: delta opened for binary reading, positioned at start
+        :type delta: object
+        :param name: path of file delta is for, used in error messages
+        :type name: str
+        :return: [size of old file, size of new file, sha256 digest of new
+            file]
+        :rtype: list
+        """
+        header_size = len(Backend.DELTA_MAGIC) + 16 + 32
+        header = delta.read(header_size)
+        if len(header) != header_size or \
+                header[:len(Backend.DELTA_MAGIC)] != Backend.DELTA_MAGIC:
+            raise Exceptions.PatchError("Delta for " + name + " is invalid.")
+        old_size, new_size = unpack(
+            ">QQ", header[len(Backend.DELTA_MAGIC):-32])
+        return [old_size, new_size, header[-32:]]
+
+    @staticmethod
+    def copy_file(source: str, destination: str) -> None:
+        """
+        Copy content of file, letting the kernel do the work where possible.
+
+        Tries, in order, a reflink (FICLONE, Linux on btrfs, XFS and similar,
+        which shares data blocks until either file is modified),
+        os.copy_file_range, os.sendfile, and finally a buffered copy through
+        Python. Each method continues from wherever the previous one stopped.
+
+        :param source: path to file to copy
+        :type source: str
+        :param destination: path to write copy to, overwritten if it exists
+        :type destination: str
+        """
+        with open(source, "rb") as source_handle, \
+                open(destination, "wb") as destination_handle:
+            if system() == "Linux":
+                import fcntl
+                try:
+                    fcntl.ioctl(destination_handle.fileno(), Backend.FICLONE,
+                                source_handle.fileno())
+                    return
+                except OSError:
+                    pass
+            size = stat(source_handle.fileno()).st_size
+            copied = 0
+            try:
+                while copied < size:
+                    length = copy_file_range(
+                        source_handle.fileno(), destination_handle.fileno(),
+                        size - copied, copied, copied)
+                    if length == 0:
+                        break
+                    copied += length
+            except (NameError, OSError):
+                pass
+            try:
+                while copied < size:
+                    destination_handle.seek(copied)
+                    length = sendfile(destination_handle.fileno(),
+                                      source_handle.fileno(), copied,
+                                      size - copied)
+                    if length == 0:
+                        break
+                    copied += length
+            except (NameError, OSError):
+                pass
+            source_handle.seek(copied)
+            destination_handle.seek(copied)
+            copyfileobj(source_handle, destination_handle, Backend.BUFFER_SIZE)
+
+    @staticmethod
+    def link_file(source: str, destination: str) -> None:
+        """
+        Hardlink file to destination, copy it with Backend.copy_file if \
+            linking is not possible, i.e. across filesystems.
+
+        Only for staging files that are read once and never modified in
+        place, since a hardlink shares content with its source.
+
+        :param source: path to file to link
+        :type source: str
+        :param destination: path of link to create, must not exist
+        :type destination: str
+        """
+        try:
+            link(source, destination)
+        except OSError:
+            Backend.copy_file(source, destination)
+
+    @staticmethod
+    def parse_change(change: str) -> dict:
+        """
+        Parse contents of a v1 CHANGE.json into dict of operation to list of \
+            paths.
+
+        Each list of a v1 CHANGE.json is the Python representation of a list
+        of strings stored as a JSON string, it is evaluated as a literal, so
+        names containing ", " or quotes survive.
+
+        :param change: contents of CHANGE.json
+        :type change: str
+        :return: contains "remove", "add", "keep", "replace" and "delta" lists,
+            and empty "move" and "copy" lists
+        :rtype: dict
+        """
+        dump = jsonloads(change)
+        for x in dump:
+            try:
+                dump[x] = literal_eval(dump[x])
+            except (ValueError, SyntaxError) as ParentException:
+                raise Exceptions.UnableToParseError(
+                    "CHANGE.json list " + x + " is malformed.") from \
+                    ParentException
+        # patches woven without delta mode have no delta list
+        dump.setdefault("delta", [])
+        dump.setdefault("move", [])
+        dump.setdefault("copy", [])
+        return dump
+
+    @staticmethod
+    def read_change(handle: object) -> list:
+        """
+        Read CHANGE.json of either format from text handle, return dict of \
+            operation to list of paths and dict of path to entry.
+
+        A v2 CHANGE.json is JSON Lines, a {"format": 2} header followed by one
+        entry per item, read line by line. Entries carry "op" and "path", and
+        "type", "size" and "mode" where known. Files moved or copied within
+        target have "move" or "copy" as "op", "source" being the path of a
+        file in target before patching or "payload" the path of a file in
+        patch, and "digest" the sha256 hex digest of their content. A v1
+        CHANGE.json is a single JSON document, its items have no entries.
+
+        :param handle: text handle of CHANGE.json
+        :type handle: object
+        :return: contains "remove", "add", "keep", "replace", "delta", "move"
+            and "copy" lists, and dict of path to entry
+        :rtype: list
+        """
+        header = handle.readline()
+        try:
+            version = jsonloads(header)
+        except ValueError:
+            # v1 written with indentation does not parse from its first line
+            version = {}
+        if isinstance(version, dict) is False:
+            raise Exceptions.UnableToParseError(
+                "CHANGE.json has a malformed header, " + header.strip() + ".")
+        version = version.get("format", 1)
+        if version == 1:
+            return [Backend.parse_change(header + handle.read()), {}]
+        if version != 2:
+            raise Exceptions.UnableToParseError(
+                "CHANGE.json format " + str(version) + " is not supported.")
+        change = {"remove": [], "add": [], "keep": [], "replace": [],
+                  "delta": [], "move": [], "copy": []}
+        entries = {}
+        for line in handle:
+            if line.strip() == "":
+                continue
+            try:
+                entry = jsonloads(line)
+                change[entry["op"]].append(entry["path"])
+            except (ValueError, KeyError, TypeError) as ParentException:
+                raise Exceptions.UnableToParseError(
+                    "CHANGE.json has a malformed entry, " + line.strip() +
+                    ".") from ParentException
+            entries[entry["path"]] = entry
+        return [change, entries]
+
+    @staticmethod
+    def change_lines(change: dict, entries: dict) -> Iterator[str]:
+        """
+        Generate lines of a v2 CHANGE.json.
+
+        :param change: contains "remove", "add", "keep", "replace" and "delta"
+            lists
+        :type change: dict
+        :param entries: path -> entry carrying "type", "size" and "mode" where
+            known, and "source" or "payload" and "digest" for moved and
+            copied files, paths without entry only get "op" and "path"
+        :type entries: dict
+        :return: lines of CHANGE.json, each ending with a newline
+        :rtype: Iterator[str]
+        """
+        yield jsondumps({"format": 2}) + "\n"
+        for operation in ["remove", "add", "keep", "replace", "delta", "move",
+                          "copy"]:
+            for item in change.get(operation, []):
+                entry = {"op": operation, "path": item}
+                for field in ["type", "size", "mode", "source", "payload",
+                              "digest"]:
+                    if entries.get(item, {}).get(field) is not None:
+                        entry[field] = entries[item][field]
+                yield jsondumps(entry) + "\n"
+
+    @staticmethod
+    def remove_paths(paths: list,
+                     max_workers: Union[int, None] = None) -> None:
+        """
+        Delete files and directory trees concurrently in a thread pool, \
+            paths that do not exist are ignored.
+
+        :param paths: paths to delete
+        :type paths: list
+        :param max_workers: maximum number of threads, default None
+        :type max_workers: Union[int, None]
+        """
+        if not paths:
+            return
+        with ThreadPoolExecutor(max_workers) as executor:
+            for _ in executor.map(Backend.remove_path, paths):
+                pass
+
+    @staticmethod
+    def remove_path(target: str) -> None:
+        """
+        Delete file or directory tree, ignored if it does not exist.
+
+        :param target: path to delete
+        :type target: str
+        """
+        if path.isdir(target) is True and path.islink(target) is False:
+            rmtree(target)
+        elif path.lexists(target) is True:
+            remove(target)
+
+    @staticmethod
+    def list_directory(root: str) -> list:
+        """
+        List contents of directory recursively.
+
+        :param root: path to directory
+        :type root: str
+        :return: contains (relative path, True if directory) pairs, paths
+            separated by /
+        :rtype: list
+        """
+        dump = []
+        for directory, subdirectories, files in walk(root):
+            relative = path.relpath(directory, root).replace("\\", "/")
+            relative = "" if relative == "." else relative + "/"
+            for subdirectory in subdirectories:
+                dump.append((relative + subdirectory, True))
+            for file in files:
+                dump.append((relative + file, False))
+        return dump
+
+    @staticmethod
+    def find_parent(items: Union[set, dict], name: str) -> Union[str, None]:
+        """
+        Find item that is path or one of its parent directories.
+
+        :param items: paths of items, separated by /
+        :type items: Union[set, dict]
+        :param name: path to look up, separated by /
+        :type name: str
+        :return: path of item, or None if neither path nor any of its parent
+            directories is an item
+        :rtype: Union[str, None]
+        """
+        candidate = name
+        while candidate != "":
+            if candidate in items:
+                return candidate
+            candidate = candidate.rpartition("/")[0]
+        return None
+
     @staticmethod
     def directory_split_recursive(whole: str) -> list:
         """
@@ -119,17 +1772,51 @@ class Exceptions:
 class Patcher:
     """Main class for bandage.Patcher instances, which apply patches."""
 
+    # directory in target holding staged and replaced items while patching
+    STAGING_DIR = ".bandage_staging"
+    # journal in target of the patch being applied
+    JOURNAL = ".bandage_journal"
+    # index in target of size, modification time and digest of its files
+    INDEX = ".bandage_index"
+
     def __init__(self, patch: str, target: str,
                  suppress_version_check: bool = False,
                  suppress_name_check: bool = False,
-                 skip_keep_check: bool = False):
+                 skip_keep_check: bool = False, verify: bool = False,
+                 skip_applied: bool = True,
+                 skip_manifest_check: bool = False,
+                 max_workers: Union[int, None] = None,
+                 progress: Union[Callable, None] = None,
+                 mirrors: Union[list, None] = None, segments: int = 1,
+                 skip_payload_check: bool = False):
         """
         Take patch file and target application directory, and apply \
             changes after checking VERSION and NAME.
 
         Inorganic and for robots.
 
-        :param patch: web address or path to patch file
+        Zip patch archives are read in place, headers are read in memory and
+        items are streamed from the archive straight to the target. Patch
+        archives of other formats are unpacked to a temporary directory
+        first.
+
+        New content is staged inside the target first, then swapped in with
+        renames recorded in a journal. If applying fails the target is rolled
+        back, if the process dies the target can be recovered through
+        bandage.Patcher.resume or bandage.Patcher.rollback.
+
+        If target has an index written by bandage.Patcher.verify, files whose
+        size and modification time match the index are not hashed again, and
+        the index is updated for the items patched.
+
+        Items already in the state the patch leaves them in are skipped, so
+        running a patch again after it was interrupted only carries out the
+        remaining work. An unfinished patch journaled in target by the same
+        patch is resumed, or rolled back if it did not finish staging, before
+        that.
+
+        :param patch: web address or path to patch file, or path to directory
+            of an unpacked patch
         :type patch: str
         :param target: path to application directory for patching
         :type target: str
@@ -140,166 +1827,1393 @@ class Patcher:
             default is False
         :type suppress_name_check: bool
         :param skip_keep_check: if True Patcher does not check if files
-            listed under Keep exist, default is False
+            listed under Keep exist, and match the type recorded by a v2
+            CHANGE.json, default is False
         :type skip_keep_check: bool
+        :param verify: if True Patcher compares added and replaced items in
+            target against the patch's content after applying, raises
+            PatchError on mismatch, default is False
+        :type verify: bool
+        :param skip_applied: if True items of target already matching the
+            patch are skipped and target VERSION may already be the
+            upgrade-to version, if False Patcher refuses any target not
+            exactly in the upgrade-from state, default is True
+        :type skip_applied: bool
+        :param skip_manifest_check: if True Patcher does not compare files of
+            target and patch against the sizes and digests recorded in the
+            patch's MANIFEST.json before patching, default is False
+        :type skip_manifest_check: bool
+        :param max_workers: maximum number of threads staging files,
+            removing replaced items and hashing files for verification, for
+            finding applied items and for checking the manifest, if None,
+            decided by concurrent.futures.ThreadPoolExecutor, default None
+        :type max_workers: Union[int, None]
+        :param progress: called with the number of bytes downloaded so far
+            and the total size, or None if unknown, while downloading patch
+            from a web address, default None
+        :type progress: Union[Callable, None]
+        :param mirrors: web addresses serving the same patch, used to resume
+            a failed download and to fetch segments from, default None
+        :type mirrors: Union[list, None]
+        :param segments: number of byte ranges of patch downloaded
+            concurrently, default 1
+        :type segments: int
+        :param skip_payload_check: if True files for addition and replacement
+            in patch are not compared against MANIFEST.json, only files of
+            target are, i.e. when already checked by
+            bandage.Patcher.check_patch, default is False
+        :type skip_payload_check: bool
         """
         self.WORK_DIR = Patcher.create_work_directory()
-        self.patch = patch
-        self.target = target
-        if "https://" in patch[:8] or "http://" in patch[:8]:
-            patch_grab = Backend.fetch(patch)
-            with open(gettempdir() + self.WORK_DIR +
-                      path.splitext(self.patch)[1], "w") as patch_data_dump:
-                patch_data_dump.write(patch_grab.data)
-            self.patch = gettempdir() + self.WORK_DIR + \
-                path.splitext(self.patch)[1]
-        else:
-            if path.isfile(self.patch) is False:
-                raise Exceptions.PatchError("Patch file with path " +
-                                            self.patch + " does not exist.")
-        if path.isdir(self.target) is False or not listdir(self.target):
-            raise Exceptions.TargetError("Target directory " + self.target +
-                                         " does not exist or is empty.")
-        unpack_archive(self.patch, gettempdir() + self.WORK_DIR)
+        # zip patch archive read in place, or None
+        self.archive = None
         try:
-            if suppress_name_check is False:
-                with open(gettempdir() + self.WORK_DIR + "/NAME") as \
-                        patch_name_handle:
-                    patch_name = patch_name_handle.read()
-                with open(self.target + "/NAME") as target_name_handle:
-                    if target_name_handle.read() != patch_name:
+            self.patch = patch
+            self.target = target
+            if "https://" in patch[:8] or "http://" in patch[:8]:
+                self.patch = gettempdir() + self.WORK_DIR + "/patch" + \
+                    path.splitext(self.patch)[1]
+                Backend.download(patch, self.patch, progress, mirrors=mirrors,
+                                 segments=segments)
+            else:
+                if path.isfile(self.patch) is False and \
+                        path.isdir(self.patch) is False:
+                    raise Exceptions.PatchError(
+                        "Patch file with path " + self.patch +
+                        " does not exist.")
+            if path.isdir(self.target) is False or not listdir(self.target):
+                raise Exceptions.TargetError(
+                    "Target directory " + self.target +
+                    " does not exist or is empty.")
+            # directory holding the unpacked patch
+            self.patch_root = gettempdir() + self.WORK_DIR + "/unpacked"
+            if path.isdir(self.patch) is True:
+                self.archive = None
+                self.patch_root = self.patch
+            elif is_zipfile(self.patch) is True:
+                self.archive = ZipFile(self.patch)
+                self.listing = Backend.archive_listing(self.archive)
+            else:
+                self.archive = None
+                unpack_archive(self.patch, self.patch_root)
+            try:
+                if suppress_name_check is False:
+                    patch_name = Patcher.read_patch_file(self, "NAME")
+                    with open(self.target + "/NAME") as target_name_handle:
+                        target_name = target_name_handle.read()
+                    if target_name != patch_name:
                         raise Exceptions.PatchError(
                             "NAME files of target and patch are different. " +
-                            "Target is " + target_name_handle.read() +
-                            " and patch " + patch_name + ".")
+                            "Target is " + target_name + " and patch " +
+                            patch_name + ".")
+            except FileNotFoundError as ParentException:
+                raise Exceptions.PatchError("Missing NAME file(s).") from \
+                    ParentException
+            try:
+                self.patch_versions = \
+                    Patcher.read_patch_file(self, "VERSIONS").split(" -> ")
+                if suppress_version_check is False:
+                    with open(path.join(target, "VERSION")) as version_handle:
+                        current_version = version_handle.read()
+                    if current_version != self.patch_versions[0] and (
+                            skip_applied is False or
+                            current_version != self.patch_versions[1]):
+                        raise Exceptions.VersionError(
+                            "VERSIONS file specifies a different " +
+                            "upgrade-from version compared to the target " +
+                            "VERSION file. Target is on " + current_version +
+                            ", and patch supporting " +
+                            self.patch_versions[0] + ".")
+            except FileNotFoundError as ParentException:
+                if suppress_version_check is False:
+                    raise Exceptions.VersionError(
+                        "Missing VERSION(S) file(s).") from ParentException
+                self.patch_versions = None
+            if path.lexists(path.join(self.target, Patcher.JOURNAL)) is True:
+                journal = Patcher.read_journal(self.target)
+                if skip_applied is False or journal[4] != (
+                        None if self.patch_versions is None else
+                        " -> ".join(self.patch_versions)):
+                    raise Exceptions.TargetError(
+                        "Target directory " + self.target + " has an " +
+                        "unfinished patch, recover it with " +
+                        "bandage.Patcher.resume or bandage.Patcher.rollback " +
+                        "first.")
+                if journal[1] is True:
+                    Patcher.resume(self.target, max_workers)
+                else:
+                    Patcher.rollback(self.target)
+            try:
+                with TextIOWrapper(
+                        Patcher.open_patch_file(self, "CHANGE.json"),
+                        encoding="utf-8") as change_handle:
+                    self.change, self.entries = \
+                        Backend.read_change(change_handle)
+            except FileNotFoundError as ParentException:
+                raise Exceptions.PatchError(
+                    "CHANGE.json file of patch archive is missing.") from \
+                        ParentException
+            if skip_keep_check is False:
+                for x in range(0, len(self.change["keep"])):
+                    if path.isdir(path.join(
+                            self.target, self.change["keep"][x])) is not True \
+                            and path.isfile(path.join(
+                                self.target, self.change["keep"][x])) \
+                            is not True:
+                        raise Exceptions.TargetError(
+                            "Target missing item(s) that should exist, " +
+                            "listed under the keep operation. Raised on " +
+                            self.change["keep"][x] + ".")
+                    if Patcher.entry_matches(self, self.change["keep"][x]) is \
+                            False:
+                        raise Exceptions.TargetError(
+                            "Target item listed under the keep operation " +
+                            "differs in type from the old release. " +
+                            "Raised on " + self.change["keep"][x] + ".")
+            for x in range(0, len(self.change["add"])):
+                if Patcher.patch_item(
+                        self, "add/" + self.change["add"][x]) is None:
+                    raise Exceptions.PatchError(
+                        "Missing item(s) for addition. Raised on " +
+                        self.change["add"][x] + ".")
+            for x in range(0, len(self.change["replace"])):
+                if Patcher.patch_item(
+                        self, "replace/" + self.change["replace"][x]) is None:
+                    raise Exceptions.PatchError(
+                        "Missing item(s) for replacement. Raised on " +
+                        self.change["replace"][x] + ".")
+            for x in range(0, len(self.change["delta"])):
+                if Patcher.patch_item(
+                        self, "delta/" + self.change["delta"][x]) != "file":
+                    raise Exceptions.PatchError(
+                        "Missing item(s) for delta replacement. Raised on " +
+                        self.change["delta"][x] + ".")
+                if path.isfile(path.join(
+                        self.target, self.change["delta"][x])) is not True:
+                    raise Exceptions.TargetError(
+                        "Target " + self.change["delta"][x] +
+                        " for delta replacement does not exist.")
+            # moved or copied file -> directory item for addition or
+            # replacement it is written into, or None if an item of its own
+            self.copies = {}
+            shipped = set(self.change["add"] + self.change["replace"])
+            for operation in ["move", "copy"]:
+                for item in self.change[operation]:
+                    self.copies[item] = Backend.find_parent(shipped, item)
+            Patcher.index_archive(self)
+            self.target_index = Patcher.read_index(self.target)
+            # contents of MANIFEST.json, if checked
+            self.checksums = None
+            # (operation, path) pairs of items skipped, already matching patch
+            self.applied = []
+            if skip_applied is True:
+                Patcher.find_applied(self, max_workers)
+            for operation in ["move", "copy"]:
+                for item in self.change[operation]:
+                    entry = self.entries.get(item, {})
+                    if entry.get("payload") is not None:
+                        if Patcher.patch_item(self, entry["payload"]) != \
+                                "file":
+                            raise Exceptions.PatchError(
+                                "Missing item(s) for copying. Raised on " +
+                                item + ".")
+                    elif entry.get("source") is None:
+                        raise Exceptions.PatchError(
+                            "Item listed for copying has no source. Raised " +
+                            "on " + item + ".")
+                    elif path.isfile(path.join(self.target,
+                                               entry["source"])) is not True:
+                        raise Exceptions.TargetError(
+                            "Target " + entry["source"] + " to copy " + item +
+                            " from does not exist.")
+            if skip_manifest_check is False:
+                Patcher.check_manifest(self, skip_keep_check, max_workers,
+                                       skip_payload_check)
+            # moved and copied files that are items of their own
+            copied = [item for item in
+                      self.change["move"] + self.change["copy"]
+                      if self.copies[item] is None]
+            # (operation, path) pairs carried out by Patcher.resume, in order
+            plan = []
+            planned_directories = set()
+            for item in self.change["add"] + copied:
+                for a in reversed(Backend.directory_split_recursive(item)):
+                    if a != "" and a not in planned_directories and \
+                            path.isdir(path.join(self.target, a)) is False:
+                        planned_directories.add(a)
+                        plan.append(["mkdir", a])
+            for x in range(0, len(self.change["add"])):
+                # items added over something already present are swapped in
+                # like replacements, so they can be rolled back
+                if path.lexists(path.join(
+                        self.target, self.change["add"][x])) is True:
+                    plan.append(["replace", self.change["add"][x]])
+                else:
+                    plan.append(["add", self.change["add"][x]])
+            for x in range(0, len(self.change["replace"])):
+                if path.lexists(path.join(self.target,
+                                          self.change["replace"][x])) is False:
+                    raise Exceptions.TargetError(
+                        "Target " + self.change["replace"][x] +
+                        " for replacement does not exist.")
+                plan.append(["replace", self.change["replace"][x]])
+            for x in range(0, len(self.change["delta"])):
+                plan.append(["replace", self.change["delta"][x]])
+            for item in sorted(copied):
+                if path.lexists(path.join(self.target, item)) is True:
+                    plan.append(["replace", item])
+                else:
+                    plan.append(["add", item])
+            if self.patch_versions is not None and \
+                    ["replace", "VERSION"] not in plan and \
+                    ["add", "VERSION"] not in plan and \
+                    ("replace", "VERSION") not in self.applied:
+                if path.lexists(path.join(self.target, "VERSION")) is True:
+                    plan.append(["replace", "VERSION"])
+                else:
+                    plan.append(["add", "VERSION"])
+            for x in range(0, len(self.change["remove"])):
+                if path.lexists(path.join(self.target,
+                                          self.change["remove"][x])) is False:
+                    raise Exceptions.TargetError(
+                        "Target " + self.change["remove"][x] +
+                        " for removal does not exist, or is not a file or" +
+                        " directory.")
+                plan.append(["remove", self.change["remove"][x]])
+            self.staging = path.join(self.target, Patcher.STAGING_DIR)
+            if path.isdir(self.staging) is True:
+                # left behind by a run that failed before writing its journal
+                rmtree(self.staging)
+            try:
+                Patcher.stage(self, verify, max_workers)
+            except BaseException:
+                rmtree(self.staging, ignore_errors=True)
+                raise
+        finally:
+            # the work directory may hold a whole downloaded patch
+            if self.archive is not None:
+                self.archive.close()
+            rmtree(gettempdir() + self.WORK_DIR, ignore_errors=True)
+        with open(path.join(self.target, Patcher.JOURNAL), "w") as \
+                journal_handle:
+            journal_handle.write(jsondumps({"versions": None if (
+                self.patch_versions is None) else " -> ".join(
+                    self.patch_versions)}) + "\n")
+            for operation in plan:
+                journal_handle.write(jsondumps({"operation": operation[0],
+                                                "path": operation[1]}) + "\n")
+            journal_handle.write(jsondumps({"state": "staged"}) + "\n")
+            journal_handle.flush()
+            fsync(journal_handle.fileno())
+        try:
+            Patcher.resume(self.target, max_workers)
+        except BaseException:
+            Patcher.rollback(self.target)
+            raise
+        if path.isfile(path.join(self.target, Patcher.INDEX)) is True:
+            Patcher.update_index(
+                self.target, [operation[1] for operation in plan
+                              if operation[0] != "mkdir"],
+                None if self.checksums is None else self.checksums["new"],
+                max_workers)
+
+    @staticmethod
+    def create_work_directory() -> str:
+        """
+        Create directory under the OS temporary directory with a unique name \
+            to prevent conflicting instances.
+
+        :return: generated tempdir name
+        :rtype: str
+        """
+        # mkdtemp picks the name, instances created at the same time in
+        # several threads, as by bandage.Patcher.fleet, must not collide
+        return "/" + path.basename(mkdtemp(prefix="bandage_patcher_session_"))
+
+    @staticmethod
+    def fleet(patch: str, targets: list,
+              max_targets: Union[int, None] = None, **options) -> list:
+        """
+        Apply one patch to many application directories concurrently, \
+            return a result per target.
+
+        Patches from a web address are fetched once, zip patches are then
+        read in place by every Patcher, patches of other formats are unpacked
+        once to a directory shared by all of them. Content of patch is
+        checked against its MANIFEST.json once, through
+        bandage.Patcher.check_patch, each Patcher then only checks its
+        target. Targets are patched in a thread pool, a failure in one target
+        does not affect the others.
+
+        :param patch: web address or path to patch file
+        :type patch: str
+        :param targets: paths to application directories for patching
+        :type targets: list
+        :param max_targets: maximum number of targets patched at the same
+            time, if None, decided by concurrent.futures.ThreadPoolExecutor,
+            default None
+        :type max_targets: Union[int, None]
+        :param options: keyword arguments passed on to every Patcher, such as
+            verify or max_workers, progress, mirrors and segments also apply
+            to downloading patch
+        :return: contains, in the same order as targets, the Patcher instance
+            of each target patched, or the exception raised patching it
+        :rtype: list
+        """
+        work_directory = gettempdir() + Patcher.create_work_directory()
+        try:
+            if "https://" in patch[:8] or "http://" in patch[:8]:
+                Backend.download(patch, work_directory + "/patch" +
+                                 path.splitext(patch)[1],
+                                 options.get("progress"),
+                                 mirrors=options.get("mirrors"),
+                                 segments=options.get("segments", 1))
+                patch = work_directory + "/patch" + path.splitext(patch)[1]
+            elif path.isfile(patch) is False:
+                raise Exceptions.PatchError("Patch file with path " + patch +
+                                            " does not exist.")
+            if is_zipfile(patch) is False:
+                unpack_archive(patch, work_directory + "/unpacked")
+                patch = work_directory + "/unpacked"
+            if options.get("skip_manifest_check", False) is False:
+                # content of patch is the same for every target
+                try:
+                    Patcher.check_patch(patch, options.get("max_workers"))
+                except BaseException as error:
+                    return [error] * len(targets)
+                options["skip_payload_check"] = True
+            dump = []
+            with ThreadPoolExecutor(max_targets) as executor:
+                futures = [executor.submit(Patcher, patch, target, **options)
+                           for target in targets]
+                for future in futures:
+                    try:
+                        dump.append(future.result())
+                    except BaseException as error:
+                        # exceptions of bandage derive from BaseException
+                        dump.append(error)
+            return dump
+        finally:
+            rmtree(work_directory)
+
+    @staticmethod
+    def read_journal(target: str) -> list:
+        """
+        Read journal of patch being applied to target.
+
+        :param target: path to application directory
+        :type target: str
+        :return: [list of (operation, path) pairs, True if staging finished,
+            True if all operations finished, index of last operation started
+            or -1, VERSIONS of patch or None]
+        :rtype: list
+        """
+        plan = []
+        staged = False
+        committed = False
+        started = -1
+        versions = None
+        try:
+            with open(path.join(target, Patcher.JOURNAL)) as journal_handle:
+                for line in journal_handle:
+                    try:
+                        record = jsonloads(line)
+                    except ValueError:
+                        # last line may be cut short by a crash
+                        break
+                    if "operation" in record:
+                        plan.append([record["operation"], record["path"]])
+                    elif "started" in record:
+                        started = record["started"]
+                    elif "versions" in record:
+                        versions = record["versions"]
+                    elif record.get("state") == "staged":
+                        staged = True
+                    elif record.get("state") == "committed":
+                        committed = True
         except FileNotFoundError as ParentException:
-            raise Exceptions.PatchError("Missing NAME file(s).") from \
+            raise Exceptions.TargetError(
+                "Target " + target + " has no patch journal.") from \
                 ParentException
+        return [plan, staged, committed, started, versions]
+
+    @staticmethod
+    def journal_operation(target: str, operation: str, item: str,
+                          undo: bool = False) -> None:
+        """
+        Carry out or undo a single journaled operation through renames.
+
+        Operations check the state they find first, so carrying out or undoing
+        an operation that was interrupted, or already done, is safe.
+
+        :param target: path to application directory
+        :type target: str
+        :param operation: "mkdir", "add", "replace" or "remove"
+        :type operation: str
+        :param item: path of item relative to target
+        :type item: str
+        :param undo: if True operation is undone instead, default False
+        :type undo: bool
+        """
+        current = path.join(target, item)
+        new = path.join(target, Patcher.STAGING_DIR, "new", item)
+        old = path.join(target, Patcher.STAGING_DIR, "old", item)
+        if operation == "mkdir":
+            if undo is False and path.isdir(current) is False:
+                mkdir(current)
+            elif undo is True and path.isdir(current) is True and \
+                    not listdir(current):
+                rmdir(current)
+        elif operation == "add":
+            if undo is False and path.lexists(new) is True:
+                replace(new, current)
+            elif undo is True and path.lexists(current) is True:
+                makedirs(path.dirname(new), exist_ok=True)
+                replace(current, new)
+        elif operation == "replace":
+            if undo is False:
+                if path.lexists(new) is True and \
+                        path.lexists(old) is False:
+                    makedirs(path.dirname(old), exist_ok=True)
+                    replace(current, old)
+                if path.lexists(new) is True:
+                    replace(new, current)
+            elif path.lexists(old) is True:
+                if path.lexists(current) is True:
+                    makedirs(path.dirname(new), exist_ok=True)
+                    replace(current, new)
+                replace(old, current)
+        elif operation == "remove":
+            if undo is False and path.lexists(current) is True:
+                makedirs(path.dirname(old), exist_ok=True)
+                replace(current, old)
+            elif undo is True and path.lexists(old) is True:
+                replace(old, current)
+
+    @staticmethod
+    def resume(target: str, max_workers: Union[int, None] = None) -> None:
+        """
+        Carry out remaining operations of patch journaled in target, then \
+            discard the journal and replaced items.
+
+        Each operation moves a staged item into place or a replaced item out
+        of the way with os.replace, so a patch is committed in time
+        proportional to the number of items rather than their size, and can
+        be resumed from its journal after a crash. Replaced and removed items
+        are deleted concurrently once the patch is committed.
+
+        :param target: path to application directory
+        :type target: str
+        :param max_workers: maximum number of threads deleting replaced
+            items, default None
+        :type max_workers: Union[int, None]
+        """
+        plan, staged, committed, started = \
+            Patcher.read_journal(target)[:4]
+        if committed is False:
+            if staged is False:
+                raise Exceptions.TargetError(
+                    "Patch journaled in target " + target + " did not " +
+                    "finish staging and cannot be resumed, roll it back " +
+                    "with bandage.Patcher.rollback.")
+            with open(path.join(target, Patcher.JOURNAL), "a") as \
+                    journal_handle:
+                for x in range(max(started, 0), len(plan)):
+                    journal_handle.write(jsondumps({"started": x}) + "\n")
+                    journal_handle.flush()
+                    Patcher.journal_operation(target, plan[x][0], plan[x][1])
+                journal_handle.write(jsondumps({"state": "committed"}) + "\n")
+                journal_handle.flush()
+                fsync(journal_handle.fileno())
+        Backend.remove_paths(
+            [path.join(target, Patcher.STAGING_DIR, "old", operation[1])
+             for operation in plan if operation[0] in ["replace", "remove"]],
+            max_workers)
+        rmtree(path.join(target, Patcher.STAGING_DIR))
+        remove(path.join(target, Patcher.JOURNAL))
+
+    @staticmethod
+    def rollback(target: str) -> None:
+        """
+        Undo operations of unfinished patch journaled in target, restoring \
+            it to the state before patching, then discard the journal.
+
+        :param target: path to application directory
+        :type target: str
+        """
+        plan, staged, committed, started = \
+            Patcher.read_journal(target)[:4]
+        if committed is True:
+            raise Exceptions.TargetError(
+                "Patch journaled in target " + target + " was already " +
+                "committed, finish it with bandage.Patcher.resume.")
+        for x in range(started, -1, -1):
+            Patcher.journal_operation(target, plan[x][0], plan[x][1],
+                                      undo=True)
+        if path.isdir(path.join(target, Patcher.STAGING_DIR)) is True:
+            rmtree(path.join(target, Patcher.STAGING_DIR))
+        remove(path.join(target, Patcher.JOURNAL))
+
+    @staticmethod
+    def read_index(target: str) -> dict:
+        """
+        Read index of files in target written by bandage.Patcher.verify.
+
+        :param target: path to application directory
+        :type target: str
+        :return: dict of file path to [size, modification time in
+            nanoseconds, sha256 hex digest], empty if target has no index
+        :rtype: dict
+        """
         try:
-            if suppress_version_check is False:
-                with open(gettempdir() + self.WORK_DIR + "/VERSIONS") as \
-                        versions_handle:
-                    patch_versions = versions_handle.read()
-                self.patch_versions = patch_versions.split(" -> ")
-                with open(path.join(target, "VERSION")) as version_handle:
-                    current_version = version_handle.read()
-                if current_version != self.patch_versions[0]:
-                    raise Exceptions.VersionError(
-                        "VERSIONS file specifies a different upgrade-from " +
-                        "version compared to the target VERSION file. " +
-                        "Target is on " + current_version +
-                        ", and patch supporting " + self.patch_versions[0] +
-                        ".")
-        except FileNotFoundError as ParentException:
-            raise Exceptions.VersionError("Missing VERSION(S) file(s).") from \
+            with open(path.join(target, Patcher.INDEX)) as index_handle:
+                return jsonloads(index_handle.read())
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    @staticmethod
+    def write_index(target: str, index: dict) -> None:
+        """
+        Write index of files to target, replacing the previous index \
+            atomically.
+
+        :param target: path to application directory
+        :type target: str
+        :param index: dict of file path to [size, modification time in
+            nanoseconds, sha256 hex digest]
+        :type index: dict
+        """
+        with open(path.join(target, Patcher.INDEX + ".tmp"), "w") as \
+                index_handle:
+            jsondump(index, index_handle)
+            index_handle.flush()
+            fsync(index_handle.fileno())
+        replace(path.join(target, Patcher.INDEX + ".tmp"),
+                path.join(target, Patcher.INDEX))
+
+    @staticmethod
+    def index_files(target: str, files: list, index: dict,
+                    known: Union[dict, None] = None,
+                    max_workers: Union[int, None] = None) -> dict:
+        """
+        Stat files of target and hash those not matching index, return \
+            their up to date index entries.
+
+        Files whose size and modification time match index keep their
+        digest, files listed in known with a matching size take the digest
+        from there, remaining files are hashed concurrently with
+        Backend.digest_files.
+
+        :param target: path to application directory
+        :type target: str
+        :param files: paths of files relative to target, separated by /
+        :type files: list
+        :param index: dict of file path to [size, modification time in
+            nanoseconds, sha256 hex digest]
+        :type index: dict
+        :param known: dict of file path to [size, sha256 hex digest] of files
+            with known content, default None
+        :type known: Union[dict, None]
+        :param max_workers: maximum number of hashing threads, default None
+        :type max_workers: Union[int, None]
+        :return: dict of file path to [size, modification time in
+            nanoseconds, sha256 hex digest]
+        :rtype: dict
+        """
+        dump = {}
+        pending = []
+        for file in files:
+            status = stat(path.join(target, file))
+            entry = index.get(file)
+            if entry is not None and entry[0] == status.st_size and \
+                    entry[1] == status.st_mtime_ns:
+                dump[file] = entry
+            elif known is not None and file in known and \
+                    known[file][0] == status.st_size:
+                dump[file] = [status.st_size, status.st_mtime_ns,
+                              known[file][1]]
+            else:
+                dump[file] = [status.st_size, status.st_mtime_ns, None]
+                pending.append(file)
+        digests = Backend.digest_files(
+            [path.join(target, file) for file in pending],
+            max_workers=max_workers)
+        for x in range(0, len(pending)):
+            dump[pending[x]][2] = digests[x]
+        return dump
+
+    @staticmethod
+    def list_target(target: str, items: Union[list, None] = None) -> list:
+        """
+        List files of target, leaving out the index, journal and staging \
+            directory of Patcher.
+
+        :param target: path to application directory
+        :type target: str
+        :param items: if not None only files that are or are under these
+            items, relative to target, are listed, default None
+        :type items: Union[list, None]
+        :return: paths of files relative to target, separated by /
+        :rtype: list
+        """
+        if items is None:
+            return [relative for relative, is_directory in
+                    Backend.list_directory(target) if is_directory is False
+                    and relative.partition("/")[0] not in [
+                        Patcher.INDEX, Patcher.INDEX + ".tmp",
+                        Patcher.JOURNAL, Patcher.STAGING_DIR]]
+        dump = []
+        for item in items:
+            current = path.join(target, item)
+            if path.isdir(current) is True and path.islink(current) is False:
+                dump.extend(item + "/" + relative for relative, is_directory
+                            in Backend.list_directory(current)
+                            if is_directory is False)
+            elif path.isfile(current) is True:
+                dump.append(item)
+        return dump
+
+    @staticmethod
+    def update_index(target: str, items: list,
+                     known: Union[dict, None] = None,
+                     max_workers: Union[int, None] = None) -> None:
+        """
+        Update index of target for items changed by a patch.
+
+        Entries of items and files under them are dropped, then files now
+        present under them are indexed again, so only changed items are
+        hashed.
+
+        :param target: path to application directory
+        :type target: str
+        :param items: paths of changed items relative to target
+        :type items: list
+        :param known: dict of file path to [size, sha256 hex digest] of files
+            with known content, default None
+        :type known: Union[dict, None]
+        :param max_workers: maximum number of hashing threads, default None
+        :type max_workers: Union[int, None]
+        """
+        index = Patcher.read_index(target)
+        changed = set(items)
+        for file in list(index.keys()):
+            if Backend.find_parent(changed, file) is not None:
+                del index[file]
+        index.update(Patcher.index_files(
+            target, Patcher.list_target(target, items), index, known,
+            max_workers))
+        Patcher.write_index(target, index)
+
+    @staticmethod
+    def verify(target: str, max_workers: Union[int, None] = None) -> list:
+        """
+        Compare files of target against its index, return differences.
+
+        Only files whose size or modification time changed since they were
+        indexed are hashed again, files whose content is unchanged have their
+        modification time updated in the index. If target has no index, every
+        file is hashed and the index is created, reporting no differences.
+        Patcher keeps the index up to date for the items it patches.
+
+        :param target: path to application directory
+        :type target: str
+        :param max_workers: maximum number of hashing threads, default None
+        :type max_workers: Union[int, None]
+        :return: [paths of modified files, paths of missing files, paths of
+            files not in index], relative to target
+        :rtype: list
+        """
+        if path.isdir(target) is False:
+            raise Exceptions.TargetError("Target directory " + target +
+                                         " does not exist.")
+        index = Patcher.read_index(target)
+        files = Patcher.list_target(target)
+        if not index:
+            Patcher.write_index(target, Patcher.index_files(
+                target, files, index, max_workers=max_workers))
+            return [[], [], []]
+        present = set(files)
+        current = Patcher.index_files(
+            target, [file for file in files if file in index], index,
+            max_workers=max_workers)
+        modified = []
+        updated = False
+        for file, entry in current.items():
+            if entry[2] != index[file][2]:
+                modified.append(file)
+            elif entry[1] != index[file][1]:
+                index[file] = entry
+                updated = True
+        if updated is True:
+            Patcher.write_index(target, index)
+        return [sorted(modified),
+                sorted(file for file in index if file not in present),
+                sorted(file for file in files if file not in index)]
+
+    def target_digest(self, name: str) -> str:
+        """
+        Hash file of target, unless its size and modification time match the \
+            index of target, return sha256 hex digest.
+
+        :param name: path of file relative to target, separated by /
+        :type name: str
+        :return: hex digest of file content
+        :rtype: str
+        """
+        entry = self.target_index.get(name)
+        if entry is not None:
+            status = stat(path.join(self.target, name))
+            if entry[0] == status.st_size and entry[1] == status.st_mtime_ns:
+                return entry[2]
+        return Backend.file_digest(path.join(self.target, name))
+
+    def entry_matches(self, item: str) -> bool:
+        """
+        Check type of item in target against its v2 CHANGE.json entry, \
+            items without entry or without type match.
+
+        :param item: path of item relative to target
+        :type item: str
+        :return: False if item differs from its entry
+        :rtype: bool
+        """
+        entry = self.entries.get(item, {})
+        if entry.get("type") is None:
+            return True
+        status = stat(path.join(self.target, item))
+        return S_ISDIR(status.st_mode) is (entry["type"] == "directory")
+
+    def patch_item(self, name: str) -> Union[str, None]:
+        """
+        Look up item in patch, return "file" or "directory", or None if the \
+            patch has no such item.
+
+        :param name: path of item in patch, i.e. add/example.txt
+        :type name: str
+        :return: type of item
+        :rtype: Union[str, None]
+        """
+        if self.archive is None:
+            if path.isfile(self.patch_root + "/" + name) is True:
+                return "file"
+            if path.isdir(self.patch_root + "/" + name) is True:
+                return "directory"
+            return None
+        if name in self.listing[0]:
+            return "file"
+        if name in self.listing[1]:
+            return "directory"
+        return None
+
+    def open_patch_file(self, name: str) -> object:
+        """
+        Open file in patch for binary reading, raises FileNotFoundError if \
+            missing.
+
+        :param name: path of file in patch
+        :type name: str
+        :return: binary file handle
+        :rtype: object
+        """
+        if self.archive is None:
+            return open(self.patch_root + "/" + name, "rb")
+        try:
+            return self.archive.open(name)
+        except KeyError as ParentException:
+            raise FileNotFoundError(
+                "Patch archive has no member " + name + ".") from \
                 ParentException
+
+    def read_patch_file(self, name: str) -> str:
+        """
+        Read header file such as NAME or VERSIONS from patch, raises \
+            FileNotFoundError if missing.
+
+        :param name: path of header file in patch
+        :type name: str
+        :return: contents of header file
+        :rtype: str
+        """
+        with TextIOWrapper(Patcher.open_patch_file(self, name)) as \
+                patch_file_handle:
+            return patch_file_handle.read()
+
+    def index_archive(self) -> None:
+        """
+        Map each directory item for addition or replacement to the members \
+            of the patch archive under it, dumped to self.members.
+
+        Done in a single pass over the archive, so that extracting directory
+        items does not search the whole archive once per item.
+        """
+        self.members = {}
+        if self.archive is None:
+            return
+        for operation in ["add", "replace"]:
+            for item in self.change[operation]:
+                if Patcher.patch_item(self, operation + "/" + item) == \
+                        "directory":
+                    self.members[operation + "/" + item] = []
+        for member in self.archive.infolist():
+            candidate = member.filename.rstrip("/").rpartition("/")[0]
+            while candidate != "":
+                if candidate in self.members:
+                    self.members[candidate].append(member)
+                    break
+                candidate = candidate.rpartition("/")[0]
+
+    def list_item(self, name: str) -> list:
+        """
+        List contents of directory item of patch.
+
+        :param name: path of directory item in patch, i.e. add/example
+        :type name: str
+        :return: contains (relative path, True if directory) pairs
+        :rtype: list
+        """
+        dump = []
+        if self.archive is not None:
+            for member in self.members[name]:
+                dump.append((member.filename[len(name) + 1:].rstrip("/"),
+                             member.is_dir()))
+            return dump
+        return Backend.list_directory(self.patch_root + "/" + name)
+
+    def find_applied(self, max_workers: Union[int, None] = None) -> None:
+        """
+        Find items of target already in the state the patch leaves them in, \
+            dump them to self.applied and drop them from self.change.
+
+        Items present in target are compared concurrently in a thread pool.
+
+        :param max_workers: maximum number of hashing threads, default None
+        :type max_workers: Union[int, None]
+        """
+        candidates = []
+        for operation in ["add", "replace", "delta", "move", "copy"]:
+            for item in self.change[operation]:
+                # files moved or copied into directory items are compared
+                # along with their directory item
+                if operation in ["move", "copy"] and \
+                        self.copies[item] is not None:
+                    continue
+                if path.lexists(path.join(self.target, item)) is True:
+                    candidates.append((operation, item))
+        for item in self.change["remove"]:
+            if path.lexists(path.join(self.target, item)) is False:
+                self.applied.append(("remove", item))
+        if candidates:
+            with ThreadPoolExecutor(max_workers) as executor:
+                results = list(executor.map(
+                    lambda candidate: Patcher.item_applied(self, *candidate),
+                    candidates))
+            self.applied.extend(candidates[x] for x in range(
+                0, len(candidates)) if results[x] is True)
+        for operation in ["add", "replace", "delta", "remove", "move",
+                          "copy"]:
+            skipped = set(item for applied_operation, item in self.applied
+                          if applied_operation == operation)
+            self.change[operation] = [item for item in self.change[operation]
+                                      if item not in skipped]
+        shipped = set(self.change["add"] + self.change["replace"])
+        for operation in ["move", "copy"]:
+            self.change[operation] = [
+                item for item in self.change[operation] if
+                self.copies[item] is None or self.copies[item] in shipped]
+        if self.patch_versions is not None and \
+                ("replace", "VERSION") not in self.applied:
+            try:
+                with open(path.join(self.target, "VERSION")) as \
+                        version_handle:
+                    if version_handle.read() == self.patch_versions[1]:
+                        self.applied.append(("replace", "VERSION"))
+            except (FileNotFoundError, IsADirectoryError):
+                pass
+
+    def check_manifest(self, skip_keep_check: bool = False,
+                       max_workers: Union[int, None] = None,
+                       skip_payload_check: bool = False) -> None:
+        """
+        Compare files of target and patch against the sizes and digests \
+            recorded in MANIFEST.json of patch, raises TargetError or \
+            PatchError on mismatch.
+
+        Files listed for keeping, replacement and delta replacement, and
+        files moved or copied from in target must match the old release, files
+        for addition and replacement in patch must match the new release, see
+        bandage.Patcher.check_payload. Sizes are compared first, then files
+        are hashed in a thread pool, all before anything in target is
+        changed. Patches without MANIFEST.json are not checked.
+
+        :param skip_keep_check: if True files listed for keeping are not
+            checked, default False
+        :type skip_keep_check: bool
+        :param max_workers: maximum number of hashing threads, default None
+        :type max_workers: Union[int, None]
+        :param skip_payload_check: if True files of patch are not checked,
+            default False
+        :type skip_payload_check: bool
+        """
         try:
-            with open(gettempdir() + self.WORK_DIR + "/CHANGE.json") as \
-                    changelog_handle:
-                self.change = jsonload(changelog_handle)
-        except FileNotFoundError as ParentException:
-            raise Exceptions.PatchError(
-                "CHANGE.json file of patch archive is missing.") from \
-                    ParentException
-        for x in self.change:
-            self.change[x] = self.change[x].strip("[]").split(", ")
-            for y in range(0, len(self.change[x])):
-                self.change[x][y] = self.change[x][y].strip("'")
+            checksums = jsonloads(Patcher.read_patch_file(self,
+                                                          "MANIFEST.json"))
+        except FileNotFoundError:
+            return
+        self.checksums = checksums
+        checked = set(self.change["replace"] + self.change["delta"])
         if skip_keep_check is False:
-            for x in range(0, len(self.change["keep"])):
-                if path.isdir(path.join(self.target, self.change["keep"][x])) \
-                        is not True and path.isfile(
-                            path.join(self.target, self.change["keep"][x])) \
-                        is not True:
+            checked.update(self.change["keep"])
+        for operation in ["move", "copy"]:
+            checked.update(self.entries[item]["source"] for item in
+                           self.change[operation]
+                           if self.entries[item].get("source") is not None)
+        # (path relative to target, digest) pairs
+        target_files = []
+        for name, (size, digest) in checksums["old"].items():
+            item = Backend.find_parent(checked, name)
+            if item is None:
+                continue
+            current = path.join(self.target, name)
+            if path.isfile(current) is False or \
+                    stat(current).st_size != size:
+                raise Exceptions.TargetError(
+                    "Target differs from the release the patch was made " +
+                    "against. Raised on " + name + ".")
+            target_files.append((name, digest))
+        with ThreadPoolExecutor(max_workers) as executor:
+            if checksums["algorithm"] == "sha256":
+                # files unchanged since indexed are not hashed again
+                target_digests = executor.map(
+                    partial(Patcher.target_digest, self),
+                    [pair[0] for pair in target_files])
+            else:
+                target_digests = executor.map(
+                    partial(Backend.file_digest,
+                            algorithm=checksums["algorithm"]),
+                    [path.join(self.target, pair[0])
+                     for pair in target_files])
+            for pair, digest in zip(target_files, target_digests):
+                if pair[1] != digest:
                     raise Exceptions.TargetError(
-                        "Target missing item(s) that should exist, listed " +
-                        "under the keep operation. Raised on " +
-                        self.change["keep"][x] + ".")
-        for x in range(0, len(self.change["add"])):
-            if path.isdir(gettempdir() + self.WORK_DIR + "/add/" +
-                          self.change["add"][x]) is not True and path.isfile(
-                              gettempdir() + self.WORK_DIR + "/add/" +
-                              self.change["add"][x]) is not True:
-                raise Exceptions.PatchError(
-                    "Missing item(s) for addition. Raised on " +
-                    self.change["add"][x] + ".")
-        for x in range(0, len(self.change["replace"])):
-            if path.isdir(gettempdir() + self.WORK_DIR + "/replace/" +
-                          self.change["replace"][x]) is not True and \
-                              path.isfile(gettempdir() + self.WORK_DIR +
-                                          "/replace/" + self.change["replace"]
-                                          [x]) is not True:
-                raise Exceptions.PatchError(
-                    "Missing item(s) for replacement. Raised on " +
-                    self.change["replace"][x] + ".")
-        for x in range(0, len(self.change["add"])):
-            component = \
-                Backend.directory_split_recursive(self.change["add"][x])
-            for a in component:
-                if path.isdir(path.join(self.target, a)) is False:
-                    mkdir(path.join(self.target, a))
-            if path.isfile(gettempdir() + self.WORK_DIR + "/add/" +
-                           self.change["add"][x]):
-                copyfile(gettempdir() + self.WORK_DIR + "/add/" +
-                         self.change["add"][x],
-                         path.join(self.target, self.change["add"][x]))
-            if path.isdir(gettempdir() + self.WORK_DIR + "/add/" +
-                          self.change["add"][x]):
-                copytree(gettempdir() + self.WORK_DIR + "/add/" +
-                         self.change["add"][x],
-                         path.join(self.target, self.change["add"][x]))
-        for x in range(0, len(self.change["replace"])):
-            if path.isfile(path.join(self.target,
-                                     self.change["replace"][x])) is True:
-                remove(path.join(self.target, self.change["replace"][x]))
-                copyfile(gettempdir() + self.WORK_DIR + "/replace/" +
-                         self.change["replace"][x],
-                         path.join(self.target, self.change["replace"][x]))
-            elif path.isdir(path.join(self.target,
-                                      self.change["replace"][x])) is True:
-                rmtree(path.join(self.target, self.change["replace"][x]))
-                copytree(gettempdir() + self.WORK_DIR + "/replace/" +
-                         self.change["replace"][x],
-                         path.join(self.target, self.change["replace"][x]))
+                        "Target differs from the release the patch was " +
+                        "made against. Raised on " + pair[0] + ".")
+        if skip_payload_check is False:
+            Patcher.check_payload(checksums, self.change, self.archive,
+                                  None if self.archive is None else
+                                  self.listing[0], self.patch_root,
+                                  max_workers)
+
+    @staticmethod
+    def check_payload(checksums: dict, change: dict,
+                      archive: Union[ZipFile, None],
+                      files: Union[dict, None], patch_root: str,
+                      max_workers: Union[int, None] = None) -> None:
+        """
+        Compare files for addition and replacement in patch against the \
+            sizes and digests recorded for the new release in MANIFEST.json, \
+            raises PatchError on mismatch.
+
+        Sizes are compared first, then files are hashed in a thread pool.
+
+        :param checksums: contents of MANIFEST.json
+        :type checksums: dict
+        :param change: parsed CHANGE.json of patch
+        :type change: dict
+        :param archive: zip patch archive, or None if patch is unpacked
+        :type archive: Union[ZipFile, None]
+        :param files: member name -> member of files in archive, or None if
+            patch is unpacked
+        :type files: Union[dict, None]
+        :param patch_root: path to directory of unpacked patch
+        :type patch_root: str
+        :param max_workers: maximum number of hashing threads, default None
+        :type max_workers: Union[int, None]
+        """
+        operations = {}
+        for operation in ["add", "replace"]:
+            for item in change[operation]:
+                operations[item] = operation
+        copies = set(change["move"] + change["copy"])
+        # (member or path in unpacked patch, digest) pairs
+        patch_files = []
+        for name, (size, digest) in checksums["new"].items():
+            item = Backend.find_parent(operations, name)
+            # moved and copied files are not in patch
+            if item is None or name in copies:
+                continue
+            name = operations[item] + "/" + name
+            if archive is not None:
+                source = files.get(name)
+                found = source is not None and source.file_size == size
             else:
-                raise Exceptions.TargetError(
-                    "Target " + self.change["replace"][x] +
-                    " for replacement does not exist.")
-        for x in range(0, len(self.change["remove"])):
-            if path.isdir(path.join(self.target,
-                                    self.change["remove"][x])) is True:
-                rmtree(path.join(self.target,
-                                 self.change["remove"][x]))
-            elif path.isfile(path.join(self.target,
-                                       self.change["remove"][x])) is True:
-                remove(path.join(self.target, self.change["remove"][x]))
+                source = patch_root + "/" + name
+                found = path.isfile(source) is True and \
+                    stat(source).st_size == size
+            if found is False:
+                raise Exceptions.PatchError(
+                    "Patch content differs from its manifest. Raised on " +
+                    name + ".")
+            patch_files.append((source, digest))
+        with ThreadPoolExecutor(max_workers) as executor:
+            if archive is not None:
+                patch_digests = executor.map(
+                    partial(Backend.archive_digest, archive,
+                            algorithm=checksums["algorithm"]),
+                    [pair[0] for pair in patch_files])
             else:
-                raise Exceptions.TargetError(
-                    "Target " + self.change["remove"][x] +
-                    " for removal does not exist, or is not a file or" +
-                    " directory.")
-        with open(self.target + "/VERSION", "w") as version_overwrite_handle:
-            # this is redundant, VERSION gets overwritten by replace anyways,
-            # since Weave detects two different version files automatically
-            # if one day this module needed to be slimmed down, remove this
-            # for a slight amount of I/O performance gain
-            version_overwrite_handle.truncate(0)
-            version_overwrite_handle.write(self.patch_versions[1])
-        rmtree(gettempdir() + self.WORK_DIR)
+                patch_digests = executor.map(
+                    partial(Backend.file_digest,
+                            algorithm=checksums["algorithm"]),
+                    [pair[0] for pair in patch_files])
+            for pair, digest in zip(patch_files, patch_digests):
+                if pair[1] != digest:
+                    raise Exceptions.PatchError(
+                        "Patch content differs from its manifest. Raised " +
+                        "on " + (pair[0] if archive is None else
+                                 pair[0].filename) + ".")
 
     @staticmethod
-    def create_work_directory() -> str:
+    def check_patch(patch: str, max_workers: Union[int, None] = None) -> None:
         """
-        Create directory under the OS temporary directory with a unique name \
-            to prevent conflicting instances.
+        Compare files for addition and replacement in patch against its \
+            MANIFEST.json once, for bandage.Patcher.fleet, raises PatchError \
+            on mismatch.
+
+        Patches without MANIFEST.json or CHANGE.json are not checked, the
+        latter is then reported by Patcher.
+
+        :param patch: path to zip patch archive, or to directory of an
+            unpacked patch
+        :type patch: str
+        :param max_workers: maximum number of hashing threads, default None
+        :type max_workers: Union[int, None]
+        """
+        archive = ZipFile(patch) if path.isdir(patch) is False else None
+        try:
+            try:
+                if archive is not None:
+                    checksums = jsonloads(archive.read("MANIFEST.json"))
+                    change_handle = archive.open("CHANGE.json")
+                else:
+                    with open(patch + "/MANIFEST.json") as manifest_handle:
+                        checksums = jsonloads(manifest_handle.read())
+                    change_handle = open(patch + "/CHANGE.json", "rb")
+            except (KeyError, FileNotFoundError):
+                return
+            with TextIOWrapper(change_handle, encoding="utf-8") as \
+                    changelog_handle:
+                change = Backend.read_change(changelog_handle)[0]
+            Patcher.check_payload(checksums, change, archive,
+                                  None if archive is None else
+                                  Backend.archive_listing(archive)[0], patch,
+                                  max_workers)
+        finally:
+            if archive is not None:
+                archive.close()
+
+    def item_applied(self, operation: str, item: str) -> bool:
+        """
+        Check whether item of target is already in the state the patch \
+            leaves it in.
+
+        Files are compared by size first, then by CRC-32 against the central
+        directory of zip patches, or by digest against unpacked patches.
+        Files for delta replacement are compared against the size and digest
+        recorded in their delta, moved and copied files against the size and
+        digest recorded in CHANGE.json, or against the file of patch they are
+        copied from. Directories must hold the same items as the patch and
+        the files moved or copied into them, and nothing else.
+
+        :param operation: "add", "replace", "delta", "move" or "copy"
+        :type operation: str
+        :param item: path of item relative to target
+        :type item: str
+        :return: True if item can be skipped
+        :rtype: bool
+        """
+        current = path.join(self.target, item)
+        if operation == "delta":
+            if path.isfile(current) is False:
+                return False
+            with Patcher.open_patch_file(self, "delta/" + item) as \
+                    delta_handle:
+                new_size, new_digest = Backend.delta_header(
+                    delta_handle, current)[1:]
+            return stat(current).st_size == new_size and \
+                Patcher.target_digest(self, item) == new_digest.hex()
+        if operation in ["move", "copy"]:
+            entry = self.entries[item]
+            if entry.get("payload") is not None:
+                return Patcher.file_applied(self, entry["payload"], item)
+            if path.islink(current) is True or \
+                    path.isfile(current) is False or \
+                    entry.get("digest") is None:
+                return False
+            return stat(current).st_size == entry.get("size") and \
+                Patcher.target_digest(self, item) == entry["digest"]
+        name = operation + "/" + item
+        if Patcher.patch_item(self, name) == "file":
+            return Patcher.file_applied(self, name, item)
+        if path.islink(current) is True or path.isdir(current) is False:
+            return False
+        expected = Patcher.list_item(self, name)
+        copied = [copy for copy in self.copies if self.copies[copy] == item]
+        if set(expected + [(copy[len(item) + 1:], False) for copy in copied]) \
+                != set(Backend.list_directory(current)):
+            return False
+        for relative, is_directory in expected:
+            if is_directory is False and Patcher.file_applied(
+                    self, name + "/" + relative,
+                    item + "/" + relative) is False:
+                return False
+        for copy in copied:
+            if Patcher.item_applied(self, self.entries[copy]["op"], copy) is \
+                    False:
+                return False
+        return True
+
+    def file_applied(self, name: str, item: str) -> bool:
+        """
+        Check whether file of target has the same content as file of patch.
+
+        :param name: path of file in patch, i.e. add/example.txt
+        :type name: str
+        :param item: path of file relative to target
+        :type item: str
+        :return: True if content is the same
+        :rtype: bool
+        """
+        current = path.join(self.target, item)
+        if path.islink(current) is True or path.isfile(current) is False:
+            return False
+        if self.archive is not None:
+            member = self.listing[0][name]
+            return stat(current).st_size == member.file_size and \
+                Backend.file_crc32(current) == member.CRC
+        source = self.patch_root + "/" + name
+        return stat(current).st_size == stat(source).st_size and \
+            Patcher.target_digest(self, item) == Backend.file_digest(source)
+
+    def extract_file(self, name: str, destination: str) -> None:
+        """
+        Write file of patch to destination, parent directories must exist.
+
+        :param name: path of file in patch, i.e. add/example.txt
+        :type name: str
+        :param destination: path to write file to
+        :type destination: str
+        """
+        if self.archive is None and self.patch_root != self.patch:
+            # the unpacked patch is private to this session and read once
+            Backend.link_file(self.patch_root + "/" + name, destination)
+        elif self.archive is None:
+            # unpacked patch directories given to Patcher may be shared with
+            # other targets, so their files are never linked into target
+            Backend.copy_file(self.patch_root + "/" + name, destination)
+        else:
+            Backend.archive_extract(self.archive, self.listing[0][name],
+                                    destination)
+
+    def stage_delta(self, item: str) -> None:
+        """
+        Rebuild file listed for delta replacement into the staging directory.
+
+        :param item: path of file relative to target
+        :type item: str
+        """
+        with Patcher.open_patch_file(self, "delta/" + item) as delta_handle:
+            Backend.delta_apply(path.join(self.target, item), delta_handle,
+                                path.join(self.staging, "new", item))
+
+    def stage_copy(self, operation: str, item: str) -> None:
+        """
+        Write moved or copied file into the staging directory.
+
+        Files moved from target are hardlinked when their mode is kept, since
+        their source leaves target with the patch this amounts to a rename.
+        Sources in target are checked against the digest recorded in
+        CHANGE.json unless MANIFEST.json was checked.
+
+        :param operation: "move" or "copy"
+        :type operation: str
+        :param item: path of file relative to target
+        :type item: str
+        """
+        entry = self.entries[item]
+        destination = path.join(self.staging, "new", item)
+        if entry.get("payload") is not None:
+            extracted = path.join(self.staging, "new",
+                                  entry["payload"].partition("/")[2])
+            if path.isfile(extracted) is True:
+                Backend.copy_file(extracted, destination)
+            elif self.archive is None:
+                # item of payload was already applied and not extracted
+                Backend.copy_file(self.patch_root + "/" + entry["payload"],
+                                  destination)
+            else:
+                Patcher.extract_file(self, entry["payload"], destination)
+            return
+        source = path.join(self.target, entry["source"])
+        if self.checksums is None and entry.get("digest") is not None and \
+                Patcher.target_digest(self, entry["source"]) != \
+                entry["digest"]:
+            raise Exceptions.TargetError(
+                "Target differs from the release the patch was made " +
+                "against. Raised on " + entry["source"] + ".")
+        if operation == "move" and entry.get("mode") in [
+                None, S_IMODE(stat(source).st_mode)]:
+            Backend.link_file(source, destination)
+        else:
+            Backend.copy_file(source, destination)
+
+    def stage(self, verify: bool = False,
+              max_workers: Union[int, None] = None) -> None:
+        """
+        Write items for addition and replacement, delta-rebuilt, moved and \
+            copied files and the new VERSION under the staging directory in \
+            target.
+
+        Directories are created first, files are then extracted and rebuilt
+        concurrently in a thread pool, moved and copied files are written
+        once extraction is done.
+
+        :param verify: if True staged items are compared against the patch,
+            default False
+        :type verify: bool
+        :param max_workers: maximum number of threads for file operations
+            and hashing, default None
+        :type max_workers: Union[int, None]
+        """
+        mkdir(self.staging)
+        mkdir(path.join(self.staging, "new"))
+        mkdir(path.join(self.staging, "old"))
+        directories = set()
+        # (path of file in patch, staged path) pairs
+        files = []
+        for operation in ["add", "replace"]:
+            for item in self.change[operation]:
+                destination = path.join(self.staging, "new", item)
+                directories.add(path.dirname(destination))
+                # replacement may change a file into a directory or vice
+                # versa, staging follows the type of the item in patch
+                if Patcher.patch_item(self, operation + "/" + item) == "file":
+                    files.append((operation + "/" + item, destination))
+                    continue
+                directories.add(destination)
+                for relative, is_directory in Patcher.list_item(
+                        self, operation + "/" + item):
+                    if is_directory is True:
+                        directories.add(path.join(destination, relative))
+                    else:
+                        directories.add(path.dirname(
+                            path.join(destination, relative)))
+                        files.append((operation + "/" + item + "/" + relative,
+                                      path.join(destination, relative)))
+        for item in self.change["delta"] + self.change["move"] + \
+                self.change["copy"]:
+            directories.add(path.dirname(path.join(self.staging, "new",
+                                                   item)))
+        # sorted, so parent directories are created before their children
+        for directory in sorted(directories):
+            makedirs(directory, exist_ok=True)
+        with ThreadPoolExecutor(max_workers) as executor:
+            futures = [executor.submit(Patcher.extract_file, self, name,
+                                       destination)
+                       for name, destination in files]
+            futures.extend(executor.submit(Patcher.stage_delta, self, item)
+                           for item in self.change["delta"])
+            for future in futures:
+                future.result()
+            # copies of payloads are taken from their extracted files
+            futures = [executor.submit(Patcher.stage_copy, self, operation,
+                                       item)
+                       for operation in ["move", "copy"]
+                       for item in self.change[operation]]
+            for future in futures:
+                future.result()
+        for operation in ["add", "replace", "delta", "move", "copy"]:
+            for item in self.change[operation]:
+                if self.entries.get(item, {}).get("mode") is not None:
+                    chmod(path.join(self.staging, "new", item),
+                          self.entries[item]["mode"])
+        if self.patch_versions is not None and \
+                ("replace", "VERSION") not in self.applied:
+            # this is redundant, VERSION gets replaced anyways, since Weave
+            # detects two different version files automatically
+            with open(path.join(self.staging, "new", "VERSION"), "w") as \
+                    version_overwrite_handle:
+                version_overwrite_handle.write(self.patch_versions[1])
+        if verify is True:
+            Patcher.verify_staged(self, max_workers)
+
+    def verify_staged(self, max_workers: Union[int, None] = None) -> None:
+        """
+        Compare staged items for addition and replacement against their \
+            content in the patch, raises PatchError on mismatch.
 
-        :return: generated tempdir name
-        :rtype: str
+        :param max_workers: maximum number of hashing threads, default None
+        :type max_workers: Union[int, None]
         """
-        identifier = "/bandage_patcher_session_" + md5(
-            str(time()).encode(encoding="ascii", errors="replace")).hexdigest()
-        mkdir(gettempdir() + identifier)
-        return identifier
+        if self.archive is not None:
+            # (member, staged path) pairs of every file to be compared
+            pairs = []
+            for operation in ["add", "replace"]:
+                for item in self.change[operation]:
+                    if operation + "/" + item in self.listing[0]:
+                        pairs.append((self.listing[0][operation + "/" + item],
+                                      path.join(self.staging, "new", item)))
+                        continue
+                    for member in self.members[operation + "/" + item]:
+                        if member.is_dir() is False:
+                            pairs.append((member, path.join(
+                                self.staging, "new", item, member.filename[
+                                    len(operation + "/" + item) + 1:])))
+            for member, target_path in pairs:
+                if path.isfile(target_path) is False or \
+                        stat(target_path).st_size != member.file_size:
+                    raise Exceptions.PatchError(
+                        "Staged item does not match patch. " +
+                        "Raised on " + target_path + ".")
+            if not pairs:
+                return
+            with ThreadPoolExecutor(max_workers) as executor:
+                member_digests = executor.map(
+                    partial(Backend.archive_digest, self.archive),
+                    [pair[0] for pair in pairs])
+                target_digests = executor.map(Backend.file_digest,
+                                              [pair[1] for pair in pairs])
+                for pair, member_digest, target_digest in zip(
+                        pairs, member_digests, target_digests):
+                    if member_digest != target_digest:
+                        raise Exceptions.PatchError(
+                            "Staged item does not match patch. " +
+                            "Raised on " + pair[1] + ".")
+            return
+        pairs = []
+        for operation in ["add", "replace"]:
+            for item in self.change[operation]:
+                source = self.patch_root + "/" + operation + "/" + item
+                if path.isdir(source) is True:
+                    for result in Backend.compare_trees(
+                            source, path.join(self.staging, "new", item),
+                            max_workers):
+                        # moved and copied files are not in patch
+                        if result[0] != "keep" and not (
+                                result[0] == "add" and item + "/" +
+                                result[1] in self.copies):
+                            raise Exceptions.PatchError(
+                                "Staged item does not match patch. " +
+                                "Raised on " + item + "/" +
+                                result[1] + ".")
+                else:
+                    pairs.append((source,
+                                  path.join(self.staging, "new", item)))
+        results = Backend.compare_files(pairs, max_workers=max_workers)
+        for x in range(0, len(pairs)):
+            if results[x] is False:
+                raise Exceptions.PatchError(
+                    "Staged item does not match patch. Raised on " +
+                    pairs[x][1] + ".")
 
 
 class Weave:
@@ -307,16 +3221,25 @@ class Weave:
 
     def __init__(self, release_old: str, release_new: str, output_path: str,
                  set_name: Union[str, None] = None,
-                 suppress_missing_versions: bool = False):
+                 suppress_missing_versions: bool = False,
+                 max_workers: Union[int, None] = None, delta: bool = False,
+                 unpack: bool = True, manifest: bool = True,
+                 progress: Union[Callable, None] = None,
+                 change_format: int = 2,
+                 digests: Union[dict, None] = None,
+                 cache_directory: Union[str, None] = None,
+                 cache_size: int = 268435456):
         """
         Take two release files, and compare them for differences, then \
             generate patch file to given output path.
 
         Inorganic and for robots.
 
-        :param release_old: web address or path to old release file
+        :param release_old: web address or path to old release file, or path
+            to directory of unpacked old release if unpack is True
         :type release_old: str
-        :param release_new: web address or path to new release file
+        :param release_new: web address or path to new release file, or path
+            to directory of unpacked new release if unpack is True
         :type release_new: str
         :param output_path: path to output archive, if archive already exists,
             deletes archive and "overwrites" it with the new archive file
@@ -329,52 +3252,133 @@ class Weave:
             Patcher must be directed to the patch archive manually, default
             False
         :type suppress_missing_versions: bool
+        :param max_workers: maximum number of threads hashing files for
+            comparison, if None, decided by
+            concurrent.futures.ThreadPoolExecutor, default None
+        :type max_workers: Union[int, None]
+        :param delta: if True files changed between releases are stored as
+            binary deltas against the old release when smaller than the new
+            file, full copies are stored otherwise, default False
+        :type delta: bool
+        :param unpack: if False releases are not unpacked, both must be zip
+            archives, which are compared through the sizes and CRC-32 values
+            of their central directories, and members that differ are
+            streamed straight into the patch archive, default True
+        :type unpack: bool
+        :param manifest: if True size and sha256 digest of every file the
+            patch expects in target and of every file it writes are recorded
+            to MANIFEST.json, checked by Patcher before patching, default
+            True
+        :type manifest: bool
+        :param progress: called with the number of bytes downloaded so far
+            and the total size, or None if unknown, while downloading a
+            release from a web address, default None
+        :type progress: Union[Callable, None]
+        :param change_format: format of CHANGE.json, 2 writes JSON Lines
+            entries carrying type, size and mode of each item, 1 writes the
+            format read by Patcher of bandage releases before it, default 2
+        :type change_format: int
+        :param digests: path -> sha256 hex digest of files of the new release
+            that need not be hashed again, see Weave.series, default None
+        :type digests: Union[dict, None]
+        :param cache_directory: if not None and unpack is True, path to
+            directory keeping a manifest of path, size, digest and mode of
+            every file of each release archive, keyed by the sha256 digest of
+            the archive, releases are compared through their manifests and
+            only members of zip archives the patch needs are extracted,
+            default None
+        :type cache_directory: Union[str, None]
+        :param cache_size: maximum size of manifests kept in cache_directory
+            in bytes, least recently used are removed beyond it, default
+            256 MiB
+        :type cache_size: int
         """
+        if change_format not in [1, 2]:
+            raise Exceptions.PatchError(
+                "CHANGE.json format " + str(change_format) +
+                " is not supported.")
+        self.change_format = change_format
+        self.digests = {} if digests is None else digests
         self.WORK_DIR = Weave.create_work_directory()
+        self.max_workers = max_workers
         self.release_old = release_old
         self.release_new = release_new
         if path.isdir(output_path) is False:
             raise Exceptions.PatchError("Specified output directory " +
                                         output_path + " is not a directory.")
+        # sha256 digests of release archives, if known from downloading
+        archive_digests = [None, None]
         if "https://" in self.release_old[:8] or "http://" in \
                 self.release_old[:8]:
-            release_old_grab = Backend.fetch(self.release_old)
-            with open(gettempdir() + self.WORK_DIR + "/old/" +
-                      path.splitext(self.release_old)[1], "w") as \
-                    release_old_data_dump:
-                release_old_data_dump.write(release_old_grab.data)
-            self.release_old = gettempdir() + self.WORK_DIR + "/old/" + \
-                path.splitext(self.release_old)[1]
+            # next to, not inside, the directory the release unpacks to
+            self.release_old = gettempdir() + self.WORK_DIR + \
+                "/release_old" + path.splitext(release_old)[1]
+            archive_digests[0] = Backend.download(
+                release_old, self.release_old, progress,
+                None if cache_directory is None else "sha256")
         else:
-            if path.isfile(self.release_old) is False:
+            if path.isfile(self.release_old) is False and \
+                    path.isdir(self.release_old) is False:
                 raise Exceptions.ReleaseError(
                     "Old release file " + self.release_old +
                     " does not exist.")
         if "https://" in self.release_new[:8] or "http://" in \
                 self.release_new[:8]:
-            release_new_grab = Backend.fetch(self.release_new)
-            with open(gettempdir() + self.WORK_DIR + "/new/" +
-                      path.splitext(self.release_new)[1], "w") as \
-                    release_new_data_dump:
-                release_new_data_dump.write(release_new_grab.data)
-            self.release_new = gettempdir() + self.WORK_DIR + "/new/" + \
-                path.splitext(self.release_new)[1]
+            # next to, not inside, the directory the release unpacks to
+            self.release_new = gettempdir() + self.WORK_DIR + \
+                "/release_new" + path.splitext(release_new)[1]
+            archive_digests[1] = Backend.download(
+                release_new, self.release_new, progress,
+                None if cache_directory is None else "sha256")
         else:
-            if path.isfile(self.release_new) is False:
+            if path.isfile(self.release_new) is False and \
+                    path.isdir(self.release_new) is False:
                 raise Exceptions.ReleaseError(
                     "New release file " + self.release_new +
                     " does not exist.")
-        unpack_archive(self.release_old, gettempdir() +
-                       self.WORK_DIR + "/old/")
-        unpack_archive(self.release_new, gettempdir() +
-                       self.WORK_DIR + "/new/")
+        # manifests of old and new release, if kept in cache_directory
+        self.releases = None
+        if unpack is True and cache_directory is not None:
+            self.archives = None
+            makedirs(path.join(cache_directory, "releases"), exist_ok=True)
+            self.releases = []
+            # zip archives of releases members are extracted from on demand
+            self.sources = []
+            for release, name, digest in [
+                    (self.release_old, "old", archive_digests[0]),
+                    (self.release_new, "new", archive_digests[1])]:
+                listing, source = Weave.cached_release(
+                    self, release, name, cache_directory, cache_size, digest)
+                self.releases.append(listing)
+                self.sources.append(source)
+            for release in ["old", "new"]:
+                Weave.extract_release(self, release, ["NAME", "VERSION"])
+        elif unpack is True:
+            self.archives = None
+            for release, name in [(self.release_old, "/old/"),
+                                  (self.release_new, "/new/")]:
+                if path.isdir(release) is True:
+                    # releases unpacked elsewhere are never modified, so
+                    # their files are linked rather than copied
+                    rmdir(gettempdir() + self.WORK_DIR + name)
+                    copytree(release, gettempdir() + self.WORK_DIR + name,
+                             copy_function=Backend.link_file)
+                else:
+                    unpack_archive(release, gettempdir() + self.WORK_DIR +
+                                   name)
+        else:
+            self.archives = []
+            for release in [self.release_old, self.release_new]:
+                if is_zipfile(release) is False:
+                    raise Exceptions.ReleaseError(
+                        "Release file " + release + " is not a zip " +
+                        "archive, and cannot be read without unpacking.")
+                self.archives.append(ZipFile(release))
         try:
-            with open(gettempdir() + self.WORK_DIR + "/old/NAME") as \
-                    release_name_handle:
-                self.release_name_old = release_name_handle.read()
-            with open(gettempdir() + self.WORK_DIR + "/new/NAME") as \
-                    release_name_handle:
-                self.release_name_new = release_name_handle.read()
+            self.release_name_old = Weave.read_release_file(self, "old",
+                                                            "NAME")
+            self.release_name_new = Weave.read_release_file(self, "new",
+                                                            "NAME")
             if self.release_name_new != self.release_name_old and \
                     set_name is None:
                 raise Exceptions.ReleaseError(
@@ -387,12 +3391,10 @@ class Weave:
                     "NAME files of old and new releases are missing.") from \
                         ParentException
         try:
-            with open(gettempdir() + self.WORK_DIR + "/old/VERSION") as \
-                    release_version_handle:
-                self.release_version_old = release_version_handle.read()
-            with open(gettempdir() + self.WORK_DIR + "/new/VERSION") as \
-                    release_version_handle:
-                self.release_version_new = release_version_handle.read()
+            self.release_version_old = Weave.read_release_file(self, "old",
+                                                               "VERSION")
+            self.release_version_new = Weave.read_release_file(self, "new",
+                                                               "VERSION")
         except FileNotFoundError as ParentException:
             if suppress_missing_versions is False:
                 raise Exceptions.VersionError(
@@ -408,66 +3410,48 @@ class Weave:
                 'Release versions contain " -> " which will disrupt Patcher ' +
                 'when trying to read the VERSIONS header.')
         self.index = Weave.comparison(self)
-        with open(gettempdir() + self.WORK_DIR + "/patch/CHANGE.json", "w") \
-                as changelog_dump_handle:
-            jsondump({"remove": str(self.index[0]), "add": str(self.index[1]),
-                      "keep": str(self.index[2]),
-                      "replace": str(self.index[3])}, changelog_dump_handle)
-        for x in range(0, len(self.index[1])):
-            component = Backend.directory_split_recursive(self.index[1][x])
-            for a in component:
-                if path.isdir(gettempdir() +
-                              self.WORK_DIR + "/patch/add/" + a) is False:
-                    mkdir(gettempdir() + self.WORK_DIR + "/patch/add/" + a)
-            if path.isfile(gettempdir() +
-                           self.WORK_DIR + "/new/" + self.index[1][x]) is True:
-                copyfile(gettempdir() + self.WORK_DIR + "/new/" +
-                         self.index[1][x], gettempdir() + self.WORK_DIR +
-                         "/patch/add/" + self.index[1][x])
-            if path.isdir(gettempdir() +
-                          self.WORK_DIR + "/new/" + self.index[1][x]) is True:
-                copytree(gettempdir() + self.WORK_DIR + "/new/" +
-                         self.index[1][x], gettempdir() + self.WORK_DIR +
-                         "/patch/add/" + self.index[1][x])
-        for y in range(0, len(self.index[3])):
-            component = Backend.directory_split_recursive(self.index[3][y])
-            for b in component:
-                if path.isdir(gettempdir() +
-                              self.WORK_DIR + "/patch/replace/" + b) is False:
-                    mkdir(gettempdir() + self.WORK_DIR + "/patch/replace/" + b)
-            if path.isfile(gettempdir() +
-                           self.WORK_DIR + "/new/" + self.index[3][y]) is True:
-                copyfile(gettempdir() + self.WORK_DIR + "/new/" +
-                         self.index[3][y], gettempdir() + self.WORK_DIR +
-                         "/patch/replace/" + self.index[3][y])
-            if path.isdir(gettempdir() +
-                          self.WORK_DIR + "/new/" + self.index[3][y]) is True:
-                copytree(gettempdir() + self.WORK_DIR + "/new/" +
-                         self.index[3][y], gettempdir() + self.WORK_DIR +
-                         "/patch/replace/" + self.index[3][y])
-        with open(gettempdir() + self.WORK_DIR + "/patch/VERSIONS", "w") as \
-                release_version_handle:
-            release_version_handle.write(self.release_version_old + " -> " +
-                                         self.release_version_new)
+        self.index.append([])
+        # path -> {"op": "move" or "copy", "source" or "payload", "digest"}
+        self.copies = {}
+        if change_format == 2:
+            Weave.find_copies(self)
+        if self.releases is not None:
+            Weave.extract_release(self, "new", self.index[1] + self.index[3])
+            if delta is True:
+                Weave.extract_release(self, "old", self.index[3])
+        if delta is True:
+            mkdir(gettempdir() + self.WORK_DIR + "/patch/delta")
+            Weave.delta_encode(self)
+        change = {"remove": self.index[0], "add": self.index[1],
+                  "keep": self.index[2], "replace": self.index[3]}
+        if delta is True:
+            change["delta"] = self.index[4]
+        if change_format == 2:
+            for operation in ["move", "copy"]:
+                change[operation] = sorted(
+                    item for item in self.copies
+                    if self.copies[item]["op"] == operation)
         if set_name is None:
-            with open(gettempdir() + self.WORK_DIR + "/patch/NAME", "w") as \
-                    release_name_handle:
-                release_name_handle.write(self.release_name_new)
-            base_name = output_path + self.release_name_new + "_" + \
-                self.release_version_old + "_to_" + \
-                self.release_version_new + "_bandage_patch"
-            make_archive(root_dir=gettempdir() + self.WORK_DIR + "/patch/",
-                         base_name=base_name, format="zip")
+            patch_name = self.release_name_new
         else:
-            with open(gettempdir() + self.WORK_DIR + "/patch/NAME", "w") as \
-                    release_name_handle:
-                release_name_handle.write(set_name)
-            base_name = (output_path + set_name + "_" +
-                         self.release_version_old + "_to_" +
-                         self.release_version_new + "_bandage_patch")
-            make_archive(root_dir=gettempdir() + self.WORK_DIR + "/patch/",
-                         base_name=base_name, format="zip")
-        # TODO archive checksum generation
+            patch_name = set_name
+        checksums = None
+        if manifest is True:
+            checksums = Weave.manifest(self)
+        base_name = output_path + patch_name + "_" + \
+            self.release_version_old + "_to_" + \
+            self.release_version_new + "_bandage_patch"
+        # path of the patch archive written
+        self.patch_path = base_name + ".zip"
+        Weave.stream_patch(self, self.patch_path, change, patch_name,
+                           checksums)
+        if self.archives is not None:
+            for archive in self.archives:
+                archive.close()
+        if self.releases is not None:
+            for source in self.sources:
+                if source is not None:
+                    source.close()
         rmtree(gettempdir() + self.WORK_DIR)
 
     @staticmethod
@@ -479,80 +3463,1239 @@ class Weave:
         :return: generated tempdir name
         :rtype: str
         """
-        identifier = "/bandage_weave_session_" + \
-            md5(str(time()).encode(encoding="ascii", errors="replace")
-                ).hexdigest()
-        mkdir(gettempdir() + identifier)
+        # mkdtemp picks the name, instances created at the same time in
+        # several processes, as by bandage.Weave.series, must not collide
+        identifier = "/" + path.basename(
+            mkdtemp(prefix="bandage_weave_session_"))
         mkdir(gettempdir() + identifier + "/old")
         mkdir(gettempdir() + identifier + "/new")
         mkdir(gettempdir() + identifier + "/patch")
-        mkdir(gettempdir() + identifier + "/patch/add")
-        mkdir(gettempdir() + identifier + "/patch/replace")
         return identifier
 
+    @staticmethod
+    def series(releases_old: list, release_new: str, output_path: str,
+               max_processes: Union[int, None] = None, **options) -> list:
+        """
+        Weave patches from each of several old releases to one new release \
+            in a process pool, return the patches and matching lines for \
+            BANDAGE_PATCHES and BANDAGE_LINEAGE.
+
+        The new release is downloaded, unpacked and hashed once, each patch
+        is then woven by its own process against the unpacked new release,
+        or against the new release archive if unpack is False, reusing its
+        digests. A patch that cannot be woven is reported as its exception
+        and left out of the header lines.
+
+        :param releases_old: web addresses or paths to old release files,
+            oldest first
+        :type releases_old: list
+        :param release_new: web address or path to new release file
+        :type release_new: str
+        :param output_path: path to directory for the patch archives
+        :type output_path: str
+        :param max_processes: maximum number of processes, if None, decided
+            by concurrent.futures.ProcessPoolExecutor, default None
+        :type max_processes: Union[int, None]
+        :param options: keyword arguments passed to Weave for every patch,
+            except progress, which is only called while downloading the new
+            release, must be picklable
+        :return: contains list of paths to patch archives, or exceptions
+            raised weaving them, in the same order as releases_old, list of
+            lines for BANDAGE_PATCHES and list of lines for BANDAGE_LINEAGE,
+            latest version first
+        :rtype: list
+        """
+        if path.isdir(output_path) is False:
+            raise Exceptions.PatchError("Specified output directory " +
+                                        output_path + " is not a directory.")
+        progress = options.pop("progress", None)
+        work_directory = gettempdir() + Weave.create_work_directory()
+        try:
+            if "https://" in release_new[:8] or "http://" in release_new[:8]:
+                release = work_directory + "/release_new" + \
+                    path.splitext(release_new)[1]
+                Backend.download(release_new, release, progress)
+                release_new = release
+            elif path.isfile(release_new) is False:
+                raise Exceptions.ReleaseError(
+                    "New release file " + release_new + " does not exist.")
+            max_workers = options.get("max_workers")
+            if options.get("unpack", True) is True:
+                unpack_archive(release_new, work_directory + "/new")
+                release_new = work_directory + "/new"
+                files = [relative for relative, is_directory in
+                         Backend.list_directory(release_new)
+                         if is_directory is False]
+                digests = dict(zip(files, Backend.digest_files(
+                    [release_new + "/" + file for file in files],
+                    max_workers=max_workers)))
+            else:
+                if is_zipfile(release_new) is False:
+                    raise Exceptions.ReleaseError(
+                        "Release file " + release_new + " is not a zip " +
+                        "archive, and cannot be read without unpacking.")
+                with ZipFile(release_new) as archive, \
+                        ThreadPoolExecutor(max_workers) as executor:
+                    members = Backend.archive_listing(archive)[0]
+                    digests = dict(zip(members, executor.map(
+                        partial(Backend.archive_digest, archive),
+                        members.values())))
+            with ProcessPoolExecutor(max_processes) as executor:
+                futures = [executor.submit(
+                    Weave.series_patch, release_old, release_new,
+                    output_path, digests, options)
+                    for release_old in releases_old]
+                results = []
+                for future in futures:
+                    try:
+                        results.append(future.result())
+                    except BaseException as ParentException:
+                        results.append(ParentException)
+        finally:
+            rmtree(work_directory, ignore_errors=True)
+        patches = []
+        lineage = []
+        for result in results:
+            if isinstance(result, BaseException) is True:
+                continue
+            patches.append(result[1] + " -> " + result[2] + "||" +
+                           path.basename(result[0]) + "||" +
+                           str(path.getsize(result[0])))
+            if result[2] not in lineage:
+                lineage.append(result[2])
+            if result[1] not in lineage:
+                lineage.append(result[1])
+        # new version first, old versions latest first
+        lineage = lineage[:1] + list(reversed(lineage[1:]))
+        return [[result if isinstance(result, BaseException) else result[0]
+                 for result in results], patches, lineage]
+
+    @staticmethod
+    def series_patch(release_old: str, release_new: str, output_path: str,
+                     digests: dict, options: dict) -> list:
+        """
+        Weave a single patch of Weave.series, run in a process of its pool.
+
+        :param release_old: web address or path to old release file
+        :type release_old: str
+        :param release_new: path to new release file or unpacked directory
+        :type release_new: str
+        :param output_path: path to directory for the patch archive
+        :type output_path: str
+        :param digests: path -> sha256 hex digest of files of new release
+        :type digests: dict
+        :param options: keyword arguments passed to Weave
+        :type options: dict
+        :return: contains path to patch archive, old version and new version
+        :rtype: list
+        """
+        weave = Weave(release_old, release_new, output_path, digests=digests,
+                      **options)
+        return [weave.patch_path, weave.release_version_old,
+                weave.release_version_new]
+
+    @staticmethod
+    def squash(patches: list, output_path: str,
+               set_name: Union[str, None] = None) -> str:
+        """
+        Compose a chain of patches into a single equivalent patch, written \
+            to output path, return path of the new patch archive.
+
+        Patches must be zip archives listed in the order they would be
+        applied, each upgrading from the version the previous one upgrades to.
+        Items added and later removed cancel out, only the last content of an
+        item is kept, and deltas are rebuilt into full content when the file
+        they apply to was itself changed earlier in the chain, or composed
+        with the earlier delta when it was changed by one.
+
+        :param patches: paths to patch archives, oldest first
+        :type patches: list
+        :param output_path: path to directory for the new patch archive
+        :type output_path: str
+        :param set_name: new patch NAME file, if not None, NAME check is
+            ignored, default None
+        :type set_name: Union[str, None]
+        :return: path to squashed patch archive
+        :rtype: str
+        """
+        if path.isdir(output_path) is False:
+            raise Exceptions.PatchError("Specified output directory " +
+                                        output_path + " is not a directory.")
+        if not patches:
+            raise Exceptions.PatchError("No patches to squash.")
+        work_directory = Weave.create_work_directory()
+        archives = []
+        # path -> [True if it existed before the chain, type after the chain
+        # being "file", "directory" or None if removed, source of content
+        # as ("member", archive, name), ("file", path), ("delta", archive,
+        # name), ("delta", None, path of delta composed on disk) or
+        # ("target", path of file in target before the chain), True
+        # if a directory is replaced as a whole, set of tracked children], see
+        # Weave.squash_track
+        state = {}
+        keep = set()
+        # path -> latest v2 CHANGE.json entry of item, describing it after
+        # the patch that listed it
+        entries = {}
+        # path -> [size, sha256 hex digest] of files in target before the
+        # chain, from MANIFEST.json of patches
+        checksums = {}
+        versions = []
+        patch_name = set_name
+        try:
+            for patch in patches:
+                if path.isfile(patch) is False or is_zipfile(patch) is False:
+                    raise Exceptions.PatchError(
+                        "Patch file " + patch + " does not exist or is not " +
+                        "a zip archive.")
+                archive = ZipFile(patch)
+                archives.append(archive)
+                with TextIOWrapper(archive.open("VERSIONS")) as handle:
+                    versions.append(handle.read().split(" -> "))
+                if len(versions) > 1 and versions[-2][1] != versions[-1][0]:
+                    raise Exceptions.VersionError(
+                        "Patch " + patch + " upgrades from " +
+                        versions[-1][0] + ", not " + versions[-2][1] +
+                        " as the previous patch upgrades to.")
+                with TextIOWrapper(archive.open("NAME")) as handle:
+                    name = handle.read()
+                if set_name is None and patch_name not in [None, name]:
+                    raise Exceptions.PatchError(
+                        "NAME files of patches do not match. " + patch_name +
+                        " and " + name + ".")
+                patch_name = name if set_name is None else set_name
+                with TextIOWrapper(archive.open("CHANGE.json"),
+                                   encoding="utf-8") as handle:
+                    change, patch_entries = Backend.read_change(handle)
+                try:
+                    patch_checksums = jsonloads(archive.read("MANIFEST.json"))
+                except KeyError:
+                    # files of patches woven without manifest go unchecked
+                    patch_checksums = {"algorithm": None, "old": {}}
+                if patch_checksums["algorithm"] == "sha256":
+                    for name, record in patch_checksums["old"].items():
+                        if name not in checksums and \
+                                Weave.squash_untouched(state, name):
+                            checksums[name] = record
+                for item in change["remove"]:
+                    entries.pop(item, None)
+                entries.update((item, entry) for item, entry in
+                               patch_entries.items()
+                               if entry["op"] != "remove")
+                Weave.squash_patch(state, keep, archive, change,
+                                   patch_entries,
+                                   gettempdir() + work_directory)
+            return Weave.squash_write(
+                state, keep, entries, checksums, output_path + patch_name +
+                "_" + versions[0][0] + "_to_" + versions[-1][1] +
+                "_bandage_patch.zip", patch_name,
+                versions[0][0] + " -> " + versions[-1][1])
+        except KeyError as ParentException:
+            raise Exceptions.PatchError(
+                "Patch archive is missing NAME, VERSIONS or CHANGE.json, or " +
+                "item(s) listed in it.") from ParentException
+        finally:
+            for archive in archives:
+                archive.close()
+            rmtree(gettempdir() + work_directory)
+
+    @staticmethod
+    def squash_patch(state: dict, keep: set, archive: ZipFile, change: dict,
+                     entries: dict, work_directory: str) -> None:
+        """
+        Fold changes of a single patch into state tracked by Weave.squash.
+
+        :param state: tracked items, see Weave.squash
+        :type state: dict
+        :param keep: items listed under keep and not touched by any patch
+        :type keep: set
+        :param archive: patch archive
+        :type archive: ZipFile
+        :param change: parsed CHANGE.json of patch
+        :type change: dict
+        :param entries: path -> entry of CHANGE.json of patch
+        :type entries: dict
+        :param work_directory: directory for rebuilding files from deltas
+        :type work_directory: str
+        """
+        files, directories = Backend.archive_listing(archive)
+        # moved and copied file -> source of its content, resolved before
+        # the patch changes anything
+        copies = {}
+        for operation in ["move", "copy"]:
+            for item in change[operation]:
+                copies[item] = Weave.squash_source(state, archive,
+                                                   entries[item])
+        for item in change["keep"]:
+            if item not in state:
+                keep.add(item)
+        for item in change["remove"]:
+            existed = Weave.squash_forget(state, item)
+            Weave.squash_track(state, item, [existed, None, None, False])
+        # directory item in patch -> path of directory item
+        trees = {}
+        for operation in ["add", "replace"]:
+            for item in change[operation]:
+                # replaced items existed unless added earlier in the chain,
+                # added items did not exist unless tracked otherwise
+                existed = Weave.squash_forget(state, item)
+                if operation == "add" and item not in state:
+                    existed = False
+                if operation + "/" + item in files:
+                    Weave.squash_track(state, item, [existed, "file", (
+                        "member", archive, operation + "/" + item), False])
+                else:
+                    # replaced as a whole if anything was there before
+                    Weave.squash_track(state, item, [existed, "directory",
+                                                     None, existed])
+                    trees[operation + "/" + item] = item
+        for name in sorted(files.keys() | directories):
+            candidate = name.rpartition("/")[0]
+            while candidate != "" and candidate not in trees:
+                candidate = candidate.rpartition("/")[0]
+            if candidate == "":
+                continue
+            if name in files:
+                record = [False, "file", ("member", archive, name), False]
+            else:
+                record = [False, "directory", None, False]
+            Weave.squash_track(state, trees[candidate] +
+                               name[len(candidate):], record)
+        for item in sorted(copies):
+            # moved and copied files never replace anything
+            existed = Weave.squash_forget(state, item) if item in state \
+                else False
+            Weave.squash_track(state, item, [existed, "file", copies[item],
+                                             False])
+        for item in change["delta"]:
+            if item not in state or state[item][0] == "children":
+                Weave.squash_track(state, item, [True, "file", (
+                    "delta", archive, "delta/" + item), False])
+                continue
+            source = state[item][2]
+            if source is None:
+                raise Exceptions.PatchError(
+                    "Cannot squash delta for " + item + ", the file it " +
+                    "applies to is missing.")
+            if source[0] == "target":
+                # content lives only in target, under another path
+                raise Exceptions.PatchError(
+                    "Cannot squash delta for " + item + ", the file it " +
+                    "applies to was moved or copied within target, weave " +
+                    "the patches without delta mode.")
+            rebuilt = path.join(work_directory, "patch", md5(
+                (archive.filename + "/" + item).encode("utf-8")).hexdigest())
+            if source[0] == "delta":
+                # both deltas apply to the file in target before the chain
+                first = source[2]
+                if source[1] is not None:
+                    Backend.archive_extract(source[1], source[1].getinfo(
+                        source[2]), rebuilt + ".first")
+                    first = rebuilt + ".first"
+                with archive.open("delta/" + item) as delta_handle:
+                    Backend.delta_compose(first, delta_handle, rebuilt)
+                state[item][2] = ("delta", None, rebuilt)
+                continue
+            if source[0] == "member":
+                Backend.archive_extract(source[1], source[1].getinfo(
+                    source[2]), rebuilt + ".source")
+                source = ("file", rebuilt + ".source")
+            with archive.open("delta/" + item) as delta_handle:
+                Backend.delta_apply(source[1], delta_handle, rebuilt)
+            state[item][2] = ("file", rebuilt)
+
+    @staticmethod
+    def squash_source(state: dict, archive: ZipFile, entry: dict) -> tuple:
+        """
+        Resolve source of content of a moved or copied file against state \
+            tracked by Weave.squash.
+
+        :param state: tracked items, see Weave.squash
+        :type state: dict
+        :param archive: patch archive
+        :type archive: ZipFile
+        :param entry: CHANGE.json entry of moved or copied file
+        :type entry: dict
+        :return: source of content, see Weave.squash
+        :rtype: tuple
+        """
+        if entry.get("payload") is not None:
+            return "member", archive, entry["payload"]
+        source = entry["source"]
+        if source in state and state[source][0] != "children":
+            if state[source][1] != "file" or \
+                    state[source][2][0] == "delta":
+                raise Exceptions.PatchError(
+                    "Cannot squash copy of " + source + ", it is missing " +
+                    "or was changed by a delta, weave the patches without " +
+                    "delta mode.")
+            return state[source][2]
+        parent = source.rpartition("/")[0]
+        while parent != "":
+            if parent in state and state[parent][0] != "children":
+                raise Exceptions.PatchError(
+                    "Cannot squash copy of " + source + ", it is missing " +
+                    "at that point of the chain.")
+            parent = parent.rpartition("/")[0]
+        # untouched by the chain so far
+        return "target", source, entry.get("digest")
+
+    @staticmethod
+    def squash_untouched(state: dict, name: str) -> bool:
+        """
+        Check if path is still as it was in target before the chain, \
+            neither it nor a parent directory tracked by Weave.squash.
+
+        :param state: tracked items, see Weave.squash
+        :type state: dict
+        :param name: path in target
+        :type name: str
+        :return: True if untouched by the patches squashed so far
+        :rtype: bool
+        """
+        while name != "":
+            if name in state and state[name][0] != "children":
+                return False
+            name = name.rpartition("/")[0]
+        return True
+
+    @staticmethod
+    def squash_digest(source: tuple) -> list:
+        """
+        Size and hash content written from a source of Weave.squash, return \
+            [size, sha256 hex digest], for deltas of the file they rebuild.
+
+        :param source: source of content, see Weave.squash
+        :type source: tuple
+        :return: [size, hex digest]
+        :rtype: list
+        """
+        if source[0] == "delta":
+            if source[1] is None:
+                with open(source[2], "rb") as delta_handle:
+                    header = Backend.delta_header(delta_handle, source[2])
+            else:
+                with source[1].open(source[2]) as delta_handle:
+                    header = Backend.delta_header(delta_handle, source[2])
+            return [header[1], header[2].hex()]
+        if source[0] == "file":
+            return [stat(source[1]).st_size, Backend.file_digest(source[1])]
+        member = source[1].getinfo(source[2])
+        return [member.file_size, Backend.archive_digest(source[1], member)]
+
+    @staticmethod
+    def squash_track(state: dict, item: str, record: list) -> None:
+        """
+        Track item in state tracked by Weave.squash.
+
+        Parent directories are registered under state[parent][4], a set of
+        their tracked children, so items under a directory can be forgotten
+        without searching all of state. Directories that are only registered
+        for their children have "children" as record[0].
+
+        :param state: tracked items, see Weave.squash
+        :type state: dict
+        :param item: path of item
+        :type item: str
+        :param record: record of item, see Weave.squash
+        :type record: list
+        """
+        if item in state:
+            record.append(state[item][4])
+        else:
+            record.append(set())
+        state[item] = record
+        child = item
+        parent = item.rpartition("/")[0]
+        while parent != "":
+            if parent not in state:
+                state[parent] = ["children", None, None, False, set()]
+            if child in state[parent][4]:
+                break
+            state[parent][4].add(child)
+            child = parent
+            parent = parent.rpartition("/")[0]
+
+    @staticmethod
+    def squash_forget(state: dict, item: str) -> bool:
+        """
+        Stop tracking everything under item in state tracked by \
+            Weave.squash, return True if item existed before the chain.
+
+        :param state: tracked items, see Weave.squash
+        :type state: dict
+        :param item: path of item
+        :type item: str
+        :return: True if item existed before the chain of patches
+        :rtype: bool
+        """
+        if item not in state:
+            return True
+        pending = list(state[item][4])
+        state[item][4] = set()
+        while pending:
+            pending.extend(state.pop(pending.pop())[4])
+        return state[item][0] is not False
+
+    @staticmethod
+    def squash_write(state: dict, keep: set, entries: dict, checksums: dict,
+                     destination: str, patch_name: str, versions: str) -> str:
+        """
+        Write patch archive equivalent to state tracked by Weave.squash.
+
+        MANIFEST.json records the files the new patch expects in target from
+        the manifests of the patches squashed, and the files it writes by
+        hashing them, in a thread pool.
+
+        :param state: tracked items, see Weave.squash
+        :type state: dict
+        :param keep: items listed under keep and not touched by any patch
+        :type keep: set
+        :param entries: path -> latest v2 CHANGE.json entry of item
+        :type entries: dict
+        :param checksums: path -> [size, sha256 hex digest] of files in
+            target before the chain
+        :type checksums: dict
+        :param destination: path of patch archive to write
+        :type destination: str
+        :param patch_name: contents of NAME
+        :type patch_name: str
+        :param versions: contents of VERSIONS
+        :type versions: str
+        :return: destination
+        :rtype: str
+        """
+        # items kept by one patch may still be changed by a later one
+        change = {"remove": [], "add": [], "keep": sorted(
+            item for item in keep if item not in state or
+            state[item][0] == "children"), "replace": [], "delta": [],
+            "copy": []}
+        # item -> operation of directories shipped as a whole
+        trees = {}
+        # (name in patch archive, source of content, or None for directory)
+        members = []
+        # copied file -> "source" and "digest", or "payload" of its entry
+        copies = {}
+        # source of content -> name of member first written with it
+        payloads = {}
+        for item in sorted(state):
+            existed, final, source, whole = state[item][:4]
+            if existed == "children":
+                continue
+            parent = item.rpartition("/")[0]
+            while parent != "" and parent not in trees:
+                parent = parent.rpartition("/")[0]
+            if final == "file" and source[0] == "target":
+                change["copy"].append(item)
+                copies[item] = {"source": source[1], "digest": source[2]}
+                continue
+            if final == "file" and source in payloads:
+                change["copy"].append(item)
+                copies[item] = {"payload": payloads[source]}
+                continue
+            if parent != "":
+                if final is not None:
+                    if source is not None and source[0] == "delta":
+                        raise Exceptions.PatchError(
+                            "Cannot squash delta for " + item + " into " +
+                            "directory " + parent + " shipped as a whole.")
+                    members.append((trees[parent] + "/" + item, source))
+                    if source is not None:
+                        payloads[source] = trees[parent] + "/" + item
+                continue
+            if final is None:
+                if existed is True:
+                    change["remove"].append(item)
+                continue
+            if final == "directory":
+                if existed is False or whole is True:
+                    trees[item] = "add" if existed is False else "replace"
+                    change[trees[item]].append(item)
+                    members.append((trees[item] + "/" + item, None))
+                continue
+            if existed is False:
+                operation = "add"
+            elif source[0] == "delta":
+                operation = "delta"
+            else:
+                operation = "replace"
+            change[operation].append(item)
+            members.append((operation + "/" + item, source))
+            if operation != "delta":
+                payloads[source] = operation + "/" + item
+        # only type, size and mode of entries still hold for the new patch
+        output = {}
+        for item in entries:
+            output[item] = {field: entries[item].get(field)
+                            for field in ["type", "size", "mode"]}
+        for item in copies:
+            output.setdefault(item, {}).update(copies[item])
+        checked = set(change["keep"] + change["replace"] + change["delta"])
+        checked.update(copies[item]["source"] for item in copies
+                       if "source" in copies[item])
+        manifest = {"algorithm": "sha256", "old": {
+            name: checksums[name] for name in sorted(checksums)
+            if Backend.find_parent(checked, name) is not None}, "new": {}}
+        files = [(name, source) for name, source in members
+                 if source is not None]
+        with ThreadPoolExecutor() as executor:
+            for (name, source), record in zip(files, executor.map(
+                    Weave.squash_digest, [pair[1] for pair in files])):
+                manifest["new"][name.partition("/")[2]] = record
+        for item in copies:
+            if "payload" in copies[item]:
+                manifest["new"][item] = manifest["new"][
+                    copies[item]["payload"].partition("/")[2]]
+            elif copies[item]["digest"] is not None:
+                manifest["new"][item] = [output[item].get("size"),
+                                         copies[item]["digest"]]
+        try:
+            with ZipFile(destination + ".part", "w", ZIP_DEFLATED) as \
+                    patch_archive:
+                Backend.archive_directory(patch_archive, "add")
+                Backend.archive_directory(patch_archive, "replace")
+                with patch_archive.open("CHANGE.json", "w") as \
+                        changelog_dump_handle:
+                    for line in Backend.change_lines(change, output):
+                        changelog_dump_handle.write(line.encode("utf-8"))
+                patch_archive.writestr("MANIFEST.json", jsondumps(manifest))
+                patch_archive.writestr("NAME", patch_name)
+                patch_archive.writestr("VERSIONS", versions)
+                for name, source in members:
+                    if source is None:
+                        Backend.archive_directory(patch_archive, name)
+                    elif source[0] == "file":
+                        patch_archive.write(source[1], name)
+                    elif source[1] is None:
+                        # delta composed on disk
+                        patch_archive.write(source[2], name)
+                    else:
+                        Backend.archive_copy(source[1],
+                                             source[1].getinfo(source[2]),
+                                             patch_archive, name)
+        except BaseException:
+            if path.isfile(destination + ".part") is True:
+                remove(destination + ".part")
+            raise
+        replace(destination + ".part", destination)
+        return destination
+
+    def stream_patch(self, destination: str, change: dict,
+                     patch_name: str,
+                     checksums: Union[dict, None] = None) -> None:
+        """
+        Write patch archive to destination, streaming items for addition and \
+            replacement straight from the new release archive, or the \
+            unpacked new release.
+
+        The patch archive is written with .part appended to destination and
+        renamed once complete, so destination never holds a partial patch.
+
+        :param destination: path of patch archive to write
+        :type destination: str
+        :param change: contains "remove", "add", "keep", "replace" and
+            optionally "delta" lists for CHANGE.json
+        :type change: dict
+        :param patch_name: contents of NAME
+        :type patch_name: str
+        :param checksums: contents of MANIFEST.json, if None it is not
+            written, default None
+        :type checksums: Union[dict, None]
+        """
+        try:
+            with ZipFile(destination + ".part", "w", ZIP_DEFLATED) as \
+                    patch_archive:
+                Backend.archive_directory(patch_archive, "add")
+                Backend.archive_directory(patch_archive, "replace")
+                with patch_archive.open("CHANGE.json", "w") as \
+                        changelog_dump_handle:
+                    for line in Weave.change_contents(self, change):
+                        changelog_dump_handle.write(line.encode("utf-8"))
+                if checksums is not None:
+                    patch_archive.writestr("MANIFEST.json",
+                                           jsondumps(checksums))
+                patch_archive.writestr("NAME", patch_name)
+                patch_archive.writestr("VERSIONS", self.release_version_old +
+                                       " -> " + self.release_version_new)
+                if self.archives is not None:
+                    Weave.stream_archive(self, patch_archive)
+                else:
+                    Weave.stream_directory(self, patch_archive)
+                for item in self.index[4]:
+                    patch_archive.write(gettempdir() + self.WORK_DIR +
+                                        "/patch/delta/" + item,
+                                        "delta/" + item)
+        except BaseException:
+            if path.isfile(destination + ".part") is True:
+                remove(destination + ".part")
+            raise
+        replace(destination + ".part", destination)
+
+    def stream_archive(self, patch_archive: ZipFile) -> None:
+        """
+        Write items for addition and replacement to patch archive from the \
+            new release archive.
+
+        :param patch_archive: patch archive open for writing
+        :type patch_archive: zipfile.ZipFile
+        """
+        # top-level item -> operation, members are matched against these
+        # through their own path and the paths of their parent directories
+        operations = {}
+        for item in self.index[1]:
+            operations[item] = "add"
+        for item in self.index[3]:
+            operations[item] = "replace"
+        # directories written to patch, and directories of moved and
+        # copied files, which Patcher writes but are still shipped
+        directories = set()
+        pending = set()
+        for member in self.archives[1].infolist():
+            candidate = member.filename.rstrip("/")
+            while candidate != "":
+                if candidate in operations:
+                    name = operations[candidate] + "/" + \
+                        member.filename.rstrip("/")
+                    if member.filename in self.copies:
+                        pending.add(name.rpartition("/")[0])
+                        break
+                    if member.is_dir() is True:
+                        directories.add(name)
+                    Backend.archive_copy(
+                        self.archives[1], member, patch_archive,
+                        operations[candidate] + "/" + member.filename)
+                    break
+                candidate = candidate.rpartition("/")[0]
+        for name in sorted(pending - directories):
+            Backend.archive_directory(patch_archive, name)
+
+    def stream_directory(self, patch_archive: ZipFile) -> None:
+        """
+        Write items for addition and replacement to patch archive from the \
+            unpacked new release.
+
+        :param patch_archive: patch archive open for writing
+        :type patch_archive: zipfile.ZipFile
+        """
+        # directories written to patch, parents of items included
+        directories = set()
+        for operation, items in [("add", self.index[1]),
+                                 ("replace", self.index[3])]:
+            for item in items:
+                for component in reversed(
+                        Backend.directory_split_recursive(item)):
+                    if component != "" and \
+                            operation + "/" + component not in directories:
+                        directories.add(operation + "/" + component)
+                        Backend.archive_directory(
+                            patch_archive, operation + "/" + component)
+                root = gettempdir() + self.WORK_DIR + "/new/" + item
+                if path.isfile(root) is True:
+                    patch_archive.write(root, operation + "/" + item)
+                    continue
+                Backend.archive_directory(patch_archive,
+                                          operation + "/" + item)
+                for relative, is_directory in Backend.list_directory(root):
+                    if is_directory is True:
+                        Backend.archive_directory(
+                            patch_archive,
+                            operation + "/" + item + "/" + relative)
+                    elif item + "/" + relative not in self.copies:
+                        # moved and copied files under directory items are
+                        # written by Patcher, their directories are shipped
+                        patch_archive.write(
+                            root + "/" + relative,
+                            operation + "/" + item + "/" + relative)
+
+    def read_release_file(self, release: str, name: str) -> str:
+        """
+        Read header file such as NAME or VERSION from old or new release, \
+            raises FileNotFoundError if missing.
+
+        :param release: "old" or "new"
+        :type release: str
+        :param name: path of header file in release
+        :type name: str
+        :return: contents of header file
+        :rtype: str
+        """
+        if self.archives is None:
+            with open(gettempdir() + self.WORK_DIR + "/" + release + "/" +
+                      name) as release_file_handle:
+                return release_file_handle.read()
+        try:
+            member = self.archives[["old", "new"].index(release)].open(name)
+        except KeyError as ParentException:
+            raise FileNotFoundError(
+                "Release archive has no member " + name + ".") from \
+                ParentException
+        with TextIOWrapper(member) as release_file_handle:
+            return release_file_handle.read()
+
+    def cached_release(self, release: str, name: str, cache_directory: str,
+                       cache_size: int, digest: Union[str, None]) -> list:
+        """
+        Look up manifest of release in cache directory, building and storing \
+            it if missing, return it with the zip archive its members are \
+            extracted from.
+
+        Zip archives are read in place, other archives are unpacked whole to
+        self.WORK_DIR, directories of unpacked releases are linked there and
+        not cached.
+
+        :param release: path to release file or directory
+        :type release: str
+        :param name: "old" or "new"
+        :type name: str
+        :param cache_directory: path to cache directory, see Weave
+        :type cache_directory: str
+        :param cache_size: maximum size of manifests in bytes, see Weave
+        :type cache_size: int
+        :param digest: sha256 hex digest of release archive, if None it is
+            hashed
+        :type digest: Union[str, None]
+        :return: contains manifest, {"files": {path: [size, hex digest,
+            mode or None]}, "directories": {path: mode or None}}, and open
+            ZipFile or None
+        :rtype: list
+        """
+        root = gettempdir() + self.WORK_DIR + "/" + name
+        if path.isdir(release) is True:
+            rmdir(root)
+            copytree(release, root, copy_function=Backend.link_file)
+            return [Weave.scan_tree(self, root, name), None]
+        if digest is None:
+            digest = Backend.file_digest(release)
+        cached = path.join(cache_directory, "releases", digest + ".json")
+        manifest = None
+        try:
+            with open(cached) as manifest_handle:
+                manifest = jsonloads(manifest_handle.read())
+            # modification time orders manifests for eviction
+            utime(cached)
+        except (FileNotFoundError, ValueError):
+            pass
+        stored = manifest is not None
+        source = None
+        if is_zipfile(release) is True:
+            source = ZipFile(release)
+            if manifest is None:
+                manifest = Weave.scan_archive(self, source)
+        else:
+            unpack_archive(release, root)
+            if manifest is None:
+                manifest = Weave.scan_tree(self, root, name)
+        if stored is False:
+            descriptor, partial_manifest = mkstemp(
+                dir=path.join(cache_directory, "releases"), suffix=".part")
+            with open(descriptor, "w") as manifest_handle:
+                jsondump(manifest, manifest_handle)
+            replace(partial_manifest, cached)
+            Backend.cache_evict(path.join(cache_directory, "releases"),
+                                cache_size)
+        return [manifest, source]
+
+    def scan_tree(self, root: str, name: str) -> dict:
+        """
+        Build manifest of unpacked release, see Weave.cached_release, files \
+            of the new release in self.digests are not hashed again.
+
+        :param root: path to unpacked release
+        :type root: str
+        :param name: "old" or "new"
+        :type name: str
+        :return: manifest of release
+        :rtype: dict
+        """
+        manifest = {"files": {}, "directories": {}}
+        files = []
+        for relative, is_directory in Backend.list_directory(root):
+            status = stat(path.join(root, relative))
+            if is_directory is True:
+                manifest["directories"][relative] = S_IMODE(status.st_mode)
+                continue
+            files.append(relative)
+            manifest["files"][relative] = [status.st_size, None,
+                                           S_IMODE(status.st_mode)]
+        known = self.digests if name == "new" else {}
+        unknown = [file for file in files if file not in known]
+        for file, digest in zip(unknown, Backend.digest_files(
+                [path.join(root, file) for file in unknown],
+                max_workers=self.max_workers)):
+            manifest["files"][file][1] = digest
+        for file in files:
+            if file in known:
+                manifest["files"][file][1] = known[file]
+        return manifest
+
+    def scan_archive(self, archive: ZipFile) -> dict:
+        """
+        Build manifest of zip release archive, see Weave.cached_release, \
+            hashing members concurrently in a thread pool.
+
+        :param archive: zip archive of release
+        :type archive: ZipFile
+        :return: manifest of release
+        :rtype: dict
+        """
+        manifest = {"files": {}, "directories": {}}
+        files, directories = Backend.archive_listing(archive)
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            digests = executor.map(partial(Backend.archive_digest, archive),
+                                   files.values())
+            for (name, member), digest in zip(files.items(), digests):
+                manifest["files"][name] = [member.file_size, digest, None]
+                if member.create_system == 3:
+                    manifest["files"][name][2] = S_IMODE(
+                        member.external_attr >> 16)
+        for name in directories:
+            manifest["directories"][name] = None
+            try:
+                member = archive.getinfo(name + "/")
+            except KeyError:
+                # directories may only be implied by their members
+                continue
+            if member.create_system == 3:
+                manifest["directories"][name] = S_IMODE(
+                    member.external_attr >> 16)
+        return manifest
+
+    def extract_release(self, release: str, items: list) -> None:
+        """
+        Extract items of old or new release from its zip archive to \
+            self.WORK_DIR, releases that were unpacked whole are skipped.
+
+        :param release: "old" or "new"
+        :type release: str
+        :param items: paths of files and directories of release, directories
+            are extracted with everything under them
+        :type items: list
+        """
+        source = self.sources[["old", "new"].index(release)]
+        if source is None or not items:
+            return
+        items = set(items)
+        for member in source.infolist():
+            if Backend.find_parent(items, member.filename.rstrip("/")) is \
+                    not None:
+                source.extract(member, gettempdir() + self.WORK_DIR + "/" +
+                               release)
+
+    def release_files(self, release: str) -> dict:
+        """
+        List files of old or new release with their sizes.
+
+        :param release: "old" or "new"
+        :type release: str
+        :return: path of file -> size
+        :rtype: dict
+        """
+        if self.releases is not None:
+            return {name: record[0] for name, record in
+                    self.releases[["old", "new"].index(release)][
+                        "files"].items()}
+        if self.archives is None:
+            root = gettempdir() + self.WORK_DIR + "/" + release + "/"
+            return {relative: stat(root + relative).st_size
+                    for relative, is_directory in Backend.list_directory(root)
+                    if is_directory is False}
+        archive = self.archives[["old", "new"].index(release)]
+        return {name: member.file_size for name, member in
+                Backend.archive_listing(archive)[0].items()}
+
+    def release_digests(self, release: str, files: list) -> dict:
+        """
+        Hash files of old or new release concurrently in a thread pool, \
+            files of the new release in self.digests are not hashed again, \
+            digests of releases with a manifest are taken from it.
+
+        :param release: "old" or "new"
+        :type release: str
+        :param files: paths of files in release
+        :type files: list
+        :return: path of file -> sha256 hex digest
+        :rtype: dict
+        """
+        if self.releases is not None:
+            manifest = self.releases[["old", "new"].index(release)]
+            return {file: manifest["files"][file][1] for file in files}
+        known = {}
+        if release == "new":
+            known = {file: self.digests[file] for file in files
+                     if file in self.digests}
+            files = [file for file in files if file not in known]
+        if self.archives is None:
+            root = gettempdir() + self.WORK_DIR + "/" + release + "/"
+            digests = Backend.digest_files([root + file for file in files],
+                                           max_workers=self.max_workers)
+        else:
+            archive = self.archives[["old", "new"].index(release)]
+            with ThreadPoolExecutor(self.max_workers) as executor:
+                digests = list(executor.map(
+                    partial(Backend.archive_digest, archive),
+                    [archive.getinfo(file) for file in files]))
+        known.update(zip(files, digests))
+        return known
+
+    def find_copies(self) -> None:
+        """
+        Match files the patch would ship for addition against files of the \
+            old release and against each other by content, dumped to \
+            self.copies, and drop matched items from self.index.
+
+        A file matching an old file that leaves target with the patch, being
+        removed or replaced, is moved from it, each old file being moved at
+        most once. A file matching any other old file is copied from it, a
+        file matching only another shipped file is copied from the payload of
+        that file, so identical content is stored once. Only files of equal
+        size are hashed, empty files are always shipped.
+        """
+        self.copies = {}
+        new_files = Weave.release_files(self, "new")
+        # path of file in new release -> name of its payload in patch
+        payloads = {}
+        replaced = set(self.index[3])
+        for operation, items in [("add", set(self.index[1])),
+                                 ("replace", replaced)]:
+            for name in new_files:
+                # files replaced by other files are never matched, so items
+                # matched by content were always absent from target
+                if new_files[name] > 0 and name not in replaced and \
+                        Backend.find_parent(items, name) is not None:
+                    payloads[name] = operation + "/" + name
+        if not payloads:
+            return
+        old_files = Weave.release_files(self, "old")
+        counts = {}
+        for name in payloads:
+            counts[new_files[name]] = counts.get(new_files[name], 0) + 1
+        sources = sorted(name for name in old_files
+                         if old_files[name] in counts)
+        old_sizes = set(old_files[name] for name in sources)
+        candidates = sorted(name for name in payloads if
+                            counts[new_files[name]] > 1 or
+                            new_files[name] in old_sizes)
+        old_digests = Weave.release_digests(self, "old", sources)
+        new_digests = Weave.release_digests(self, "new", candidates)
+        # digest -> old files with that content
+        matches = {}
+        for name in sources:
+            matches.setdefault(old_digests[name], []).append(name)
+        leaving = set(self.index[0] + self.index[3])
+        moved = set()
+        # digest -> name of payload shipped with that content
+        shipped = {}
+        for name in candidates:
+            digest = new_digests[name]
+            entry = None
+            for source in matches.get(digest, []):
+                if source not in moved and \
+                        Backend.find_parent(leaving, source) is not None:
+                    moved.add(source)
+                    entry = {"op": "move", "source": source}
+                    break
+            if entry is None and digest in matches:
+                entry = {"op": "copy", "source": matches[digest][0]}
+            if entry is None and digest in shipped:
+                entry = {"op": "copy", "payload": shipped[digest]}
+            if entry is None:
+                shipped[digest] = payloads[name]
+                continue
+            entry["digest"] = digest
+            self.copies[name] = entry
+        self.index[1] = [item for item in self.index[1]
+                         if item not in self.copies]
+
+    def delta_encode(self) -> None:
+        """
+        Encode files listed for replacement in self.index as binary deltas.
+
+        Deltas are written under self.WORK_DIR/patch/delta, files whose delta
+        was smaller than the new file are moved from the replace list to the
+        delta list of self.index, remaining files are copied in full.
+        """
+        replacements = []
+        for item in self.index[3]:
+            old = gettempdir() + self.WORK_DIR + "/old/" + item
+            new = gettempdir() + self.WORK_DIR + "/new/" + item
+            if self.archives is not None:
+                # only members being encoded are extracted, directories have
+                # no member under their own name and are skipped below
+                try:
+                    self.archives[0].extract(item, gettempdir() +
+                                             self.WORK_DIR + "/old/")
+                    self.archives[1].extract(item, gettempdir() +
+                                             self.WORK_DIR + "/new/")
+                except KeyError:
+                    pass
+            if path.isfile(old) is False or path.isfile(new) is False:
+                replacements.append(item)
+                continue
+            for component in reversed(Backend.directory_split_recursive(item)):
+                if path.isdir(gettempdir() + self.WORK_DIR + "/patch/delta/" +
+                              component) is False:
+                    mkdir(gettempdir() + self.WORK_DIR + "/patch/delta/" +
+                          component)
+            if Backend.delta_encode(old, new, gettempdir() + self.WORK_DIR +
+                                    "/patch/delta/" + item) is True:
+                self.index[4].append(item)
+            else:
+                replacements.append(item)
+        self.index[3] = replacements
+
+    def manifest(self) -> dict:
+        """
+        Record size and digest of every file the patch expects in target \
+            and of every file it writes, return contents of MANIFEST.json.
+
+        Files listed for keeping, replacement and delta replacement, and
+        sources of moved and copied files are recorded from the old release,
+        files listed for addition, replacement and delta replacement, and
+        moved and copied files from the new release. Directory items are
+        recorded file by file, files are hashed concurrently in a thread pool.
+
+        :return: contains name of hashlib algorithm, and dicts of file path to
+            [size, hex digest] for the old and new release
+        :rtype: dict
+        """
+        dump = {"algorithm": "sha256", "old": {}, "new": {}}
+        sources = [self.copies[item]["source"] for item in self.copies
+                   if "source" in self.copies[item]]
+        for release, items in [
+                ("old", set(self.index[2] + self.index[3] + self.index[4] +
+                            sources)),
+                ("new", set(self.index[1] + self.index[3] + self.index[4] +
+                            list(self.copies)))]:
+            if self.archives is None and self.releases is None:
+                root = gettempdir() + self.WORK_DIR + "/" + release + "/"
+                files = []
+                for item in sorted(items):
+                    if path.isdir(root + item) is False:
+                        files.append(item)
+                        continue
+                    for relative, is_directory in \
+                            Backend.list_directory(root + item):
+                        if is_directory is False:
+                            files.append(item + "/" + relative)
+                sizes = [stat(root + file).st_size for file in files]
+            else:
+                listing = Weave.release_files(self, release)
+                files = sorted(name for name in listing if
+                               Backend.find_parent(items, name) is not None)
+                sizes = [listing[file] for file in files]
+            digests = Weave.release_digests(self, release, files)
+            for x in range(0, len(files)):
+                dump[release][files[x]] = [sizes[x], digests[files[x]]]
+        return dump
+
+    def change_contents(self, change: dict) -> Iterator[str]:
+        """
+        Generate contents of CHANGE.json in the format chosen for Weave.
+
+        :param change: contains "remove", "add", "keep", "replace" and
+            optionally "delta" lists
+        :type change: dict
+        :return: contents of CHANGE.json, line by line for format 2
+        :rtype: Iterator[str]
+        """
+        if self.change_format == 1:
+            yield jsondumps({operation: str(change[operation])
+                             for operation in change})
+            return
+        yield from Backend.change_lines(change, Weave.change_entries(self))
+
+    def change_entries(self) -> dict:
+        """
+        Describe every item of the change list for a v2 CHANGE.json, return \
+            dict of path to entry.
+
+        Items listed for removal and keeping are described from the old
+        release, the rest from the new release. Modes of members of release
+        archives are only known when written on a Unix system.
+
+        :return: path -> {"type": "file" or "directory", "size": size of
+            files, "mode": permission bits or None}, with "source" or
+            "payload" and "digest" for moved and copied files
+        :rtype: dict
+        """
+        entries = {}
+        for release, items in [
+                ("old", self.index[0] + self.index[2]),
+                ("new", self.index[1] + self.index[3] + self.index[4] +
+                 list(self.copies))]:
+            if self.releases is not None:
+                manifest = self.releases[["old", "new"].index(release)]
+                for item in items:
+                    if item in manifest["files"]:
+                        entries[item] = {"type": "file",
+                                         "size": manifest["files"][item][0],
+                                         "mode": manifest["files"][item][2]}
+                    else:
+                        entries[item] = {
+                            "type": "directory", "size": None,
+                            "mode": manifest["directories"].get(item)}
+                continue
+            if self.archives is None:
+                root = gettempdir() + self.WORK_DIR + "/" + release + "/"
+                for item in items:
+                    status = stat(root + item)
+                    if S_ISDIR(status.st_mode):
+                        entries[item] = {"type": "directory", "size": None,
+                                         "mode": S_IMODE(status.st_mode)}
+                    else:
+                        entries[item] = {"type": "file",
+                                         "size": status.st_size,
+                                         "mode": S_IMODE(status.st_mode)}
+                continue
+            archive = self.archives[["old", "new"].index(release)]
+            files = Backend.archive_listing(archive)[0]
+            for item in items:
+                if item in files:
+                    member = files[item]
+                    entries[item] = {"type": "file",
+                                     "size": member.file_size}
+                else:
+                    entries[item] = {"type": "directory", "size": None}
+                    try:
+                        member = archive.getinfo(item + "/")
+                    except KeyError:
+                        # directories may only be implied by their members
+                        member = None
+                entries[item]["mode"] = None
+                if member is not None and member.create_system == 3:
+                    entries[item]["mode"] = S_IMODE(
+                        member.external_attr >> 16)
+        for item in self.copies:
+            entries[item].update(self.copies[item])
+        return entries
+
     def comparison(self) -> list:
         """
-        Compare old and new directories under self.WORK_DIR for differences, \
-            returns as list.
+        Compare old and new releases for differences, returns as list.
+
+        Releases with a manifest are compared with Backend.compare_manifests,
+        unpacked releases under self.WORK_DIR with Backend.compare_trees,
+        release archives that were not unpacked with
+        Backend.compare_archives.
 
         :return: contains release differences
         :rtype: list
         """
-        handle = StringIO()
-        with redirect_stdout(handle):
-            dircmp(gettempdir() + self.WORK_DIR + "/old/", gettempdir() +
-                   self.WORK_DIR + "/new/").report_full_closure()
-        raw = handle.getvalue().split("\n")
         dump = [[], [], [], []]
-        # directory path appends for old and new archive,
-        # allows for handling of sub-directories.
-        parsing_directory = ""
-        for x in range(0, len(raw)):
-            if raw[x][:4] == "diff":
-                if len(raw[x].split(" ")) != 3:
-                    raise Exceptions.UnableToParseError(
-                        "Release archives contain directories with spaces" +
-                        " in their names. This breaks comparison " +
-                        "interpretation.") from None
-                parsing_directory = \
-                    raw[x].split(" ")[1].lstrip(gettempdir()).lstrip(
-                        self.WORK_DIR).lstrip("/old/")
-                if parsing_directory != "":
-                    parsing_directory += "/"
-            if raw[x][:(8 + len(
-                    gettempdir() + self.WORK_DIR + "/old/"))] == "Only in " + \
-                    gettempdir() + self.WORK_DIR + "/old/":
-                for_extend = raw[x].lstrip(
-                    "Only in " + gettempdir() + self.WORK_DIR + "/old/" +
-                    parsing_directory).strip("[]").split(", ")
-                for y in range(0, len(for_extend)):
-                    for_extend[y] = parsing_directory + \
-                        for_extend[y].strip("'")
-                dump[0].extend(for_extend)
-            if raw[x][:(8 + len(
-                    gettempdir() + self.WORK_DIR + "/new/"))] == "Only in " + \
-                    gettempdir() + self.WORK_DIR + "/new/":
-                for_extend = raw[x].lstrip(
-                    "Only in " + gettempdir() + self.WORK_DIR + "/new/" +
-                    parsing_directory).strip("[]").split(", ")
-                for y in range(0, len(for_extend)):
-                    for_extend[y] = parsing_directory + \
-                        for_extend[y].strip("'")
-                dump[1].extend(for_extend)
-            if raw[x][:18] == "Identical files : ":
-                for_extend = \
-                    raw[x].lstrip("Identical files : ").strip("[]").split(", ")
-                for y in range(0, len(for_extend)):
-                    for_extend[y] = \
-                        parsing_directory + for_extend[y].strip("'")
-                dump[2].extend(for_extend)
-            if raw[x][:18] == "Differing files : ":
-                for_extend = \
-                    raw[x].lstrip("Differing files : ").strip("[]").split(", ")
-                for y in range(0, len(for_extend)):
-                    for_extend[y] = \
-                        parsing_directory + for_extend[y].strip("'")
-                dump[3].extend(for_extend)
+        operations = {"remove": 0, "add": 1, "keep": 2, "replace": 3}
+        if self.releases is not None:
+            differences = Backend.compare_manifests(self.releases[0],
+                                                    self.releases[1])
+        elif self.archives is None:
+            differences = Backend.compare_trees(
+                gettempdir() + self.WORK_DIR + "/old/",
+                gettempdir() + self.WORK_DIR + "/new/", self.max_workers,
+                digests=self.digests)
+        else:
+            differences = Backend.compare_archives(self.archives[0],
+                                                   self.archives[1])
+        for operation, item in differences:
+            dump[operations[operation]].append(item)
         return dump
 
 
@@ -560,7 +4703,8 @@ class Supply:
     """Main class for bandage.Supply instances, which checks for new patches \
         on remotes."""
 
-    def __init__(self, remote: str, version_file: str):
+    def __init__(self, remote: str, version_file: str,
+                 cache_directory: Union[str, None] = None):
         """
         Check given remote HTTP endpoint for new patches. Inorganic and for \
             robots. If no exception is thrown, dumps status and patch \
@@ -572,13 +4716,19 @@ class Supply:
         server, or a Github release tagged BANDAGE.
         For pointing to a Github repository's contents, use
         raw.githubusercontent.com.
+        A directory, given as a path or a file:// address, can also be a
+        remote, such as a site-local mirror, patches found are then given as
+        paths.
 
         If bandage.Supply succeeded in finding headers and looking up lineage
         series, however finds the current version to be the latest, self.result
         is 0.
         If bandage.Supply succeeded in finding headers and looking up lineage
         series, and finds a patch to be applied for updating, self.result is -1
-        with self.patch_web_source as web address to patch file.
+        with self.patch_web_source as web address to patch file. Where several
+        patches must be applied in turn, self.patch_web_source is the first
+        of them, and all are listed in order in self.route, retrieved through
+        bandage.Supply.route_dump.
         If bandage.Supply succeeded in finding headers and looking up lineage
         series, however finds no patch available to upgrade with, self.result
         is 1.
@@ -586,20 +4736,31 @@ class Supply:
         self.patch_web_source are None.
 
         Preliminary information if obtained is dumped into self.pre_collect.
-        Contains version list and patchesc available, as list object.
-        Retrieved through bandage.Supply.pre_collect_dump.
+        Contains patches available and version list, as list object.
+        Retrieved through bandage.Supply.pre_collect_dump. Patches available
+        are None if the current version is the latest, as BANDAGE_PATCHES is
+        then not fetched.
+
+        Requests share the connection pool of bandage.Backend.pool_manager.
 
         See documentation for more information.
 
-        :param remote: web address of patch host
+        :param remote: web address of patch host, or path or file:// address
+            of directory
         :type remote: str
         :param version_file: path to version file
         :type version_file: str
+        :param cache_directory: path to directory for caching headers of
+            remote, which are then revalidated with ETag and Last-Modified
+            instead of downloaded again, if None headers are not cached,
+            default None
+        :type cache_directory: Union[str, None]
         """
         self.patch_web_source = None
         self.result = 1
         self.remote = remote
         self.version_file = version_file
+        self.cache_directory = cache_directory
         try:
             with open(version_file) as version_handle:
                 self.version = version_handle.read()
@@ -607,97 +4768,347 @@ class Supply:
             raise Exceptions.VersionError(
                 "VERSION file directed by path " + self.version_file +
                 " does not exist.") from ParentException
-        if "https://" not in self.remote[:8] and "http://" not in \
-                self.remote[:8]:
+        if self.remote[:7] == "file://":
+            self.remote = url2pathname(urlparse(self.remote).path)
+        # remote is a directory, i.e. a site-local mirror
+        self.local = "https://" not in self.remote[:8] and "http://" not in \
+            self.remote[:8]
+        if self.local is True and path.isdir(self.remote) is False:
             raise Exceptions.RemoteError(
                 "Supplied remote " + self.remote +
-                " is not a HTTP/HTTPS web address.")
+                " is not a HTTP/HTTPS web address or a directory.")
         if self.remote[-1:] != "/":
             self.remote += "/"
         if "https://github.com" == self.remote[:18] or "http://github.com" == \
                 self.remote[:18]:
-            if self.remote[-22:] == "/releases/tag/BANDAGE/":
-                self.pre_collect = [Backend.fetch(
-                    self.remote.rstrip("/tag/BANDAGE/") +
-                    "/download/BANDAGE/BANDAGE_PATCHES").data.decode(
-                    encoding="utf-8", errors="replace").split("\n"),
-                    Backend.fetch(
-                        self.remote.rstrip("/tag/BANDAGE/") +
-                        "/download/BANDAGE/BANDAGE_LINEAGE").data.decode(
-                    encoding="utf-8", errors="replace").split("\n")]
-                for x in range(0, len(self.pre_collect[1])):
-                    if self.version == self.pre_collect[1][x].rstrip("\r"):
-                        self.version_gap = x
-                        break
-                if self.version_gap is None:
-                    raise Exceptions.VersionError(
-                        "Version " + self.version +
-                        " does not exist in remote's lineage header.")
-                elif self.version_gap == 0:
-                    self.result = 0
-                else:
-                    compatible_sources = []
-                    for x in range(0, len(self.pre_collect[0])):
-                        if self.pre_collect[0][x].split(
-                                "||")[0].split(" -> ")[0] == self.version:
-                            compatible_sources.append(
-                                self.pre_collect[0][x].split("||")[0])
-                    if not compatible_sources:
-                        self.result = 1
-                    else:
-                        for x in self.pre_collect[0]:
-                            for y in compatible_sources:
-                                if y.split(" -> ")[1] == \
-                                        x.split("||")[0].split(" -> ")[1]:
-                                    self.result = -1
-                                    self.patch_web_source = \
-                                        self.remote.rstrip("/BANDAGE/") + \
-                                        path.join("/download/BANDAGE/",
-                                                  x.split("||")[1])
-            else:
+            if self.remote[-22:] != "/releases/tag/BANDAGE/":
                 raise Exceptions.RemoteError(
                     "Remote defined as " + self.remote + " is not supported.")
+            # release assets are served from the download path of the tag
+            self.header_source = self.remote[:-len("tag/BANDAGE/")] + \
+                "download/BANDAGE/"
         else:
-            self.pre_collect = [
-                Backend.fetch(
-                    self.remote + "BANDAGE_PATCHES"
-                    ).data.decode(encoding="utf-8", errors="replace").split(
-                    "\n"),
-                Backend.fetch(
-                    self.remote + "BANDAGE_LINEAGE"
-                    ).data.decode(encoding="utf-8", errors="replace").split(
-                    "\n")]
-            for x in range(0, len(self.pre_collect[1])):
-                if self.version == self.pre_collect[1][x]:
-                    self.version_gap = x
-                    break
-            if self.version_gap is None:
-                raise Exceptions.VersionError(
-                    "Version " + self.version +
-                    " does not exist in remote's lineage header.")
-            elif self.version_gap == 0:
-                self.result = 0
+            self.header_source = self.remote
+        self.route = []
+        # patches header is only fetched if the current version is not the
+        # latest, so a check with nothing to update makes a single request
+        self.pre_collect = [None, Supply.fetch_header(self,
+                                                      "BANDAGE_LINEAGE")]
+        # version -> position in lineage, 0 being the latest
+        self.lineage = {}
+        for x in range(0, len(self.pre_collect[1])):
+            self.lineage.setdefault(self.pre_collect[1][x].rstrip("\r"), x)
+        self.version_gap = self.lineage.get(self.version)
+        if self.version_gap is None:
+            raise Exceptions.VersionError(
+                "Version " + self.version +
+                " does not exist in remote's lineage header.")
+        elif self.version_gap == 0:
+            self.result = 0
+        else:
+            self.pre_collect[0] = Supply.fetch_header(self, "BANDAGE_PATCHES")
+            self.route = Supply.plan_route(self)
+            if self.route:
+                self.result = -1
+                self.patch_web_source = self.route[0]
+
+    def plan_route(self) -> list:
+        """
+        Find the cheapest chain of patches from the current version to the \
+            latest version in lineage, return web addresses of the patches \
+            in the order they are applied.
+
+        Patches are indexed by their upgrade-from version into a graph,
+        searched with Dijkstra's algorithm. Each patch weighs its size when
+        BANDAGE_PATCHES lists one, otherwise the mean size of the patches
+        listing one, ties are broken by the number of patches. If the latest
+        version cannot be reached, the chain leads to the latest version
+        that can be.
+
+        :return: web addresses of patches, empty if no newer version can be
+            reached
+        :rtype: list
+        """
+        # upgrade-from version -> [upgrade-to version, patch name, size]
+        patches = {}
+        sizes = []
+        for line in self.pre_collect[0]:
+            line = line.rstrip("\r")
+            if line.strip() == "":
+                continue
+            fields = line.split("||")
+            versions = fields[0].split(" -> ")
+            if len(fields) < 2 or len(versions) != 2:
+                raise Exceptions.UnableToParseError(
+                    "Line " + line + " of remote's patches header is " +
+                    "malformed.")
+            size = None
+            if len(fields) > 2 and fields[2] != "":
+                try:
+                    size = int(fields[2])
+                except ValueError as ParentException:
+                    raise Exceptions.UnableToParseError(
+                        "Line " + line + " of remote's patches header has " +
+                        "an invalid size.") from ParentException
+                sizes.append(size)
+            patches.setdefault(versions[0], []).append(
+                [versions[1], fields[1], size])
+        unknown_size = sum(sizes) / len(sizes) if sizes else 1
+        # version -> (total size, number of patches) of cheapest chain
+        costs = {self.version: (0, 0)}
+        # version -> (previous version, patch name) of cheapest chain
+        previous = {}
+        queue = [(0, 0, self.version)]
+        while queue:
+            size, hops, version = heappop(queue)
+            if (size, hops) > costs[version]:
+                continue
+            for upgrade, name, patch_size in patches.get(version, []):
+                cost = (size + (unknown_size if patch_size is None else
+                                patch_size), hops + 1)
+                if upgrade not in costs or cost < costs[upgrade]:
+                    costs[upgrade] = cost
+                    previous[upgrade] = (version, name)
+                    heappush(queue, cost + (upgrade,))
+        destination = None
+        for x in range(0, self.version_gap):
+            if self.pre_collect[1][x].rstrip("\r") in costs:
+                destination = self.pre_collect[1][x].rstrip("\r")
+                break
+        route = []
+        while destination is not None and destination != self.version:
+            version, name = previous[destination]
+            if name[:8] == "https://" or "http://" in name[:8]:
+                route.append(name)
             else:
-                compatible_sources = []
-                for x in range(0, len(self.pre_collect[0])):
-                    if self.pre_collect[0][x].split(
-                            "||")[0].split(" -> ")[0] == self.version:
-                        compatible_sources.append(
-                            self.pre_collect[0][x].split("||")[0])
-                if not compatible_sources:
-                    self.result = 1
-                else:
-                    for x in self.pre_collect[0]:
-                        for y in compatible_sources:
-                            if y.split(" -> ")[1] == \
-                                    x.split("||")[0].split(" -> ")[1]:
-                                self.result = -1
-                                if x.split("||")[1][:8] == "https://" or \
-                                        "http://" in x.split("||")[1][:8]:
-                                    self.patch_web_source = x.split("||")[1]
-                                else:
-                                    self.patch_web_source = path.join(
-                                        self.remote, x.split("||")[1])
+                route.append(self.header_source + name)
+            destination = version
+        route.reverse()
+        return route
+
+    def fetch_header(self, name: str) -> list:
+        """
+        Fetch header file such as BANDAGE_LINEAGE from remote, return its \
+            lines.
+
+        If a cache directory was given, the header is revalidated against a
+        copy cached on disk through Backend.fetch_cached. Headers of directory
+        remotes are read directly.
+
+        :param name: name of header file
+        :type name: str
+        :return: lines of header file
+        :rtype: list
+        """
+        if self.local is True:
+            try:
+                with open(self.header_source + name, "rb") as header_handle:
+                    content = header_handle.read()
+            except FileNotFoundError as ParentException:
+                raise Exceptions.FetchError(
+                    "Failed to fetch resource, " + self.header_source + name +
+                    " does not exist.") from ParentException
+        elif self.cache_directory is None:
+            content = Backend.fetch(self.header_source + name).data
+        else:
+            content = Backend.fetch_cached(self.header_source + name,
+                                           self.cache_directory)
+        return content.decode(encoding="utf-8", errors="replace").split("\n")
+
+    @staticmethod
+    async def check(remote: str, version_file: str,
+                    cache_directory: Union[str, None] = None,
+                    timeout: Union[float, None] = None,
+                    executor: Union[ThreadPoolExecutor, None] = None) -> \
+            "Supply":
+        """
+        Awaitable bandage.Supply, checks remote for new patches without \
+            blocking the event loop, return the Supply instance.
+
+        Supply is created in a thread of executor, requests still share the
+        connection pool of bandage.Backend.pool_manager. Timeouts of single
+        requests are set on the pool manager through
+        bandage.Backend.set_pool_manager.
+
+        :param remote: web address of patch host
+        :type remote: str
+        :param version_file: path to version file
+        :type version_file: str
+        :param cache_directory: path to directory for caching headers of
+            remote, default None
+        :type cache_directory: Union[str, None]
+        :param timeout: seconds to wait for the check before raising
+            asyncio.TimeoutError, if None waits indefinitely, default None
+        :type timeout: Union[float, None]
+        :param executor: thread pool to run check in, if None the default
+            executor of the event loop, default None
+        :type executor: Union[ThreadPoolExecutor, None]
+        :return: Supply instance, see bandage.Supply.realize
+        :rtype: Supply
+        """
+        check = asyncio.get_running_loop().run_in_executor(
+            executor, partial(Supply, remote, version_file, cache_directory))
+        if timeout is None:
+            return await check
+        return await asyncio.wait_for(check, timeout)
+
+    @staticmethod
+    async def check_all(checks: list, per_host: int = 4,
+                        timeout: Union[float, None] = None,
+                        max_workers: Union[int, None] = None) -> list:
+        """
+        Check many remotes and targets for new patches concurrently, return \
+            a result per check.
+
+        Checks run in a thread pool of their own, at most per_host at a time
+        against the same host, so the whole batch takes about as long as the
+        slowest remote. A failure or timeout of one check does not affect the
+        others.
+
+        :param checks: contains (remote, version_file) or (remote,
+            version_file, cache_directory) tuples, see bandage.Supply
+        :type checks: list
+        :param per_host: maximum number of checks running at the same time
+            against one host, default 4
+        :type per_host: int
+        :param timeout: seconds to wait for each check, if None waits
+            indefinitely, default None
+        :type timeout: Union[float, None]
+        :param max_workers: maximum number of threads running checks, if None,
+            decided by concurrent.futures.ThreadPoolExecutor, default None
+        :type max_workers: Union[int, None]
+        :return: contains, in the same order as checks, the Supply instance of
+            each check, or the exception raised by it
+        :rtype: list
+        """
+        # host -> semaphore limiting checks running against it
+        semaphores = {}
+        for check in checks:
+            host = urlparse(check[0]).netloc
+            if host not in semaphores:
+                semaphores[host] = asyncio.Semaphore(per_host)
+        executor = ThreadPoolExecutor(max_workers)
+        try:
+            return await asyncio.gather(*[
+                Supply.check_limited(semaphores[urlparse(check[0]).netloc],
+                                     check, timeout, executor)
+                for check in checks])
+        finally:
+            # threads of checks that timed out are left to finish on their own
+            executor.shutdown(wait=False)
+
+    @staticmethod
+    async def check_limited(semaphore: asyncio.Semaphore, check: tuple,
+                            timeout: Union[float, None],
+                            executor: ThreadPoolExecutor) -> object:
+        """
+        Run a check of bandage.Supply.check_all once semaphore allows, \
+            return the Supply instance or the exception raised.
+
+        :param semaphore: semaphore of the host checked
+        :type semaphore: asyncio.Semaphore
+        :param check: (remote, version_file) or (remote, version_file,
+            cache_directory) tuple
+        :type check: tuple
+        :param timeout: seconds to wait for the check, or None
+        :type timeout: Union[float, None]
+        :param executor: thread pool to run check in
+        :type executor: ThreadPoolExecutor
+        :return: Supply instance or exception
+        :rtype: object
+        """
+        async with semaphore:
+            try:
+                return await Supply.check(*check, timeout=timeout,
+                                          executor=executor)
+            except asyncio.CancelledError:
+                raise
+            except BaseException as error:
+                # exceptions of bandage derive from BaseException
+                return error
+
+    @staticmethod
+    def watch(remote: str, target: str,
+              version_file: Union[str, None] = None,
+              interval: float = 3600, max_interval: float = 86400,
+              cache_directory: Union[str, None] = None,
+              stop_event: Union[Event, None] = None,
+              iterations: Union[int, None] = None,
+              report: Union[Callable, None] = None, **options) -> list:
+        """
+        Poll remote for new patches and apply them to target as they are \
+            published, until stopped, return web addresses of patches applied.
+
+        Inorganic and for robots. Meant to run for the lifetime of a process,
+        so that requests reuse the connections of
+        bandage.Backend.pool_manager and, with a cache directory, headers are
+        only revalidated. When bandage.Supply finds an update, the patches of
+        its route are handed to bandage.Patcher in order.
+
+        Polls are spaced by interval, a failed poll or patch doubles the wait
+        up to max_interval, until a poll succeeds again. Waits are jittered
+        between half and all of their length, so many watchers started
+        together spread out over time.
+
+        :param remote: web address of patch host
+        :type remote: str
+        :param target: path to application directory for patching
+        :type target: str
+        :param version_file: path to version file, if None VERSION of target,
+            default None
+        :type version_file: Union[str, None]
+        :param interval: seconds between polls, default 3600
+        :type interval: float
+        :param max_interval: maximum seconds between polls after failures,
+            default 86400
+        :type max_interval: float
+        :param cache_directory: path to directory for caching headers of
+            remote, default None
+        :type cache_directory: Union[str, None]
+        :param stop_event: watching stops once event is set, also while
+            waiting for the next poll, default None
+        :type stop_event: Union[Event, None]
+        :param iterations: maximum number of polls, if None polls until
+            stop_event is set, default None
+        :type iterations: Union[int, None]
+        :param report: called after each poll with the Supply instance, or
+            the exception raised polling or patching, default None
+        :type report: Union[Callable, None]
+        :param options: keyword arguments passed on to Patcher
+        :return: web addresses of patches applied, in order
+        :rtype: list
+        """
+        if version_file is None:
+            version_file = path.join(target, "VERSION")
+        if stop_event is None:
+            stop_event = Event()
+        applied = []
+        failures = 0
+        polls = 0
+        while stop_event.is_set() is False and (iterations is None or
+                                                polls < iterations):
+            polls += 1
+            try:
+                supplier = Supply(remote, version_file, cache_directory)
+                if supplier.result == -1:
+                    for patch in supplier.route:
+                        Patcher(patch, target, **options)
+                        applied.append(patch)
+                failures = 0
+                outcome = supplier
+            except BaseException as error:
+                # exceptions of bandage derive from BaseException
+                if isinstance(error, (KeyboardInterrupt, SystemExit)):
+                    raise
+                failures += 1
+                outcome = error
+            if report is not None:
+                report(outcome)
+            if iterations is not None and polls >= iterations:
+                break
+            delay = min(max_interval, interval * 2 ** min(failures, 32))
+            stop_event.wait(uniform(delay / 2, delay))
+        return applied
 
     def realize(self) -> list:
         """
@@ -708,6 +5119,18 @@ class Supply:
         """
         return [self.result, self.patch_web_source]
 
+    def route_dump(self) -> list:
+        """
+        Return self.route, web addresses of the chain of patches leading to \
+            the latest reachable version, in the order they are applied.
+
+        The first address is self.patch_web_source.
+
+        :return: route
+        :rtype: list
+        """
+        return self.route
+
     def pre_collect_dump(self) -> list:
         """
         Return self.pre_collect_dump.
@@ -0,0 +1,88 @@
+"""unit test for skipping applied items in bandage.Patcher"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import bandage
+
+TESTS = os.path.dirname(os.path.abspath(__file__))
+
+
+def tree(root: str) -> dict:
+    """Map relative paths of directory to file contents, None for dirs."""
+    dump = {}
+    for directory, subdirectories, files in os.walk(root):
+        for name in files:
+            with open(os.path.join(directory, name), "rb") as handle:
+                dump[os.path.relpath(os.path.join(directory, name), root)] = \
+                    handle.read()
+        for name in subdirectories:
+            dump[os.path.relpath(os.path.join(directory, name), root)] = None
+    return dump
+
+
+class AppliedTest(unittest.TestCase):
+    """Patch targets already partly or fully in the upgrade-to state."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Weave patch from old.zip to new.zip."""
+        cls.directory = tempfile.mkdtemp()
+        cls.patch = bandage.Weave(os.path.join(TESTS, "old.zip"),
+                                  os.path.join(TESTS, "new.zip"),
+                                  cls.directory + "/").patch_path
+        shutil.unpack_archive(os.path.join(TESTS, "new.zip"),
+                              os.path.join(cls.directory, "new"))
+        cls.new = tree(os.path.join(cls.directory, "new"))
+
+    @classmethod
+    def tearDownClass(cls):
+        """Remove patch and release."""
+        shutil.rmtree(cls.directory)
+
+    def setUp(self):
+        """Unpack old release as target."""
+        self.target = tempfile.mkdtemp()
+        shutil.unpack_archive(os.path.join(TESTS, "old.zip"), self.target)
+
+    def tearDown(self):
+        """Remove target."""
+        shutil.rmtree(self.target)
+
+    def test_patch_twice(self):
+        """Patching an already patched target leaves it unchanged."""
+        bandage.Patcher(self.patch, self.target)
+        patcher = bandage.Patcher(self.patch, self.target)
+        self.assertIn(("add", "foradd.txt"), patcher.applied)
+        self.assertIn(("remove", "forremoval.txt"), patcher.applied)
+        self.assertEqual(tree(self.target), self.new)
+
+    def test_partly_applied(self):
+        """Items already matching the patch are skipped."""
+        shutil.copy(os.path.join(self.directory, "new", "foradd.txt"),
+                    self.target)
+        patcher = bandage.Patcher(self.patch, self.target)
+        self.assertEqual(patcher.applied, [("add", "foradd.txt")])
+        self.assertEqual(tree(self.target), self.new)
+
+    def test_refused_without_skip_applied(self):
+        """Patched target is refused when skip_applied is False."""
+        bandage.Patcher(self.patch, self.target)
+        with self.assertRaises(bandage.Exceptions.VersionError):
+            bandage.Patcher(self.patch, self.target, skip_applied=False)
+
+    def test_missing_replacement(self):
+        """Target missing an item for replacement is refused."""
+        os.remove(os.path.join(self.target, "unique.txt"))
+        for skip_manifest_check in [False, True]:
+            with self.assertRaises(bandage.Exceptions.TargetError):
+                bandage.Patcher(self.patch, self.target,
+                                skip_manifest_check=skip_manifest_check)
+        self.assertFalse(os.path.lexists(os.path.join(self.target,
+                                                      "unique.txt")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+"""unit test for the download cache of bandage.Backend"""
+
+import os
+import unittest
+
+import bandage
+from test_fetch import Handler, Server
+
+
+class CacheTest(Server, unittest.TestCase):
+    """Serve downloads from a cache directory, and evict from it."""
+
+    def test_cache(self):
+        """Cached download is served without a request."""
+        bandage.Backend.set_cache(self.destination("cache"))
+        for name in ["first", "second"]:
+            self.assertEqual(bandage.Backend.download(
+                self.base + "file", self.destination(name),
+                expected=self.digest), self.digest)
+        self.assertEqual(len(Handler.requests), 1)
+
+    def test_expected_mismatch(self):
+        """Content not matching expected is neither kept nor cached."""
+        bandage.Backend.set_cache(self.destination("cache"))
+        for x in range(0, 2):
+            with self.assertRaises(bandage.Exceptions.FetchError):
+                bandage.Backend.download(self.base + "file",
+                                         self.destination("file"),
+                                         expected="0" * 64)
+        self.assertEqual(len(Handler.requests), 2)
+        self.assertFalse(os.path.exists(self.destination("file")))
+        self.assertEqual(os.listdir(self.destination("cache/objects")), [])
+
+    def test_evict(self):
+        """Least recently used objects are evicted, partial downloads and \
+            their validators are left alone."""
+        objects = self.destination("objects")
+        os.mkdir(objects)
+        for x, name in enumerate(["old", "new", "a.part", "a.part.part",
+                                  "a.part.part.validator"]):
+            with open(os.path.join(objects, name), "wb") as handle:
+                handle.write(b"X" * 100)
+            os.utime(os.path.join(objects, name), (x, x))
+        bandage.Backend.cache_evict(objects, 150)
+        self.assertEqual(sorted(os.listdir(objects)), [
+            "a.part", "a.part.part", "a.part.part.validator", "new"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+"""unit test for reading and writing CHANGE.json of bandage.Backend"""
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+import bandage
+
+TESTS = os.path.dirname(os.path.abspath(__file__))
+# v1 patch woven before the v2 format
+LEGACY = os.path.join(TESTS, "BandageTest_0.0_to_1.0_bandage_patch.zip")
+
+
+def read(text: str) -> list:
+    """Read CHANGE.json from string."""
+    return bandage.Backend.read_change(io.StringIO(text))
+
+
+class ChangeTest(unittest.TestCase):
+    """Parse both formats of CHANGE.json, and refuse malformed ones."""
+
+    def test_v1(self):
+        """v1 CHANGE.json of a legacy patch is parsed, without entries."""
+        with zipfile.ZipFile(LEGACY) as archive:
+            change, entries = read(archive.read("CHANGE.json").decode(
+                "utf-8"))
+        self.assertEqual(change["remove"], ["forremoval.txt"])
+        self.assertEqual(change["replace"], ["VERSION", "unique.txt"])
+        self.assertIn("common/sub", change["add"])
+        self.assertEqual(change["delta"], [])
+        self.assertEqual(change["move"], [])
+        self.assertEqual(entries, {})
+
+    def test_v1_indented(self):
+        """v1 CHANGE.json spanning several lines is parsed."""
+        change = read(json.dumps({"remove": str(["a, b.txt", "it's"]),
+                                  "add": "[]", "keep": "[]",
+                                  "replace": "[]"}, indent=4))[0]
+        self.assertEqual(change["remove"], ["a, b.txt", "it's"])
+
+    def test_v2(self):
+        """v2 CHANGE.json written by Backend.change_lines reads back."""
+        change = {"remove": ["gone.txt"], "add": ["new"], "keep": ["NAME"],
+                  "replace": ["VERSION"], "delta": ["big.bin"],
+                  "move": ["moved.txt"], "copy": ["copy.txt"]}
+        entries = {"new": {"type": "directory", "mode": 493},
+                   "moved.txt": {"type": "file", "source": "old.txt",
+                                 "digest": "0" * 64},
+                   "copy.txt": {"payload": "add/new/file.txt"}}
+        text = "".join(bandage.Backend.change_lines(change, entries))
+        self.assertEqual(json.loads(text.splitlines()[0]), {"format": 2})
+        parsed, parsed_entries = read(text + "\n")
+        self.assertEqual(parsed, change)
+        self.assertEqual(parsed_entries["moved.txt"]["source"], "old.txt")
+        self.assertEqual(parsed_entries["new"]["type"], "directory")
+        self.assertEqual(parsed_entries["gone.txt"],
+                         {"op": "remove", "path": "gone.txt"})
+
+    def test_malformed(self):
+        """Malformed headers, formats and entries are refused."""
+        for text in ['["format", 2]\n', '{"format": 3}\n',
+                     '{"format": 2}\n{"op": "rename", "path": "a"}\n',
+                     '{"format": 2}\n{"path": "a"}\n',
+                     '{"format": 2}\nnot json\n',
+                     '{"remove": "[unterminated"}']:
+            with self.assertRaises(bandage.Exceptions.UnableToParseError):
+                read(text)
+
+    def test_patch_v1(self):
+        """Legacy v1 patch upgrades target to the new release."""
+        directory = tempfile.mkdtemp()
+        try:
+            target = os.path.join(directory, "target")
+            shutil.unpack_archive(os.path.join(TESTS, "old.zip"), target)
+            bandage.Patcher(LEGACY, target)
+            with open(os.path.join(target, "VERSION")) as handle:
+                self.assertEqual(handle.read(), "1.0")
+            self.assertFalse(os.path.exists(os.path.join(
+                target, "forremoval.txt")))
+            self.assertTrue(os.path.isfile(os.path.join(
+                target, "common/sub/another.txt")))
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+"""unit test for binary deltas of bandage.Backend and bandage.Weave"""
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import bandage
+
+
+def mutate(data: bytes, seed: int) -> bytes:
+    """Insert, delete and overwrite random spans of data."""
+    generator = random.Random(seed)
+    data = bytearray(data)
+    for x in range(0, 20):
+        position = generator.randrange(len(data))
+        kind = generator.randrange(3)
+        if kind == 0:
+            data[position:position] = generator.randbytes(
+                generator.randrange(1, 4000))
+        elif kind == 1:
+            del data[position:position + generator.randrange(1, 4000)]
+        else:
+            data[position:position + 100] = generator.randbytes(100)
+    return bytes(data)
+
+
+def release(root: str, version: str, files: dict) -> str:
+    """Write release directory with NAME and VERSION, return its zip."""
+    for name, content in files.items():
+        os.makedirs(os.path.dirname(os.path.join(root, name)), exist_ok=True)
+        with open(os.path.join(root, name), "wb") as handle:
+            handle.write(content)
+    with open(os.path.join(root, "NAME"), "w") as handle:
+        handle.write("DeltaTest")
+    with open(os.path.join(root, "VERSION"), "w") as handle:
+        handle.write(version)
+    return shutil.make_archive(root, "zip", root)
+
+
+class DeltaTest(unittest.TestCase):
+    """Encode, apply and compose deltas."""
+
+    def setUp(self):
+        """Create directory for files."""
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove directory for files."""
+        shutil.rmtree(self.directory)
+
+    def write(self, name: str, content: bytes) -> str:
+        """Write file under test directory, return its path."""
+        with open(os.path.join(self.directory, name), "wb") as handle:
+            handle.write(content)
+        return os.path.join(self.directory, name)
+
+    def read(self, name: str) -> bytes:
+        """Read file under test directory."""
+        with open(os.path.join(self.directory, name), "rb") as handle:
+            return handle.read()
+
+    def test_round_trip(self):
+        """Delta of an edited file rebuilds it, and is smaller."""
+        old = os.urandom(500000)
+        new = mutate(old, 1)
+        self.assertTrue(bandage.Backend.delta_encode(
+            self.write("old", old), self.write("new", new),
+            os.path.join(self.directory, "delta"), 1024))
+        self.assertLess(os.path.getsize(os.path.join(self.directory,
+                                                     "delta")), len(new))
+        bandage.Backend.delta_apply(
+            os.path.join(self.directory, "old"),
+            os.path.join(self.directory, "delta"),
+            os.path.join(self.directory, "rebuilt"))
+        self.assertEqual(self.read("rebuilt"), new)
+
+    def test_unrelated(self):
+        """Delta of an unrelated file is given up on, leaving no file."""
+        self.assertFalse(bandage.Backend.delta_encode(
+            self.write("old", os.urandom(500000)),
+            self.write("new", os.urandom(500000)),
+            os.path.join(self.directory, "delta")))
+        self.assertFalse(os.path.exists(os.path.join(self.directory,
+                                                     "delta")))
+
+    def test_wrong_old_file(self):
+        """Delta applied to a file of another size is refused."""
+        old = os.urandom(100000)
+        bandage.Backend.delta_encode(
+            self.write("old", old), self.write("new", mutate(old, 2)),
+            os.path.join(self.directory, "delta"), 1024)
+        self.write("other", old[:-1])
+        with self.assertRaises(bandage.Exceptions.PatchError):
+            bandage.Backend.delta_apply(
+                os.path.join(self.directory, "other"),
+                os.path.join(self.directory, "delta"),
+                os.path.join(self.directory, "rebuilt"))
+
+    def test_compose(self):
+        """Composed deltas rebuild the last file from the first."""
+        versions = [os.urandom(300000)]
+        for x in range(0, 3):
+            versions.append(mutate(versions[-1], 10 + x))
+            self.write("v" + str(x + 1), versions[-1])
+            self.assertTrue(bandage.Backend.delta_encode(
+                os.path.join(self.directory, "v" + str(x)) if x else
+                self.write("v0", versions[0]),
+                os.path.join(self.directory, "v" + str(x + 1)),
+                os.path.join(self.directory, "d" + str(x)), 512))
+        composed = os.path.join(self.directory, "d0")
+        for x in range(1, 3):
+            with open(os.path.join(self.directory, "d" + str(x)), "rb") as \
+                    handle:
+                bandage.Backend.delta_compose(
+                    composed, handle,
+                    os.path.join(self.directory, "c" + str(x)))
+            composed = os.path.join(self.directory, "c" + str(x))
+        bandage.Backend.delta_apply(os.path.join(self.directory, "v0"),
+                                    composed, os.path.join(self.directory,
+                                                           "rebuilt"))
+        self.assertEqual(self.read("rebuilt"), versions[-1])
+
+    def test_weave_and_patch(self):
+        """Patch woven in delta mode upgrades target to the new release."""
+        big = os.urandom(200000)
+        old = release(os.path.join(self.directory, "old"), "1",
+                      {"big.bin": big, "same.txt": b"same"})
+        new = release(os.path.join(self.directory, "new"), "2",
+                      {"big.bin": mutate(big, 3), "same.txt": b"same"})
+        os.mkdir(os.path.join(self.directory, "out"))
+        weave = bandage.Weave(old, new, os.path.join(self.directory, "out")
+                              + "/", delta=True)
+        self.assertEqual(weave.index[4], ["big.bin"])
+        target = os.path.join(self.directory, "target")
+        shutil.unpack_archive(old, target)
+        bandage.Patcher(weave.patch_path, target)
+        with open(os.path.join(target, "big.bin"), "rb") as handle:
+            self.assertEqual(handle.read(), mutate(big, 3))
+        with open(os.path.join(target, "VERSION")) as handle:
+            self.assertEqual(handle.read(), "2")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+"""unit test for resumable and segmented downloads of bandage.Backend"""
+
+import os
+import unittest
+
+import bandage
+from test_fetch import CONTENT, ETAG, Handler, Server
+
+
+class DownloadTest(Server, unittest.TestCase):
+    """Resume downloads and fetch them in segments."""
+
+    def test_resume_after_failure(self):
+        """Download cut short is resumed with a Range request."""
+        Handler.failures[0] = 2
+        self.assertEqual(bandage.Backend.download(
+            self.base + "flaky", self.destination("file"),
+            algorithm="sha256"), self.digest)
+        self.assertIsNotNone(Handler.requests[-1][1])
+        self.assertEqual(os.listdir(self.directory), ["file"])
+
+    def test_resume_part(self):
+        """Part file of an earlier run is resumed against its validator."""
+        with open(self.destination("file.part"), "wb") as handle:
+            handle.write(CONTENT[:1000])
+        with open(self.destination("file.part.validator"), "w") as handle:
+            handle.write(ETAG)
+        self.assertEqual(bandage.Backend.download(
+            self.base + "file", self.destination("file"),
+            algorithm="sha256"), self.digest)
+        self.assertEqual(Handler.requests, [("/file", "bytes=1000-")])
+        self.assertEqual(os.listdir(self.directory), ["file"])
+
+    def test_stale_part(self):
+        """Part file with an outdated validator is fetched again in full."""
+        with open(self.destination("file.part"), "wb") as handle:
+            handle.write(b"X" * 1000)
+        with open(self.destination("file.part.validator"), "w") as handle:
+            handle.write('"outdated"')
+        self.assertEqual(bandage.Backend.download(
+            self.base + "file", self.destination("file"),
+            algorithm="sha256"), self.digest)
+
+    def test_part_without_validator(self):
+        """Part file without a validator is discarded."""
+        with open(self.destination("file.part"), "wb") as handle:
+            handle.write(b"X" * 1000)
+        self.assertEqual(bandage.Backend.download(
+            self.base + "file", self.destination("file"),
+            algorithm="sha256"), self.digest)
+        self.assertEqual(Handler.requests, [("/file", None)])
+
+    def test_segments(self):
+        """Download fetched as concurrent segments matches content."""
+        self.assertEqual(bandage.Backend.download(
+            self.base + "file", self.destination("file"), algorithm="sha256",
+            segments=4), self.digest)
+        self.assertGreater(len(Handler.requests), 1)
+
+    def test_mirrors(self):
+        """Download failing on target is resumed from a mirror."""
+        Handler.failures[0] = 1
+        self.assertEqual(bandage.Backend.download(
+            self.base + "flaky", self.destination("file"),
+            algorithm="sha256", mirrors=[self.base + "file"]), self.digest)
+        self.assertEqual(Handler.requests[-1][0], "/file")
+
+
+if __name__ == "__main__":
+    unittest.main()
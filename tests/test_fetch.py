@@ -0,0 +1,136 @@
+"""unit test for streaming downloads of bandage.Backend"""
+
+import hashlib
+import http.server
+import os
+import re
+import shutil
+import tempfile
+import threading
+import unittest
+
+import bandage
+
+CONTENT = os.urandom(3 * 1024 * 1024 + 123)
+ETAG = '"content"'
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    """Serve CONTENT with ranges, If-Range and ETag, recording requests."""
+
+    protocol_version = "HTTP/1.1"
+    # (path, Range header) of requests served
+    requests = []
+    # number of responses of /flaky still to cut short
+    failures = [0]
+
+    def log_message(self, *arguments):
+        """Keep test output quiet."""
+
+    def do_GET(self):
+        """Serve CONTENT, or the range requested if still current."""
+        Handler.requests.append((self.path, self.headers.get("Range")))
+        start = 0
+        end = len(CONTENT)
+        status = 200
+        match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if match is not None and self.headers.get("If-Range",
+                                                  ETAG) == ETAG:
+            start = int(match.group(1))
+            if match.group(2):
+                end = int(match.group(2)) + 1
+            status = 206
+        body = CONTENT[start:end]
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", ETAG)
+        if status == 206:
+            self.send_header("Content-Range", "bytes " + str(start) + "-" +
+                             str(end - 1) + "/" + str(len(CONTENT)))
+        self.end_headers()
+        if self.path == "/flaky" and Handler.failures[0] > 0:
+            Handler.failures[0] -= 1
+            self.wfile.write(body[:len(body) // 3])
+            self.wfile.flush()
+            self.connection.shutdown(2)
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+class Server:
+    """Run a local HTTP server serving CONTENT, and a download directory."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Start HTTP server."""
+        cls.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0),
+                                                     Handler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = "http://127.0.0.1:" + str(cls.server.server_port) + "/"
+        cls.digest = hashlib.sha256(CONTENT).hexdigest()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop HTTP server."""
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        """Create directory for downloads."""
+        self.directory = tempfile.mkdtemp()
+        Handler.requests.clear()
+        Handler.failures[0] = 0
+
+    def tearDown(self):
+        """Remove directory for downloads and cache."""
+        bandage.Backend.set_cache(None)
+        shutil.rmtree(self.directory)
+
+    def destination(self, name: str) -> str:
+        """Return path under directory for downloads."""
+        return os.path.join(self.directory, name)
+
+
+class FetchTest(Server, unittest.TestCase):
+    """Stream downloads from a local HTTP server to disk."""
+
+    def test_download(self):
+        """Content is written to destination and hashed on the way."""
+        self.assertEqual(bandage.Backend.download(
+            self.base + "file", self.destination("file"),
+            algorithm="sha256"), self.digest)
+        with open(self.destination("file"), "rb") as handle:
+            self.assertEqual(handle.read(), CONTENT)
+        self.assertEqual(os.listdir(self.directory), ["file"])
+
+    def test_progress(self):
+        """Progress is reported per chunk up to Content-Length."""
+        reports = []
+        bandage.Backend.download(self.base + "file", self.destination("file"),
+                                 lambda received, total:
+                                 reports.append((received, total)))
+        self.assertGreater(len(reports), 1)
+        self.assertEqual(reports[-1], (len(CONTENT), len(CONTENT)))
+        self.assertEqual(reports, sorted(reports))
+
+    def test_cut_short(self):
+        """Body ending short of Content-Length raises FetchError."""
+        Handler.failures[0] = 1
+        with self.assertRaises(bandage.Exceptions.FetchError):
+            bandage.Backend.download(self.base + "flaky",
+                                     self.destination("file"), retries=0)
+        self.assertFalse(os.path.exists(self.destination("file")))
+
+    def test_fetch(self):
+        """Backend.fetch without preload streams the response."""
+        fetch_request = bandage.Backend.fetch(self.base + "file",
+                                              preload=False)
+        try:
+            self.assertEqual(b"".join(fetch_request.stream(65536)), CONTENT)
+        finally:
+            fetch_request.release_conn()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+"""unit test for the file index of bandage.Patcher"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import bandage
+
+TESTS = os.path.dirname(os.path.abspath(__file__))
+
+
+class IndexTest(unittest.TestCase):
+    """Verify targets against their index, and keep it up to date."""
+
+    def setUp(self):
+        """Unpack old release as target."""
+        self.target = tempfile.mkdtemp()
+        shutil.unpack_archive(os.path.join(TESTS, "old.zip"), self.target)
+
+    def tearDown(self):
+        """Remove target."""
+        shutil.rmtree(self.target)
+
+    def index(self) -> dict:
+        """Read index of target."""
+        with open(os.path.join(self.target, bandage.Patcher.INDEX)) as \
+                handle:
+            return json.load(handle)
+
+    def edit(self, name: str, content: bytes) -> None:
+        """Overwrite file of target, moving its modification time on."""
+        current = os.path.join(self.target, name)
+        modified = os.stat(current).st_mtime_ns + 10 ** 9
+        with open(current, "wb") as handle:
+            handle.write(content)
+        os.utime(current, ns=(modified, modified))
+
+    def test_created(self):
+        """First verification indexes every file of target."""
+        self.assertEqual(bandage.Patcher.verify(self.target), [[], [], []])
+        self.assertIn("unique.txt", self.index())
+        self.assertIn("common/same.txt", self.index())
+        self.assertNotIn(bandage.Patcher.INDEX, self.index())
+
+    def test_differences(self):
+        """Modified, missing and untracked files are reported."""
+        bandage.Patcher.verify(self.target)
+        with open(os.path.join(self.target, "unique.txt"), "rb") as handle:
+            content = handle.read()
+        self.edit("unique.txt", bytes([content[0] ^ 1]) + content[1:])
+        os.remove(os.path.join(self.target, "forremoval.txt"))
+        with open(os.path.join(self.target, "extra.txt"), "w") as handle:
+            handle.write("extra")
+        self.assertEqual(bandage.Patcher.verify(self.target),
+                         [["unique.txt"], ["forremoval.txt"], ["extra.txt"]])
+
+    def test_touched(self):
+        """File with a new modification time but the same content is not \
+            reported, and its index entry is refreshed."""
+        bandage.Patcher.verify(self.target)
+        with open(os.path.join(self.target, "unique.txt"), "rb") as handle:
+            content = handle.read()
+        self.edit("unique.txt", content)
+        self.assertEqual(bandage.Patcher.verify(self.target), [[], [], []])
+        self.assertEqual(self.index()["unique.txt"][1], os.stat(
+            os.path.join(self.target, "unique.txt")).st_mtime_ns)
+
+    def test_updated_by_patch(self):
+        """Patched items are indexed again, others keep their entries."""
+        bandage.Patcher.verify(self.target)
+        kept = self.index()["common/same.txt"]
+        directory = tempfile.mkdtemp()
+        try:
+            patch = bandage.Weave(os.path.join(TESTS, "old.zip"),
+                                  os.path.join(TESTS, "new.zip"),
+                                  directory + "/").patch_path
+            bandage.Patcher(patch, self.target)
+        finally:
+            shutil.rmtree(directory)
+        index = self.index()
+        self.assertEqual(index["common/same.txt"], kept)
+        self.assertIn("foradd.txt", index)
+        self.assertIn("innew/test.txt", index)
+        self.assertNotIn("forremoval.txt", index)
+        self.assertEqual(bandage.Patcher.verify(self.target), [[], [], []])
+
+
+if __name__ == "__main__":
+    unittest.main()
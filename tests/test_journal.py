@@ -0,0 +1,126 @@
+"""unit test for journaled patching of bandage.Patcher"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import bandage
+
+TESTS = os.path.dirname(os.path.abspath(__file__))
+
+
+def tree(root: str) -> dict:
+    """Map relative paths of directory to file contents, None for dirs."""
+    dump = {}
+    for directory, subdirectories, files in os.walk(root):
+        for name in files:
+            with open(os.path.join(directory, name), "rb") as handle:
+                dump[os.path.relpath(os.path.join(directory, name), root)] = \
+                    handle.read()
+        for name in subdirectories:
+            dump[os.path.relpath(os.path.join(directory, name), root)] = None
+    return dump
+
+
+class Interrupted(BaseException):
+    """Raised to simulate the process dying mid-patch."""
+
+
+class JournalTest(unittest.TestCase):
+    """Interrupt patching, then resume or roll back target."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Weave patch from old.zip to new.zip."""
+        cls.directory = tempfile.mkdtemp()
+        cls.patch = bandage.Weave(os.path.join(TESTS, "old.zip"),
+                                  os.path.join(TESTS, "new.zip"),
+                                  cls.directory + "/").patch_path
+        shutil.unpack_archive(os.path.join(TESTS, "old.zip"),
+                              os.path.join(cls.directory, "old"))
+        shutil.unpack_archive(os.path.join(TESTS, "new.zip"),
+                              os.path.join(cls.directory, "new"))
+        cls.old = tree(os.path.join(cls.directory, "old"))
+        cls.new = tree(os.path.join(cls.directory, "new"))
+
+    @classmethod
+    def tearDownClass(cls):
+        """Remove patch and releases."""
+        shutil.rmtree(cls.directory)
+
+    def setUp(self):
+        """Unpack old release as target."""
+        self.target = tempfile.mkdtemp()
+        shutil.unpack_archive(os.path.join(TESTS, "old.zip"), self.target)
+        self.journal_operation = bandage.Patcher.journal_operation
+        self.rollback = bandage.Patcher.rollback
+
+    def tearDown(self):
+        """Restore Patcher and remove target."""
+        bandage.Patcher.journal_operation = staticmethod(
+            self.journal_operation)
+        bandage.Patcher.rollback = staticmethod(self.rollback)
+        shutil.rmtree(self.target)
+
+    def interrupt(self, operations: int, recover: bool = False) -> None:
+        """Patch target, dying after a number of journaled operations."""
+        count = [0]
+        journal_operation = self.journal_operation
+
+        def operation(target, name, item, undo=False):
+            if undo is False:
+                if count[0] == operations:
+                    raise Interrupted()
+                count[0] += 1
+            journal_operation(target, name, item, undo)
+
+        bandage.Patcher.journal_operation = staticmethod(operation)
+        if recover is False:
+            # a dead process does not roll back
+            bandage.Patcher.rollback = staticmethod(lambda target: None)
+        with self.assertRaises(Interrupted):
+            bandage.Patcher(self.patch, self.target)
+        bandage.Patcher.journal_operation = staticmethod(journal_operation)
+        bandage.Patcher.rollback = staticmethod(self.rollback)
+
+    def test_rolled_back_on_failure(self):
+        """Target failing mid-patch is restored to the old release."""
+        for operations in range(0, 4):
+            self.interrupt(operations, recover=True)
+            self.assertEqual(tree(self.target), self.old)
+
+    def test_resume(self):
+        """Interrupted patch is completed by Patcher.resume."""
+        self.interrupt(2)
+        self.assertTrue(os.path.lexists(os.path.join(
+            self.target, bandage.Patcher.JOURNAL)))
+        bandage.Patcher.resume(self.target)
+        self.assertEqual(tree(self.target), self.new)
+
+    def test_rollback(self):
+        """Interrupted patch is undone by Patcher.rollback."""
+        self.interrupt(2)
+        bandage.Patcher.rollback(self.target)
+        self.assertEqual(tree(self.target), self.old)
+
+    def test_patch_again(self):
+        """Patching an interrupted target again finishes the patch."""
+        self.interrupt(1)
+        bandage.Patcher(self.patch, self.target)
+        self.assertEqual(tree(self.target), self.new)
+
+    def test_work_directory_removed_on_failure(self):
+        """Patch refused before staging leaves no work directory behind."""
+        with open(os.path.join(self.target, "NAME"), "w") as handle:
+            handle.write("Other")
+        before = set(os.listdir(tempfile.gettempdir()))
+        with self.assertRaises(bandage.Exceptions.PatchError):
+            bandage.Patcher(self.patch, self.target)
+        self.assertEqual([name for name in set(os.listdir(
+            tempfile.gettempdir())) - before if
+            name.startswith("bandage_patcher_session_")], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+"""unit test for checksum manifests of bandage.Weave and bandage.Patcher"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+import bandage
+
+TESTS = os.path.dirname(os.path.abspath(__file__))
+
+
+class ManifestTest(unittest.TestCase):
+    """Refuse targets and patches differing from MANIFEST.json."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Weave patch from old.zip to new.zip."""
+        cls.directory = tempfile.mkdtemp()
+        cls.patch = bandage.Weave(os.path.join(TESTS, "old.zip"),
+                                  os.path.join(TESTS, "new.zip"),
+                                  cls.directory + "/").patch_path
+
+    @classmethod
+    def tearDownClass(cls):
+        """Remove patch."""
+        shutil.rmtree(cls.directory)
+
+    def setUp(self):
+        """Unpack old release as target."""
+        self.target = tempfile.mkdtemp()
+        shutil.unpack_archive(os.path.join(TESTS, "old.zip"), self.target)
+
+    def tearDown(self):
+        """Remove target."""
+        shutil.rmtree(self.target)
+
+    def overwrite(self, name: str, content: bytes) -> None:
+        """Overwrite file of target."""
+        with open(os.path.join(self.target, name), "wb") as handle:
+            handle.write(content)
+
+    def test_manifest_recorded(self):
+        """MANIFEST.json lists files of both releases."""
+        with zipfile.ZipFile(self.patch) as archive:
+            manifest = json.loads(archive.read("MANIFEST.json"))
+        self.assertEqual(manifest["algorithm"], "sha256")
+        self.assertIn("unique.txt", manifest["old"])
+        self.assertIn("foradd.txt", manifest["new"])
+        self.assertNotIn("forremoval.txt", manifest["new"])
+
+    def test_kept_file_differs(self):
+        """Kept file of another size is refused."""
+        self.overwrite("common/same.txt", b"different")
+        with self.assertRaises(bandage.Exceptions.TargetError):
+            bandage.Patcher(self.patch, self.target)
+
+    def test_replaced_file_differs(self):
+        """File for replacement of the same size but other content is \
+            refused, leaving target untouched."""
+        with open(os.path.join(self.target, "unique.txt"), "rb") as handle:
+            content = handle.read()
+        self.overwrite("unique.txt", bytes([content[0] ^ 1]) + content[1:])
+        with self.assertRaises(bandage.Exceptions.TargetError):
+            bandage.Patcher(self.patch, self.target)
+        self.assertTrue(os.path.isfile(os.path.join(self.target,
+                                                    "forremoval.txt")))
+
+    def test_skip_manifest_check(self):
+        """Differing target is patched when the check is skipped."""
+        self.overwrite("common/same.txt", b"different")
+        bandage.Patcher(self.patch, self.target, skip_manifest_check=True)
+        self.assertTrue(os.path.isfile(os.path.join(self.target,
+                                                    "foradd.txt")))
+
+    def test_payload_differs(self):
+        """Patch whose files differ from its manifest is refused."""
+        tampered = os.path.join(self.directory, "tampered.zip")
+        with zipfile.ZipFile(self.patch) as archive, \
+                zipfile.ZipFile(tampered, "w") as output:
+            for info in archive.infolist():
+                content = archive.read(info)
+                if info.filename == "add/foradd.txt":
+                    content = content.upper()
+                output.writestr(info, content)
+        with self.assertRaises(bandage.Exceptions.PatchError):
+            bandage.Patcher(tampered, self.target)
+        self.assertFalse(os.path.lexists(os.path.join(self.target,
+                                                      "foradd.txt")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+"""unit test for moved and copied files of bandage.Weave and bandage.Patcher"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+import bandage
+
+
+def release(root: str, version: str, files: dict) -> str:
+    """Write release directory with NAME and VERSION, return its zip."""
+    for name, content in files.items():
+        os.makedirs(os.path.dirname(os.path.join(root, name)), exist_ok=True)
+        with open(os.path.join(root, name), "wb") as handle:
+            handle.write(content)
+    with open(os.path.join(root, "NAME"), "w") as handle:
+        handle.write("MoveTest")
+    with open(os.path.join(root, "VERSION"), "w") as handle:
+        handle.write(version)
+    return shutil.make_archive(root, "zip", root)
+
+
+def tree(root: str) -> dict:
+    """Map relative paths of files in directory to their contents."""
+    dump = {}
+    for directory, subdirectories, files in os.walk(root):
+        for name in files:
+            with open(os.path.join(directory, name), "rb") as handle:
+                dump[os.path.relpath(os.path.join(directory, name), root)] = \
+                    handle.read()
+    return dump
+
+
+class MoveTest(unittest.TestCase):
+    """Ship moved and duplicated files as operations, not content."""
+
+    def setUp(self):
+        """Write releases moving and duplicating files, weave patch."""
+        self.directory = tempfile.mkdtemp()
+        moved, kept, added = os.urandom(5000), os.urandom(5000), \
+            os.urandom(5000)
+        self.old = release(os.path.join(self.directory, "old"), "1",
+                           {"a.bin": moved, "b.bin": kept})
+        self.new = release(os.path.join(self.directory, "new"), "2",
+                           {"moved/a.bin": moved, "b.bin": kept,
+                            "b2.bin": kept, "c1.bin": added,
+                            "c2.bin": added})
+        os.mkdir(os.path.join(self.directory, "patch"))
+        self.patch = bandage.Weave(self.old, self.new, os.path.join(
+            self.directory, "patch") + "/").patch_path
+        self.target = os.path.join(self.directory, "target")
+        shutil.unpack_archive(self.old, self.target)
+
+    def tearDown(self):
+        """Remove releases, patch and target."""
+        shutil.rmtree(self.directory)
+
+    def test_operations(self):
+        """Moved and copied files are listed with their source, and not \
+            shipped."""
+        with zipfile.ZipFile(self.patch) as archive:
+            names = archive.namelist()
+            lines = archive.read("CHANGE.json").decode("utf-8").splitlines()
+        entries = {entry["path"]: entry for entry in
+                   [json.loads(line) for line in lines[1:]]}
+        self.assertEqual(entries["moved/a.bin"]["op"], "move")
+        self.assertEqual(entries["moved/a.bin"]["source"], "a.bin")
+        self.assertEqual(entries["a.bin"]["op"], "remove")
+        self.assertEqual(entries["b2.bin"]["op"], "copy")
+        self.assertEqual(entries["b2.bin"]["source"], "b.bin")
+        self.assertEqual(entries["c2.bin"]["op"], "copy")
+        self.assertEqual(entries["c2.bin"]["payload"], "add/c1.bin")
+        for name in ["add/moved/a.bin", "add/b2.bin", "add/c2.bin"]:
+            self.assertNotIn(name, names)
+
+    def test_patch(self):
+        """Patch rebuilds moved and copied files in target."""
+        bandage.Patcher(self.patch, self.target, verify=True)
+        found = tree(self.target)
+        for name in list(found):
+            if name.startswith(".bandage"):
+                del found[name]
+        shutil.unpack_archive(self.new, os.path.join(self.directory,
+                                                     "expected"))
+        self.assertEqual(found, tree(os.path.join(self.directory,
+                                                  "expected")))
+
+    def test_source_differs(self):
+        """Target whose source of a move differs is refused."""
+        with open(os.path.join(self.target, "a.bin"), "wb") as handle:
+            handle.write(b"other")
+        with self.assertRaises(bandage.Exceptions.TargetError):
+            bandage.Patcher(self.patch, self.target)
+
+    def test_source_missing(self):
+        """Target missing the source of a copy is refused."""
+        os.remove(os.path.join(self.target, "b.bin"))
+        with self.assertRaises(bandage.Exceptions.TargetError):
+            bandage.Patcher(self.patch, self.target, skip_keep_check=True,
+                            skip_manifest_check=True)
+        self.assertTrue(os.path.isfile(os.path.join(self.target, "a.bin")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+"""unit test for bandage.Weave.squash"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+import bandage
+
+
+def release(root: str, version: str, files: dict) -> str:
+    """Write release directory with NAME and VERSION, return its zip."""
+    for name, content in files.items():
+        os.makedirs(os.path.dirname(os.path.join(root, name)), exist_ok=True)
+        with open(os.path.join(root, name), "wb") as handle:
+            handle.write(content)
+    with open(os.path.join(root, "NAME"), "w") as handle:
+        handle.write("SquashTest")
+    with open(os.path.join(root, "VERSION"), "w") as handle:
+        handle.write(version)
+    return shutil.make_archive(root, "zip", root)
+
+
+def tree(root: str) -> dict:
+    """Map relative paths of files in directory to their contents."""
+    dump = {}
+    for directory, subdirectories, files in os.walk(root):
+        for name in files:
+            with open(os.path.join(directory, name), "rb") as handle:
+                dump[os.path.relpath(os.path.join(directory, name), root)] = \
+                    handle.read()
+    return dump
+
+
+class SquashTest(unittest.TestCase):
+    """Squash a chain of patches and apply it in one go."""
+
+    def setUp(self):
+        """Write a series of four releases."""
+        self.directory = tempfile.mkdtemp()
+        big = os.urandom(200000)
+        files = {"keep.txt": b"k", "a/x.txt": b"x", "a/y.txt": b"y",
+                 "b/z.bin": big, "c.txt": b"c", "gone/g.txt": b"g"}
+        states = [dict(files)]
+        files["new/n1.txt"] = b"n1"
+        files["c.txt"] = b"c1"
+        del files["gone/g.txt"]
+        files["b/z.bin"] = big[:500] + b"CHANGED" + big[500:]
+        files["tmp.txt"] = b"t"
+        states.append(dict(files))
+        del files["tmp.txt"]
+        files["a/x.txt"] = b"x2"
+        files["b/z.bin"] = files["b/z.bin"][:150000] + b"MORE" + \
+            files["b/z.bin"][150000:]
+        files["gone/g.txt"] = b"g again"
+        files["moved.txt"] = files.pop("a/y.txt")
+        states.append(dict(files))
+        del files["new/n1.txt"]
+        files["d/e/f.txt"] = b"deep"
+        files["c.txt"] = b"c3"
+        states.append(dict(files))
+        self.releases = [release(os.path.join(self.directory, "r" + str(x)),
+                                 str(x), states[x])
+                         for x in range(0, len(states))]
+
+    def tearDown(self):
+        """Remove releases and patches."""
+        shutil.rmtree(self.directory)
+
+    def weave(self, delta: bool) -> list:
+        """Weave patches between consecutive releases, return their paths."""
+        patches = []
+        for x in range(0, len(self.releases) - 1):
+            output = os.path.join(self.directory, "p" + str(x) + "/")
+            os.mkdir(output)
+            patches.append(bandage.Weave(self.releases[x],
+                                         self.releases[x + 1], output,
+                                         delta=delta).patch_path)
+        return patches
+
+    def check(self, patches: list) -> str:
+        """Squash patches and apply them to the first release."""
+        output = os.path.join(self.directory, "squashed/")
+        os.mkdir(output)
+        squashed = bandage.Weave.squash(patches, output)
+        target = os.path.join(self.directory, "target")
+        shutil.unpack_archive(self.releases[0], target)
+        bandage.Patcher(squashed, target, verify=True)
+        expected = os.path.join(self.directory, "expected")
+        shutil.unpack_archive(self.releases[-1], expected)
+        found = tree(target)
+        for name in list(found):
+            if name.startswith(".bandage"):
+                del found[name]
+        self.assertEqual(found, tree(expected))
+        return squashed
+
+    def test_squash(self):
+        """Squashed chain upgrades target to the last release."""
+        squashed = self.check(self.weave(False))
+        with zipfile.ZipFile(squashed) as archive:
+            self.assertEqual(archive.read("VERSIONS"), b"0 -> 3")
+            manifest = json.loads(archive.read("MANIFEST.json"))
+        self.assertIn("c.txt", manifest["old"])
+        self.assertIn("d/e/f.txt", manifest["new"])
+
+    def test_squash_deltas(self):
+        """Deltas of the same file in consecutive patches are composed."""
+        squashed = self.check(self.weave(True))
+        with zipfile.ZipFile(squashed) as archive:
+            self.assertIn("delta/b/z.bin", archive.namelist())
+
+    def test_manifest_checked(self):
+        """Squashed patch refuses a target differing from first release."""
+        output = os.path.join(self.directory, "squashed/")
+        os.mkdir(output)
+        squashed = bandage.Weave.squash(self.weave(True), output)
+        target = os.path.join(self.directory, "target")
+        shutil.unpack_archive(self.releases[0], target)
+        with open(os.path.join(target, "b/z.bin"), "r+b") as handle:
+            handle.write(b"Q")
+        with self.assertRaises(bandage.Exceptions.TargetError):
+            bandage.Patcher(squashed, target)
+
+    def test_move_then_edit(self):
+        """Delta of a file moved earlier in the chain is refused."""
+        big = os.urandom(200000)
+        states = [{"a.bin": big}, {"b.bin": big},
+                  {"b.bin": big[:500] + b"CHANGED" + big[500:]}]
+        self.releases = [release(os.path.join(self.directory, "m" + str(x)),
+                                 str(x), states[x])
+                         for x in range(0, len(states))]
+        patches = self.weave(True)
+        with zipfile.ZipFile(patches[1]) as archive:
+            self.assertIn("delta/b.bin", archive.namelist())
+        output = os.path.join(self.directory, "squashed/")
+        os.mkdir(output)
+        with self.assertRaises(bandage.Exceptions.PatchError):
+            bandage.Weave.squash(patches, output)
+        shutil.rmtree(output)
+        for x in range(0, len(patches)):
+            shutil.rmtree(os.path.join(self.directory, "p" + str(x)))
+        self.check(self.weave(False))
+
+
+if __name__ == "__main__":
+    unittest.main()